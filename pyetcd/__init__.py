@@ -11,7 +11,13 @@ __version__ = '1.11.1'
 class EtcdException(Exception):
     """
     Generic Etcd error.
+
+    The ``index`` attribute holds etcd index reported with the error
+    and the ``endpoint`` attribute holds URL of the node that returned it.
+    Both are None if unknown.
     """
+    index = None
+    endpoint = None
 
 
 class EtcdKeyNotFound(EtcdException):
@@ -218,10 +224,26 @@ class EtcdEmptyResponse(EtcdInvalidResponse):
     """
 
 
+class EtcdTimeout(EtcdException):
+    """
+    Error that raises if etcd doesn't respond within the timeout
+    """
+
+
+class EtcdCompacted(EtcdEventIndexCleared):
+    """
+    Error that raises if a v3 request needs a revision
+    that has been compacted
+    """
+
+
 class EtcdResult(object):
     """
     Response from Etcd API.
 
+    The ``endpoint`` attribute holds URL of the node that returned
+    the response if the client knows it.
+
     :param response: Response from server as ``requests.(get|post|put)``
         returns.
     :type response: requests.Response
@@ -230,6 +252,7 @@ class EtcdResult(object):
     :raise EtcdEmptyResponse: if response content from etcd is empty.
     """
     _payload = None
+    endpoint = None
     _exception_codes = {
         100: EtcdKeyNotFound,
         101: EtcdTestFailed,
@@ -264,6 +287,14 @@ class EtcdResult(object):
         404: EtcdInvalidRemoveDelay,
         500: EtcdClientInternal
     }
+    # gRPC status codes of v3 gateway errors
+    _grpc_codes = {
+        4: EtcdTimeout,
+        5: EtcdKeyNotFound,
+        7: EtcdUnauthorized,
+        11: EtcdCompacted,
+        16: EtcdUnauthorized
+    }
 
     def __init__(self, response):
         """
@@ -277,6 +308,11 @@ class EtcdResult(object):
         except (TypeError, AttributeError, KeyError):
             self._x_etcd_index = None
 
+        try:
+            self._x_etcd_cluster_id = response.headers['X-Etcd-Cluster-Id']
+        except (TypeError, AttributeError, KeyError):
+            self._x_etcd_cluster_id = None
+
         try:
             status_code = response.status_code
         except AttributeError as err:
@@ -290,7 +326,7 @@ class EtcdResult(object):
                 if response.content in ['', None]:
                     raise EtcdEmptyResponse('Empty response from etcd')
                 self._response_content = response.content
-                self._payload = json.loads(response.content)
+                self._payload = self._decode_payload(response.content)
                 self._raise_for_status(self._payload)
                 response.raise_for_status()
             except (ValueError, TypeError, AttributeError) as err:
@@ -299,6 +335,10 @@ class EtcdResult(object):
     def __repr__(self):
         return self._response_content
 
+    @staticmethod
+    def _decode_payload(content):
+        return json.loads(content)
+
     def _get_property(self, key):
         try:
             return self._payload[key]
@@ -308,24 +348,38 @@ class EtcdResult(object):
     def _raise_for_status(self, payload):
         """
         Raise Etcd exception if payload contains errorCode
+        or it's a v3 gateway error with a gRPC status code
         :param payload: object decoded from JSON
         :raise EtcdException: if errorCode is present in payload
         """
-        try:
-            error_code = payload['errorCode']
-            message = payload['message']
-        except KeyError:
+        if not isinstance(payload, dict):
             return
-        try:
-            raise self._exception_codes[error_code](message)
-        except KeyError:
-            raise EtcdException(message)
+        if 'errorCode' in payload:
+            exception = self._exception_codes.get(payload['errorCode'],
+                                                  EtcdException)
+        elif 'code' in payload and 'error' in payload:
+            exception = self._grpc_codes.get(payload['code'], EtcdException)
+        else:
+            return
+        error = exception(payload.get('message') or payload.get('error'))
+        error.index = payload.get('index')
+        raise error
+
+    @property
+    def payload(self):
+        """Response body decoded from JSON."""
+        return self._payload
 
     @property
     def x_etcd_index(self):
         """current etcd index that represents key modification version."""
         return self._x_etcd_index
 
+    @property
+    def x_etcd_cluster_id(self):
+        """Identifier of the cluster that responded."""
+        return self._x_etcd_cluster_id
+
     @property
     def action(self):
         """Action type"""
@@ -400,3 +454,38 @@ class EtcdResult(object):
     def health(self):
         """name"""
         return self._get_property('health') == "true"
+
+
+class EtcdStreamResult(EtcdResult):
+    """
+    Response of a v3 gateway streaming endpoint, e.g. lease keepalive.
+
+    The gateway sends one JSON object per line, ``{"result": ...}``
+    or ``{"error": ...}``. :py:attr:`payload` is the list of results.
+
+    :param response: Response from server.
+    :type response: requests.Response
+    :raise EtcdException: if any message is an error.
+    """
+    @staticmethod
+    def _decode_payload(content):
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        return [json.loads(line) for line in content.splitlines()
+                if line.strip()]
+
+    def _raise_for_status(self, payload):
+        for message in payload:
+            if 'error' in message:
+                error = message['error']
+                if isinstance(error, dict):
+                    error = dict(error)
+                    error.setdefault('code', error.get('grpc_code'))
+                    error.setdefault('error', error.get('message'))
+                super(EtcdStreamResult, self)._raise_for_status(error)
+                raise EtcdException(error)
+
+    @property
+    def payload(self):
+        """List of results decoded from JSON."""
+        return [message.get('result', message) for message in self._payload]
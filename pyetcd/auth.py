@@ -0,0 +1,141 @@
+"""module to authenticate client requests."""
+import base64
+import json
+import threading
+import time
+
+from requests.auth import AuthBase
+
+AUTH_TOKEN = 'token'
+AUTH_BASIC = 'basic'
+AUTH_MODES = [AUTH_TOKEN, AUTH_BASIC]
+
+
+def no_auth(request):
+    """
+    Send a request without authentication even if the session
+    authenticates requests.
+    """
+    return request
+
+
+def jwt_expiration(token):
+    """
+    :param token: etcd auth token.
+    :return: Expiration time of a JWT token or None if the token
+        isn't JWT or has no expiration.
+    :rtype: float
+    """
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    payload = parts[1] + '=' * (-len(parts[1]) % 4)
+    try:
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload.encode('ascii')).decode('utf-8')
+        )
+        return float(claims['exp'])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class TokenAuth(AuthBase):  # pylint: disable=too-many-instance-attributes
+    """
+    Authenticates requests with an etcd v3 auth token.
+
+    etcd checks the password with bcrypt, which is slow on purpose.
+    A token is fetched once with ``authenticate`` and sent with every
+    request in the ``Authorization`` header instead.
+
+    A token expires after ``ttl`` seconds, or at its ``exp`` claim if it's
+    a JWT token. It's refreshed when ``margin`` of its lifetime is left;
+    requests sent while it's refreshed use the old token. If etcd rejects
+    a token it's refreshed and the request is sent once more.
+
+    :param authenticate: Function that fetches a new token.
+    :param ttl: Lifetime of a simple token in seconds, see etcd's
+        ``--auth-token-ttl``.
+    :param margin: Fraction of the lifetime that is left when the token
+        is refreshed.
+    """
+    def __init__(self, authenticate, ttl=300, margin=1 / 3.0):
+        self._authenticate = authenticate
+        self._ttl = ttl
+        self._margin = margin
+        self._token = None
+        self._refresh_at = 0
+        self._expires_at = 0
+        self._fetch_lock = threading.Lock()
+        self._fetches = 0
+
+    def __call__(self, request):
+        request.headers['Authorization'] = self.token
+        request.register_hook('response', self._handle_401)
+        return request
+
+    @property
+    def fetches(self):
+        """Number of fetched tokens."""
+        return self._fetches
+
+    @property
+    def token(self):
+        """
+        Current token, fetched if it's missing or due for a refresh.
+
+        :raise EtcdException: if the token can't be fetched.
+        """
+        now = time.time()
+        token = self._token
+        if token is not None and now < self._refresh_at:
+            return token
+        if token is not None and now < self._expires_at:
+            if not self._fetch_lock.acquire(False):
+                # Another thread refreshes the token
+                return token
+        else:
+            self._fetch_lock.acquire()
+        try:
+            if self._token is not None and time.time() < self._refresh_at:
+                return self._token
+            return self._fetch()
+        finally:
+            self._fetch_lock.release()
+
+    def invalidate(self, token):
+        """
+        Drop a token that etcd rejected.
+
+        :param token: The rejected token.
+        """
+        if self._token == token:
+            self._token = None
+
+    def _fetch(self):
+        fetched = time.time()
+        token = self._authenticate()
+        expires_at = jwt_expiration(token) or fetched + self._ttl
+        self._refresh_at = expires_at - (expires_at - fetched) * self._margin
+        self._expires_at = expires_at
+        self._token = token
+        self._fetches += 1
+        return token
+
+    def _handle_401(self, response, **kwargs):
+        request = response.request
+        if response.status_code != 401 \
+                or getattr(request, '_token_retried', False):
+            return response
+
+        self.invalidate(request.headers.get('Authorization'))
+        # Release the connection before sending the request again
+        response.content  # pylint: disable=pointless-statement
+        response.close()
+
+        retry = request.copy()
+        retry._token_retried = True  # pylint: disable=protected-access
+        retry.headers['Authorization'] = self.token
+        retried = response.connection.send(retry, **kwargs)
+        retried.history.append(response)
+        retried.request = retry
+        return retried
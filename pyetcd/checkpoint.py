@@ -0,0 +1,80 @@
+"""module to resume long running imports."""
+import json
+import os
+import threading
+
+from pyetcd.client import ClientException
+
+
+class Checkpoint(object):
+    """
+    Number of items from the beginning of an input that are done.
+
+    Items finish out of order, the position only moves over
+    a contiguous run of finished items. An item that failed stops it,
+    so a resumed run retries it. Items finished after a failed one
+    aren't kept, so memory doesn't grow with the rest of the input.
+
+    :param path: Checkpoint file name. If None nothing is saved.
+    :param source: JSON value that identifies the input,
+        a checkpoint of another input isn't loaded.
+    :raise ClientException: if the checkpoint file is of another input.
+    """
+    def __init__(self, path, source):
+        self._path = path
+        self._source = source
+        self._finished = set()
+        self._failed = None
+        self._lock = threading.Lock()
+        self.position = 0
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                state = json.load(checkpoint_file)
+            if state.get('source') != source:
+                raise ClientException(
+                    'Checkpoint %s is from another input' % path
+                )
+            self.position = state['position']
+
+    def finish(self, position):
+        """
+        Mark an item done.
+
+        :param position: Item number, starting from one.
+        """
+        with self._lock:
+            if self._failed is not None and position > self._failed:
+                return
+            self._finished.add(position)
+            while self.position + 1 in self._finished:
+                self.position += 1
+                self._finished.remove(self.position)
+
+    def fail(self, position):
+        """
+        Mark an item failed. The position never moves over it.
+
+        :param position: Item number, starting from one.
+        """
+        with self._lock:
+            if self._failed is not None and position >= self._failed:
+                return
+            self._failed = position
+            self._finished = set(
+                finished for finished in self._finished
+                if finished < position
+            )
+
+    def save(self):
+        """
+        Write the position to the checkpoint file. The file is replaced
+        atomically, so it's valid even if the process is killed.
+        """
+        if not self._path:
+            return
+        with self._lock:
+            state = {'source': self._source, 'position': self.position}
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.rename(tmp_path, self._path)
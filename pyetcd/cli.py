@@ -0,0 +1,191 @@
+"""pyetcd command line tool."""
+from __future__ import print_function
+
+import argparse
+import sys
+
+from pyetcd import EtcdException
+from pyetcd.client import Client, ClientException, SUPPORTED_PROTOCOLS
+from pyetcd.dump import dump, open_dump, COMPRESSIONS
+from pyetcd.migrate import migrate
+from pyetcd.restore import restore
+from pyetcd.v3 import V3Client
+
+
+def _parse_host(value):
+    host, _, port = value.rpartition(':')
+    if not host:
+        return value
+    try:
+        return host, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError('Invalid port in %s' % value)
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog='pyetcd',
+                                     description='etcd command line tool')
+    parser.add_argument('--host', action='append', type=_parse_host,
+                        help='etcd node as host or host:port. '
+                             'Can be given several times. '
+                             'Default is 127.0.0.1:2379.')
+    parser.add_argument('--port', type=int, default=2379,
+                        help='Port of nodes given without port.')
+    parser.add_argument('--protocol', choices=SUPPORTED_PROTOCOLS,
+                        help='Protocol to connect to the nodes. '
+                             'Default is http.')
+    parser.add_argument('--ca-cert',
+                        help='CA bundle that signed the node certificates.')
+    parser.add_argument('--cert', help='Client certificate.')
+    parser.add_argument('--key', help='Key of the client certificate.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    dump_parser = commands.add_parser(
+        'dump',
+        help='Export keys to newline-delimited JSON.'
+    )
+    dump_parser.add_argument('output',
+                             help="Output file name, '-' for stdout.")
+    dump_parser.add_argument('--prefix', default='/',
+                             help='Directory to export. Default is /.')
+    dump_parser.add_argument('--compression', choices=COMPRESSIONS,
+                             help='Output compression. Default is guessed '
+                                  'from the file name (.gz, .zst).')
+    dump_parser.add_argument('--parallel', type=int, default=4,
+                             help='Number of directories read '
+                                  'at the same time. Default is 4.')
+    dump_parser.set_defaults(func=_dump)
+
+    restore_parser = commands.add_parser(
+        'restore',
+        help='Import keys from a dump.'
+    )
+    restore_parser.add_argument('input',
+                                help="Dump file name, '-' for stdin.")
+    restore_parser.add_argument('--compression', choices=COMPRESSIONS,
+                                help='Input compression. Default is guessed '
+                                     'from the file name (.gz, .zst).')
+    restore_parser.add_argument('--parallel', type=int, default=16,
+                                help='Number of concurrent writes. '
+                                     'Default is 16.')
+    restore_parser.add_argument('--rate', type=float,
+                                help='Maximum number of requests per second.')
+    restore_parser.add_argument('--checkpoint',
+                                help='Checkpoint file to resume from.')
+    restore_parser.add_argument('--cas', action='store_true',
+                                help='Skip keys that changed after the dump. '
+                                     'Only for a dump of the same cluster.')
+    restore_parser.set_defaults(func=_restore)
+
+    migrate_parser = commands.add_parser(
+        'migrate',
+        help='Copy keys from the v2 keys API to a v3 cluster.'
+    )
+    migrate_parser.add_argument('--target', action='append',
+                                type=_parse_host, required=True,
+                                help='v3 node as host or host:port. '
+                                     'Can be given several times.')
+    migrate_parser.add_argument('--prefix', default='/',
+                                help='v2 directory to migrate. Default is /.')
+    migrate_parser.add_argument('--target-prefix',
+                                help='v3 key prefix. Default is --prefix.')
+    migrate_parser.add_argument('--batch-size', type=int, default=100,
+                                help='Keys in a transaction. Default is 100.')
+    migrate_parser.add_argument('--parallel', type=int, default=8,
+                                help='Number of concurrent transactions. '
+                                     'Default is 8.')
+    migrate_parser.add_argument('--checkpoint',
+                                help='Checkpoint file to resume from.')
+    migrate_parser.add_argument('--no-verify', dest='verify',
+                                action='store_false',
+                                help="Don't read migrated keys back.")
+    migrate_parser.set_defaults(func=_migrate)
+    return parser
+
+
+def _dump(client, args):
+    fileobj = open_dump(args.output, 'wb', compression=args.compression)
+    try:
+        count = dump(client, fileobj, prefix=args.prefix,
+                     parallel=args.parallel)
+    finally:
+        fileobj.close()
+    print('Exported %d nodes' % count, file=sys.stderr)
+
+
+def _restore(client, args):
+    fileobj = open_dump(args.input, 'rb', compression=args.compression)
+    try:
+        report = restore(client, fileobj, parallel=args.parallel,
+                         rate=args.rate, cas=args.cas,
+                         checkpoint=args.checkpoint)
+    finally:
+        fileobj.close()
+    print('Restored %d, skipped %d, expired %d, failed %d nodes'
+          % (report.restored, report.skipped, report.expired,
+             len(report.failed)),
+          file=sys.stderr)
+    for key in report.failed:
+        print('Failed to restore %s' % key, file=sys.stderr)
+    return 1 if report.failed else 0
+
+
+def _tls_options(args):
+    options = {}
+    for name in ('protocol', 'ca_cert', 'cert', 'key'):
+        if getattr(args, name) is not None:
+            options[name] = getattr(args, name)
+    return options
+
+
+def _migrate(client, args):
+    target = V3Client(host=args.target, port=args.port, **_tls_options(args))
+    try:
+        report = migrate(client, target, prefix=args.prefix,
+                         target_prefix=args.target_prefix,
+                         batch_size=args.batch_size, parallel=args.parallel,
+                         checkpoint=args.checkpoint, verify=args.verify)
+    finally:
+        target.close()
+    print('Migrated %d, skipped %d keys with TTL, failed %d keys'
+          % (report.migrated, report.skipped, len(report.failed)),
+          file=sys.stderr)
+    if report.verified is not None:
+        print('Source: %d keys, hash %s\nTarget: %d keys, hash %s'
+              % (report.source_count, report.source_hash,
+                 report.target_count, report.target_hash),
+              file=sys.stderr)
+    if report.failed or report.verified is False:
+        return 1
+    return 0
+
+
+def main(argv=None):
+    """
+    Entry point of the ``pyetcd`` command.
+
+    :param argv: Command line arguments without the program name.
+        Default is ``sys.argv[1:]``.
+    :return: Exit code.
+    :rtype: int
+    """
+    args = _build_parser().parse_args(argv)
+    try:
+        client = Client(host=args.host or '127.0.0.1', port=args.port,
+                        max_workers=max(getattr(args, 'parallel', 1), 1),
+                        **_tls_options(args))
+    except ClientException as err:
+        print('Error: %s' % err, file=sys.stderr)
+        return 1
+    try:
+        return args.func(client, args) or 0
+    except (EtcdException, ClientException, IOError) as err:
+        print('Error: %s' % err, file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
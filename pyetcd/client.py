@@ -1,10 +1,35 @@
 """module to connect to an etcd node and perform low rest API requests."""
-import requests
-from requests import RequestException
-
-from pyetcd import EtcdResult, EtcdException
+import random
+import ssl
+import threading
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-SUPPORTED_PROTOCOLS = ['http']
+import requests
+from requests import RequestException, ReadTimeout
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.exceptions import ReadTimeoutError
+
+from pyetcd import EtcdResult, EtcdException, EtcdTimeout, \
+    EtcdKeyNotFound, EtcdTestFailed, EtcdNodeExist
+from pyetcd.auth import TokenAuth, AUTH_BASIC, AUTH_MODES, no_auth
+from pyetcd.selector import EndpointSelector
+from pyetcd.singleflight import SingleFlight
+from pyetcd.tls import TLSAdapter, create_context
+
+SUPPORTED_PROTOCOLS = ['http', 'https']
+
+CONSISTENCY_LINEARIZABLE = 'linearizable'
+CONSISTENCY_LEADER = 'leader'
+CONSISTENCY_STALE = 'stale'
+CONSISTENCY_MODES = [
+    CONSISTENCY_LINEARIZABLE,
+    CONSISTENCY_LEADER,
+    CONSISTENCY_STALE
+]
 
 
 class ClientException(Exception):
@@ -29,12 +54,46 @@ class Client(object):
         - **allow_reconnect** (bool) - If client fails to connect to
             a cluster node connect to the next node in the cluster.
             Default is True.
-        - **protocol** (str) - Protocol to connect to the cluster.
-            Default is 'http'.
+        - **protocol** (str) - Protocol to connect to the cluster,
+            'http' or 'https'. Default is 'http'.
+        - **ca_cert** (str) - Path to the CA bundle that signed
+            the certificates of the nodes. Default is the system
+            CA certificates.
+        - **cert** (str) - Path to the client certificate.
+        - **key** (str) - Path to the key of the client certificate.
+            Default is the key in the ``cert`` file.
+        - **consistency** (str) - Default consistency of reads.
+            One of 'linearizable', 'leader' or 'stale'.
+            See :py:meth:`read`. Default is None, reads go to the first
+            available node in the configured order.
+        - **coalesce_reads** (bool) - Concurrent identical GET requests
+            share one HTTP request and one result. Requests that change
+            data and watches are never coalesced. Default is False.
+        - **max_workers** (int) - Number of threads that run requests
+            passed to :py:meth:`submit`. Default is 8.
+        - **hot_keys_size** (int) - Number of keys :py:meth:`hot_keys`
+            keeps conflict counts of. Default is 1000.
+        - **username** (str) - User name if the cluster has auth enabled.
+        - **password** (str) - Password of the user.
+        - **auth** (str) - How requests are authenticated, 'token' or
+            'basic'. With 'token' a v3 auth token is fetched from
+            the v3 JSON gateway once, see :py:class:`~pyetcd.auth.TokenAuth`.
+            With 'basic' the user name and password are sent with every
+            request and etcd checks the password every time, which
+            limits the cluster to a few hundred requests per second.
+            The v2 keys API accepts only 'basic', so it's the default
+            of :py:class:`Client`. Default of
+            :py:class:`~pyetcd.v3.V3Client` is 'token'.
+        - **token_ttl** (int) - Seconds a token is valid, etcd's
+            ``--auth-token-ttl``. Default is 300.
+        - **gateway_prefix** (str) - URI prefix of the v3 JSON gateway.
+            Default is '/v3'. etcd 3.3 serves it at '/v3beta'.
     :raise ClientException: if any errors
     :raise NotImplementedError: if there is an attempt to use unsupported
         DNS discovery.
     """
+    _default_auth = AUTH_BASIC
+
     def __init__(self, **kwargs):
         if 'srv_domain' in kwargs:
             raise NotImplementedError('DNS discovery is not implemented')
@@ -46,6 +105,9 @@ class Client(object):
         else:
             raise ClientException('Protocol %s is unsupported' % protocol)
         self._version_prefix = kwargs.get('version_prefix', 'v2')
+        self._consistency = self._check_consistency(
+            kwargs.get('consistency')
+        )
         self._srv_domain = None
         self._hosts = []
         self._urls = []
@@ -75,7 +137,168 @@ class Client(object):
                         host=host,
                         port=port)
             self._urls.append(url)
-        self._session = requests.Session()
+        self._selector = EndpointSelector(self._urls)
+        self._singleflight = None
+        if kwargs.get('coalesce_reads', False):
+            self._singleflight = SingleFlight()
+        self._max_workers = kwargs.get('max_workers', 8)
+        self._ssl_context = None
+        self._session = self._create_session(
+            kwargs.get('ca_cert'), kwargs.get('cert'), kwargs.get('key')
+        )
+        self._gateway_prefix = kwargs.get('gateway_prefix', '/v3')
+        self._token_auth = None
+        self._set_auth(kwargs.get('username'), kwargs.get('password', ''),
+                       kwargs.get('auth', self._default_auth),
+                       kwargs.get('token_ttl', 300))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._closed = False
+        self._metrics_lock = threading.Lock()
+        self._update_retries = 0
+        self._conflicts = 0
+        self._update_conflicts = Counter()
+        self._hot_keys_size = kwargs.get('hot_keys_size', 1000)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Wait for submitted requests to finish and close connections
+        to the cluster.
+        """
+        with self._executor_lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        self._session.close()
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Run a client method in a background thread.
+
+        :param method: Client method name, e.g. ``'read'``, or a callable.
+        :param args: Positional arguments of the method.
+        :param kwargs: Keyword arguments of the method.
+        :return: Future of the method result. A request that hasn't
+            started yet can be cancelled with ``Future.cancel()``.
+        :rtype: concurrent.futures.Future
+        :raise ClientException: if the client is closed.
+        """
+        if not callable(method):
+            method = getattr(self, method)
+        with self._executor_lock:
+            if self._closed:
+                raise ClientException('Client is closed')
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers
+                )
+            return self._executor.submit(method, *args, **kwargs)
+
+    def submit_read(self, key, **kwargs):
+        """
+        Same as :py:meth:`read` but runs in a background thread.
+
+        :return: Future of the read result.
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(self.read, key, **kwargs)
+
+    def submit_write(self, key, value, ttl=None):
+        """
+        Same as :py:meth:`write` but runs in a background thread.
+
+        :return: Future of the write result.
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(self.write, key, value, ttl=ttl)
+
+    def submit_delete(self, key):
+        """
+        Same as :py:meth:`delete` but runs in a background thread.
+
+        :return: Future of the delete result.
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(self.delete, key)
+
+    @property
+    def endpoints(self):
+        """
+        :return: URLs of the cluster nodes the client connects to.
+        :rtype: list(str)
+        """
+        return list(self._urls)
+
+    @property
+    def metrics(self):
+        """
+        Client counters:
+
+            - **coalesced_reads** - GET requests that were served
+              by a concurrent identical request.
+            - **atomic_update_retries** - retries of
+              :py:meth:`atomic_update`.
+            - **atomic_update_conflicts** - failed compare-and-swaps
+              in :py:meth:`atomic_update`.
+            - **auth_tokens** - auth tokens fetched from etcd.
+            - **tls_handshakes** - TLS handshakes with the nodes.
+            - **tls_sessions_reused** - TLS handshakes that resumed
+              a previous session instead of a full handshake.
+              Always 0 before Python 3.6.
+
+        :rtype: dict
+        """
+        with self._metrics_lock:
+            return {
+                'coalesced_reads':
+                    self._singleflight.coalesced
+                    if self._singleflight else 0,
+                'atomic_update_retries': self._update_retries,
+                'atomic_update_conflicts': self._conflicts,
+                'auth_tokens':
+                    self._token_auth.fetches if self._token_auth else 0,
+                'tls_handshakes':
+                    self._ssl_context.handshakes if self._ssl_context else 0,
+                'tls_sessions_reused':
+                    self._ssl_context.sessions_reused
+                    if self._ssl_context else 0
+            }
+
+    def hot_keys(self, number=10):
+        """
+        Keys with most conflicts in :py:meth:`atomic_update`.
+
+        Counts are kept for up to ``hot_keys_size`` keys. When a new key
+        conflicts and there's no room, the key with the fewest conflicts
+        is replaced and the new key takes over its count, so a key
+        that keeps conflicting makes it to the top. Counts of keys that
+        replaced others may be too high by the replaced count.
+
+        :param number: How many keys to return.
+        :return: List of (key, number of conflicts) tuples,
+            most contended first.
+        :rtype: list(tuple)
+        """
+        with self._metrics_lock:
+            return self._update_conflicts.most_common(number)
+
+    def _count_conflict(self, key):
+        conflicts = self._update_conflicts
+        if key not in conflicts \
+                and len(conflicts) >= self._hot_keys_size:
+            # Space-saving: the new key replaces the least contended one
+            coldest, count = min(conflicts.items(),
+                                 key=lambda item: item[1])
+            del conflicts[coldest]
+            conflicts[key] = count
+        conflicts[key] += 1
 
     def write(self, key, value, ttl=None):
         """
@@ -97,16 +320,68 @@ class Client(object):
             data['ttl'] = int(ttl)
         return self._request_key(key, method='put', data=data)
 
-    def read(self, key, **kwargs):
+    def read(self, key, consistency=None, **kwargs):
         """
         Read key value
 
         :param key: Key
+        :param consistency: Consistency of the read.
+            If not given the client default is used.
+
+            - **linearizable** - any node serves the read
+              with ``quorum=true``.
+            - **leader** - the read is sent to the cluster leader.
+              If the leader fails it's looked up again among the other
+              nodes. If none of them is the leader, e.g. during
+              an election, the read goes to them with ``quorum=true``.
+            - **stale** - the read goes without quorum to the least loaded
+              node, so stale reads spread across the cluster.
+        :param kwargs: Parameters that will be added to URI.
+            For example ``wait=True``, ``recursive=True``.
         :return: Result of operation.
         :rtype: EtcdResult
         :raise EtcdException: if etcd responds with error or HTTP error
+        :raise ClientException: if consistency mode is unknown.
+        """
+        consistency = self._check_consistency(consistency) \
+            or self._consistency
+        if consistency is None:
+            return self._request_key(key, params=kwargs)
+
+        if consistency == CONSISTENCY_LINEARIZABLE:
+            kwargs['quorum'] = True
+        return self._request_key(key, params=kwargs,
+                                 consistency=consistency)
+
+    def watch(self, key, wait_index=None, recursive=False, timeout=None):
+        """
+        Wait for a change of a key
+
+        :param key: Key
+        :param wait_index: Return the first change at or after this index.
+            By default waits for the next change.
+        :param recursive: Wait for changes of the directory children too.
+        :param timeout: Seconds to wait. By default waits forever.
+        :return: Result of operation. The action and the node describe
+            the change.
+        :rtype: EtcdResult
+        :raise EtcdTimeout: if nothing changed within the timeout.
+        :raise EtcdEventIndexCleared: if the change history at
+            ``wait_index`` is no longer available.
+        :raise EtcdException: if etcd responds with error or HTTP error
         """
-        return self._request_key(key, params=kwargs)
+        params = {
+            'wait': True
+        }
+        if wait_index is not None:
+            params['waitIndex'] = wait_index
+        if recursive:
+            params['recursive'] = True
+
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        return self._request_key(key, params=params, **kwargs)
 
     def delete(self, key):
         """
@@ -156,11 +431,31 @@ class Client(object):
         """
         return self._request_call('/health').health
 
-    def mkdir(self, directory):
+    def append(self, directory, value, ttl=None):
+        """
+        Create an in-order key in a directory. Its name is a number that
+        is greater than names of keys appended before.
+
+        :param directory: string with directory name
+        :param value: Value
+        :param ttl: set ttl on the key in seconds
+        :return: Result of operation. ``node['key']`` is the created key.
+        :rtype: EtcdResult
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        data = {
+            'value': value
+        }
+        if ttl and ttl > 0:
+            data['ttl'] = int(ttl)
+        return self._request_key(directory, method='post', data=data)
+
+    def mkdir(self, directory, ttl=None):
         """
         Create directory
 
         :param directory: string with directory name
+        :param ttl: Directory TTL in seconds.
         :return: Result of operation.
         :rtype: EtcdResult
         :raise EtcdException: if etcd responds with error or HTTP error
@@ -169,6 +464,8 @@ class Client(object):
             'dir': True,
             'prevExist': False
         }
+        if ttl and ttl > 0:
+            data['ttl'] = int(ttl)
         return self._request_key(directory, method='put', data=data)
 
     def rmdir(self, directory, recursive=False):
@@ -241,6 +538,57 @@ class Client(object):
         return self._request_key(key, method='put',
                                  params=params, data=data)
 
+    def atomic_update(self, key, func, max_retries=10, backoff=0.01):
+        """
+        Read a key, compute a new value and write it back only if the key
+        didn't change in between. Retry with a jittered exponential
+        backoff if it did.
+
+        :param key: the key
+        :param func: Function that takes the current value (None if the key
+            doesn't exist) and returns the new value.
+        :param max_retries: How many times to retry on a conflict.
+        :param backoff: Initial backoff in seconds. It doubles on every
+            retry and the actual sleep is random up to the backoff.
+        :return: Result of the write or of the read if the value
+            didn't change.
+        :rtype: EtcdResult
+        :raise EtcdTestFailed: if the key kept changing after all retries.
+        :raise EtcdNodeExist: if the key kept being created by someone else
+            after all retries.
+        :raise EtcdException: if etcd responds with error or HTTP error.
+        """
+        attempt = 0
+        while True:
+            try:
+                current = self.read(key)
+                value = current.node['value']
+            except EtcdKeyNotFound:
+                current = None
+                value = None
+
+            new_value = func(value)
+            try:
+                if current is None:
+                    return self.compare_and_swap(key, new_value,
+                                                 prev_exist=False)
+                if new_value == value:
+                    return current
+                return self.compare_and_swap(
+                    key, new_value,
+                    prev_index=current.node['modifiedIndex']
+                )
+            except (EtcdTestFailed, EtcdNodeExist):
+                with self._metrics_lock:
+                    self._conflicts += 1
+                    self._count_conflict(key)
+                    if attempt < max_retries:
+                        self._update_retries += 1
+                if attempt >= max_retries:
+                    raise
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+            attempt += 1
+
     def compare_and_delete(self, key, prev_value=None, prev_index=None):
         """
         This command will delete a key only if the client-provided
@@ -268,22 +616,29 @@ class Client(object):
 
         return self._request_key(key, method='delete', params=params)
 
-    def update_ttl(self, key, ttl):
+    def update_ttl(self, key, ttl, prev_value=None, prev_index=None):
         """
         Update key's ttl
 
         :param key: the key
         :param ttl: new ttl
+        :param prev_value: Update only if the key has this value.
+        :param prev_index: Update only if the key has this modifiedIndex.
         :return: Result of operation.
         :rtype: EtcdResult
         :raise EtcdException: if etcd responds with error or HTTP error.
         :raise EtcdKeyNotFound: if the key doesn't exist
+        :raise EtcdTestFailed: if the key has another value or index.
         """
         data = {
             'ttl': ttl,
             'refresh': 'true',
             'prevExist': 'true'
         }
+        if prev_value is not None:
+            data['prevValue'] = prev_value
+        if prev_index is not None:
+            data['prevIndex'] = prev_index
 
         return self._request_key(key, method='put', data=data)
 
@@ -343,28 +698,218 @@ class Client(object):
                     value = str(value).lower()
                 uri += "%s%s=%s" % (sep, param, value)
                 sep = "&"
+            if params.get('wait'):
+                # A watch waits for a change, it isn't a read to share
+                # and its wait says nothing about the load of the node
+                kwargs['coalesce'] = False
+                kwargs['long_poll'] = True
         return self._request_call(uri, method=method, **kwargs)
 
-    def _request_call(self, uri, method='get', **kwargs):
-        if self._allow_reconnect:
-            urls = self._urls
+    def _request_call(self,  # pylint: disable=too-many-arguments
+                      uri, method='get', consistency=None, exclude=None,
+                      coalesce=True, **kwargs):
+        if method == 'get' and not kwargs and coalesce \
+                and self._singleflight:
+            return self._singleflight.do(
+                (uri, consistency, tuple(sorted(exclude or []))),
+                self._send,
+                uri,
+                consistency=consistency,
+                exclude=exclude
+            )
+        return self._send(uri, method=method, consistency=consistency,
+                          exclude=exclude, **kwargs)
+
+    def _send(self, uri, method='get',  # pylint: disable=too-many-arguments
+              consistency=None, exclude=None, result_class=EtcdResult,
+              long_poll=False, **kwargs):
+        tried = set(exclude or [])
+        to_leader = consistency == CONSISTENCY_LEADER
+        if to_leader:
+            urls, uri, to_leader = self._leader_urls(uri, tried)
         else:
-            urls = [self._urls[0]]
+            urls = self._select_urls(consistency, exclude=exclude)
         error_messages = []
-        for endpoint in urls:
+        while urls:
+            endpoint = urls.pop(0)
+            tried.add(endpoint)
             try:
                 url = endpoint + uri
 
-                return EtcdResult(
-                    getattr(self._session, method)(
-                        url,
-                        **kwargs
-                    )
-                )
+                with self._selector.track(endpoint, measure=not long_poll):
+                    try:
+                        result = result_class(
+                            getattr(self._session, method)(
+                                url,
+                                **kwargs
+                            )
+                        )
+                    except EtcdException as err:
+                        err.endpoint = endpoint
+                        raise
+                    except RequestException as err:
+                        # The node is alive but slow. It may have applied
+                        # the request, so it's not safe to retry elsewhere.
+                        if self._is_read_timeout(err):
+                            if not long_poll:
+                                self._selector.forget_leader(endpoint)
+                            raise EtcdTimeout(
+                                "%s: %s" % (endpoint, err)
+                            )
+                        raise
+                    result.endpoint = endpoint
+                    return result
             except RequestException as err:
                 error_messages.append("%s: %s" % (endpoint, err))
+                if to_leader and self._allow_reconnect:
+                    # The leader is down, look for the new one
+                    urls, uri, to_leader = self._leader_urls(uri, tried)
 
         raise EtcdException(
             'No more hosts to connect.\nErrors: %s'
             % '\n'.join(error_messages)
         )
+
+    def _create_session(self, ca_cert, cert, key):
+        """
+        HTTP session that keeps a connection pool per node, so failover
+        between nodes doesn't close connections to the others.
+        """
+        session = requests.Session()
+        pool_kwargs = {
+            'pool_connections': max(len(self._urls), 10),
+            'pool_maxsize': max(self._max_workers, 10),
+        }
+        if self._protocol == 'https':
+            try:
+                self._ssl_context = create_context(ca_cert=ca_cert, cert=cert,
+                                                   key=key)
+            except (IOError, ssl.SSLError) as err:
+                raise ClientException('Failed to load TLS certificates: %s'
+                                      % err)
+            session.mount('https://',
+                          TLSAdapter(self._ssl_context, **pool_kwargs))
+        elif ca_cert or cert:
+            raise ClientException('TLS options require protocol https')
+        else:
+            session.mount('http://', HTTPAdapter(**pool_kwargs))
+        return session
+
+    def _set_auth(self, username, password, auth, token_ttl):
+        if username is None:
+            return
+        if auth not in AUTH_MODES:
+            raise ClientException('Auth %s is unsupported' % auth)
+        if auth == AUTH_BASIC:
+            if self._default_auth != AUTH_BASIC:
+                warnings.warn(
+                    'Basic auth makes etcd check the password on every '
+                    'request. Use token auth unless the cluster serves '
+                    'only the v2 API.',
+                    UserWarning
+                )
+            self._session.auth = HTTPBasicAuth(username, password)
+            return
+
+        def _authenticate():
+            return self._send(
+                '%s/auth/authenticate' % self._gateway_prefix,
+                method='post',
+                json={'name': username, 'password': password},
+                auth=no_auth
+            ).payload['token']
+
+        self._token_auth = TokenAuth(_authenticate, ttl=token_ttl)
+        self._session.auth = self._token_auth
+
+    def _select_urls(self, consistency=None, exclude=None):
+        """
+        Nodes to try in order for a request of given consistency.
+
+        :param consistency: Consistency mode. See :py:meth:`read`.
+        :param exclude: Node URLs that must not serve the request.
+        :return: List of node URLs.
+        :rtype: list(str)
+        """
+        if consistency == CONSISTENCY_LEADER:
+            urls = [self._leader_url()]
+        elif consistency == CONSISTENCY_STALE:
+            urls = self._selector.by_load()
+        else:
+            urls = self._selector.ordered()
+
+        if exclude:
+            urls = [url for url in urls if url not in exclude]
+        if self._allow_reconnect:
+            return urls
+        return urls[:1]
+
+    def _leader_urls(self, uri, exclude):
+        """
+        Nodes to try for a request to the leader.
+
+        :param uri: Request URI.
+        :param exclude: Node URLs that must not serve the request.
+        :return: URL of the leader, the URI and True. If no node is
+            the leader, the other nodes, the URI of a quorum read
+            and False.
+        :rtype: tuple(list(str), str, bool)
+        """
+        try:
+            return [self._leader_url(exclude=exclude)], uri, True
+        except EtcdException:
+            urls = self._select_urls(CONSISTENCY_LINEARIZABLE,
+                                     exclude=exclude)
+            separator = '&' if '?' in uri else '?'
+            return urls, uri + separator + 'quorum=true', False
+
+    def _leader_url(self, exclude=None):
+        """
+        Find the cluster leader among configured nodes.
+        The leader is cached until a request to it fails.
+
+        :param exclude: Node URLs that aren't asked.
+        :return: URL of the leader.
+        :rtype: str
+        :raise EtcdException: if none of the nodes is the leader.
+        """
+        leader = self._selector.leader
+        if leader is not None and leader not in (exclude or []):
+            return leader
+
+        error_messages = []
+        for endpoint in self._selector.ordered():
+            if endpoint in (exclude or []):
+                continue
+            try:
+                stats = EtcdResult(
+                    self._session.get(endpoint + '/v2/stats/self')
+                )
+            except (RequestException, EtcdException) as err:
+                error_messages.append("%s: %s" % (endpoint, err))
+                continue
+            if stats.state == 'StateLeader':
+                self._selector.leader = endpoint
+                return endpoint
+
+        raise EtcdException(
+            'Could not find the leader.\nErrors: %s'
+            % '\n'.join(error_messages)
+        )
+
+    @staticmethod
+    def _is_read_timeout(err):
+        if isinstance(err, ReadTimeout):
+            return True
+        # requests wraps read timeouts while downloading the body
+        # into ConnectionError
+        return bool(err.args) and isinstance(err.args[0], ReadTimeoutError)
+
+    @staticmethod
+    def _check_consistency(consistency):
+        if consistency is not None \
+                and consistency not in CONSISTENCY_MODES:
+            raise ClientException(
+                'Consistency %s is unsupported' % consistency
+            )
+        return consistency
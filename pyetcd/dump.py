@@ -0,0 +1,206 @@
+"""module to export etcd keys to newline-delimited JSON."""
+import gzip
+import io
+import json
+import sys
+from collections import deque
+
+from pyetcd import EtcdKeyNotFound
+from pyetcd.client import ClientException
+
+DUMP_FORMAT = 1
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSIONS = [COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD]
+
+_NODE_FIELDS = ['key', 'value', 'dir', 'ttl', 'expiration',
+                'createdIndex', 'modifiedIndex']
+
+
+class _StandardStream(object):
+    """Binary standard input or output that stays open when closed."""
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def close(self):
+        """Flush the stream, it belongs to the process."""
+        self._stream.flush()
+
+
+def open_dump(path, mode='rb', compression=None):
+    """
+    Open a dump file.
+
+    :param path: File name. ``'-'`` is the standard input or output,
+        closing the returned file object doesn't close it.
+    :param mode: ``'rb'`` to read, ``'wb'`` to write.
+    :param compression: One of 'none', 'gzip' or 'zstd'. If not given
+        it's guessed from the file name extension (``.gz``, ``.zst``).
+        zstd needs the ``zstandard`` package.
+    :return: Binary file object.
+    :raise ClientException: if the compression is unknown or unavailable.
+    """
+    if compression is None:
+        if path.endswith('.gz'):
+            compression = COMPRESSION_GZIP
+        elif path.endswith('.zst'):
+            compression = COMPRESSION_ZSTD
+        else:
+            compression = COMPRESSION_NONE
+    if compression not in COMPRESSIONS:
+        raise ClientException('Unknown compression %s' % compression)
+
+    if path == '-':
+        stream = sys.stdin if mode.startswith('r') else sys.stdout
+        fileobj = _StandardStream(getattr(stream, 'buffer', stream))
+    elif compression == COMPRESSION_GZIP:
+        return gzip.open(path, mode)
+    else:
+        fileobj = open(path, mode)
+
+    if compression == COMPRESSION_GZIP:
+        return gzip.GzipFile(fileobj=fileobj, mode=mode)
+    if compression == COMPRESSION_ZSTD:
+        try:
+            import zstandard  # pylint: disable=import-error
+        except ImportError:
+            raise ClientException(
+                'zstd compression requires the zstandard package'
+            )
+        if mode.startswith('r'):
+            return io.BufferedReader(
+                zstandard.ZstdDecompressor().stream_reader(fileobj)
+            )
+        return zstandard.ZstdCompressor().stream_writer(fileobj)
+    return fileobj
+
+
+def iter_nodes(client, prefix='/', parallel=4):
+    """
+    Walk a directory tree.
+
+    Directories are read one level at a time, so only one level of
+    the tree is in memory. Up to ``parallel`` directories are read
+    concurrently. A parent directory always comes before its children.
+    The first item is the result of the first read, so its
+    ``x_etcd_index`` and ``x_etcd_cluster_id`` are known. Every next
+    item is a node without children.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param prefix: Directory or key to walk.
+    :param parallel: Number of directories read at the same time.
+    :return: Generator of the first read result, then node dictionaries.
+    :raise EtcdException: if etcd responds with error or HTTP error
+    """
+    result = client.read(prefix, sorted=True)
+    yield result
+
+    queue = deque()
+    if result.node.get('dir'):
+        if result.node.get('key'):
+            yield _node_record(result.node)
+        children = result.node.get('nodes', [])
+    else:
+        children = [result.node]
+
+    pending = deque()
+    while True:
+        for child in children:
+            yield _node_record(child)
+            if child.get('dir'):
+                queue.append(child['key'])
+        while queue and len(pending) < parallel:
+            pending.append(client.submit_read(queue.popleft(), sorted=True))
+        if not pending:
+            return
+        try:
+            children = pending.popleft().result().node.get('nodes', [])
+        except EtcdKeyNotFound:
+            children = []
+
+
+def dump(client, fileobj, prefix='/', parallel=4):
+    """
+    Export keys to newline-delimited JSON.
+
+    The first line is a header with the dump format, the prefix,
+    the cluster id and ``x_etcd_index`` of the cluster when the export
+    started.
+    Every next line is a node with its key, value or ``dir``, TTL,
+    expiration and indexes, as etcd returns it. Nodes are written
+    while the tree is walked, see :py:func:`iter_nodes`.
+
+    The export isn't a point in time snapshot: keys changed during
+    the export have ``modifiedIndex`` greater than ``x_etcd_index``.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param fileobj: Binary file object to write to, see :py:func:`open_dump`.
+    :param prefix: Directory or key to export.
+    :param parallel: Number of directories read at the same time.
+    :return: Number of exported nodes.
+    :rtype: int
+    :raise EtcdException: if etcd responds with error or HTTP error
+    """
+    nodes = iter_nodes(client, prefix=prefix, parallel=parallel)
+    result = next(nodes)
+    header = {
+        'format': DUMP_FORMAT,
+        'prefix': prefix,
+        'cluster_id': result.x_etcd_cluster_id,
+        'x_etcd_index': result.x_etcd_index
+    }
+    _write_line(fileobj, header)
+    count = 0
+    for node in nodes:
+        _write_line(fileobj, node)
+        count += 1
+    return count
+
+
+def read_dump(fileobj):
+    """
+    Read a dump written by :py:func:`dump`.
+
+    :param fileobj: Binary file object to read from,
+        see :py:func:`open_dump`.
+    :return: Header dictionary and a generator of node dictionaries.
+        Nodes are read from the file as the generator is consumed.
+    :rtype: tuple(dict, generator)
+    :raise ClientException: if the file isn't a dump.
+    """
+    lines = iter(fileobj)
+    try:
+        header = json.loads(next(lines).decode('utf-8'))
+    except StopIteration:
+        raise ClientException('Dump is empty')
+    except ValueError as err:
+        raise ClientException('Invalid dump header: %s' % err)
+    if not isinstance(header, dict) or header.get('format') != DUMP_FORMAT:
+        raise ClientException('Unsupported dump format')
+
+    def _nodes():
+        for line in lines:
+            if line.strip():
+                yield json.loads(line.decode('utf-8'))
+
+    return header, _nodes()
+
+
+def _node_record(node):
+    return dict(
+        (field, node[field]) for field in _NODE_FIELDS if field in node
+    )
+
+
+def _write_line(fileobj, record):
+    line = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    fileobj.write(line.encode('utf-8') + b'\n')
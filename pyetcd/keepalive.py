@@ -0,0 +1,201 @@
+"""module to keep many keys with TTL alive from one scheduler."""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pyetcd import EtcdException, EtcdKeyNotFound
+from pyetcd.client import ClientException
+
+LOG = logging.getLogger(__name__)
+
+
+class _Entry(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, ttl, value):
+        self.ttl = ttl
+        self.value = value
+
+
+class KeepAliveManager(object):
+    """
+    Refreshes TTL of many keys from a single scheduler thread.
+
+    Keys are kept in a heap ordered by the time of the next refresh.
+    A key is refreshed with :py:meth:`~pyetcd.client.Client.update_ttl`
+    when ``margin`` of its TTL is left. Keys that are due at the same
+    time are refreshed concurrently by a bounded pool of threads.
+    If a refresh fails it's retried after ``retry_interval`` seconds,
+    errors other than :py:class:`~pyetcd.EtcdException` are logged too.
+    If the key is gone it's written again with the value given
+    to :py:meth:`add`. If there is no value the key is dropped
+    and ``on_lost`` is called with it.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param margin: Fraction of TTL that is left when the key is refreshed.
+    :param retry_interval: Seconds before retrying a failed refresh.
+    :param max_workers: Number of concurrent refresh requests.
+    :param on_lost: Function that is called with the key if it's lost.
+    """
+    def __init__(self, client, margin=1 / 3.0, retry_interval=1.0,
+                 max_workers=16, on_lost=None):
+        self._client = client
+        self._margin = margin
+        self._retry_interval = retry_interval
+        self._on_lost = on_lost
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._entries = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._refresh_lag = 0.0
+        self._max_refresh_lag = 0.0
+        self._refreshed = 0
+        self._failed = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def refresh_lag(self):
+        """Seconds the latest refresh started after it was due."""
+        return self._refresh_lag
+
+    @property
+    def max_refresh_lag(self):
+        """The largest refresh lag seen so far in seconds."""
+        return self._max_refresh_lag
+
+    @property
+    def refreshed(self):
+        """Number of successful refreshes."""
+        return self._refreshed
+
+    @property
+    def failed(self):
+        """Number of failed refreshes."""
+        return self._failed
+
+    def add(self, key, ttl, value=None):
+        """
+        Start refreshing a key. The key must already exist in etcd.
+
+        :param key: Key
+        :param ttl: Key TTL in seconds.
+        :param value: Value to write if the key is lost.
+            If None the key is dropped when it's lost.
+        :raise ClientException: if the manager is closed.
+        """
+        entry = _Entry(ttl, value)
+        with self._condition:
+            if self._closed:
+                raise ClientException('Keepalive manager is closed')
+            self._entries[key] = entry
+            self._schedule(key, entry, time.time() + self._interval(ttl))
+
+    def remove(self, key):
+        """
+        Stop refreshing a key. The key isn't deleted from etcd.
+
+        :param key: Key
+        """
+        with self._condition:
+            self._entries.pop(key, None)
+
+    def close(self):
+        """Stop refreshing all keys."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._entries.clear()
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown()
+
+    def _interval(self, ttl):
+        return ttl * (1 - self._margin)
+
+    def _schedule(self, key, entry, due):
+        heapq.heappush(self._heap, (due, next(self._counter), key, entry))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = []
+                while not batch:
+                    if self._closed:
+                        return
+                    now = time.time()
+                    while self._heap and self._heap[0][0] <= now:
+                        due, _, key, entry = heapq.heappop(self._heap)
+                        # Skip keys that were removed or added again
+                        if self._entries.get(key) is entry:
+                            batch.append((due, key, entry))
+                    if not batch:
+                        timeout = None
+                        if self._heap:
+                            timeout = self._heap[0][0] - now
+                        self._condition.wait(timeout)
+
+            for due, key, entry in batch:
+                self._executor.submit(self._refresh, due, key, entry)
+
+    def _refresh(self, due, key, entry):
+        started = time.time()
+        next_due = started + self._interval(entry.ttl)
+        failed = False
+        try:
+            try:
+                self._client.update_ttl(key, entry.ttl)
+            except EtcdKeyNotFound:
+                if entry.value is None:
+                    self._lose(key, entry)
+                    return
+                self._client.write(key, entry.value, ttl=entry.ttl)
+        except EtcdException:
+            failed = True
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('Failed to refresh %s', key)
+            failed = True
+        if failed:
+            next_due = started + min(self._retry_interval,
+                                     self._interval(entry.ttl))
+
+        with self._condition:
+            self._refresh_lag = max(started - due, 0.0)
+            self._max_refresh_lag = max(self._max_refresh_lag,
+                                        self._refresh_lag)
+            if failed:
+                self._failed += 1
+            else:
+                self._refreshed += 1
+            if self._entries.get(key) is entry:
+                self._schedule(key, entry, next_due)
+
+    def _lose(self, key, entry):
+        with self._condition:
+            if self._entries.get(key) is not entry:
+                return
+            del self._entries[key]
+        if self._on_lost is not None:
+            try:
+                self._on_lost(key)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Lost key callback failed on %s', key)
@@ -0,0 +1,187 @@
+"""module to keep many etcd v3 leases alive from one loop."""
+import logging
+import threading
+import time
+
+from pyetcd import EtcdException
+from pyetcd.client import ClientException
+
+LOG = logging.getLogger(__name__)
+
+
+class _Lease(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, ttl, due):
+        self.ttl = ttl
+        self.due = due
+
+
+class LeaseKeepAlive(object):
+    """
+    Refreshes many v3 leases from a single thread.
+
+    A lease is due for a refresh when ``margin`` of its TTL is left.
+    When a lease is due, every lease that is at least half way to its
+    own refresh is refreshed too, so leases share keepalive requests.
+    All of them go in one :py:meth:`~pyetcd.v3.V3Client.lease_keepalive`
+    request per ``batch_size`` leases. Attach many keys to one lease
+    to keep them all alive with a single request per refresh.
+
+    If a refresh fails it's retried after ``retry_interval`` seconds,
+    errors other than :py:class:`~pyetcd.EtcdException` are logged too.
+    If etcd reports a lease has expired it's dropped and ``on_lost``
+    is called with its ID.
+
+    :param client: v3 client.
+    :type client: pyetcd.v3.V3Client
+    :param margin: Fraction of TTL that is left when the lease
+        is refreshed.
+    :param retry_interval: Seconds before retrying a failed refresh.
+    :param batch_size: Maximum number of leases in one request.
+    :param on_lost: Function that is called with the lease ID
+        if it's lost.
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 client, margin=1 / 3.0, retry_interval=1.0,
+                 batch_size=1000, on_lost=None):
+        self._client = client
+        self._margin = margin
+        self._retry_interval = retry_interval
+        self._batch_size = batch_size
+        self._on_lost = on_lost
+        self._leases = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._refreshed = 0
+        self._failed = 0
+        self._requests = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._leases)
+
+    def __contains__(self, lease_id):
+        return lease_id in self._leases
+
+    @property
+    def refreshed(self):
+        """Number of successful lease refreshes."""
+        return self._refreshed
+
+    @property
+    def failed(self):
+        """Number of failed keepalive requests."""
+        return self._failed
+
+    @property
+    def requests(self):
+        """Number of keepalive requests sent."""
+        return self._requests
+
+    def add(self, lease_id, ttl):
+        """
+        Start refreshing a lease.
+
+        :param lease_id: Lease ID.
+        :param ttl: Lease TTL in seconds.
+        :raise ClientException: if the keepalive loop is closed.
+        """
+        with self._condition:
+            if self._closed:
+                raise ClientException('Lease keepalive is closed')
+            self._leases[lease_id] = _Lease(
+                ttl, time.time() + self._interval(ttl)
+            )
+            self._condition.notify()
+
+    def remove(self, lease_id):
+        """
+        Stop refreshing a lease. The lease isn't revoked.
+
+        :param lease_id: Lease ID.
+        """
+        with self._condition:
+            self._leases.pop(lease_id, None)
+
+    def close(self):
+        """Stop refreshing all leases."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._leases.clear()
+            self._condition.notify()
+        self._thread.join()
+
+    def _interval(self, ttl):
+        return ttl * (1 - self._margin)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = []
+                while not batch:
+                    if self._closed:
+                        return
+                    now = time.time()
+                    next_due = min([lease.due
+                                    for lease in self._leases.values()]
+                                   or [None])
+                    if next_due is not None and next_due <= now:
+                        batch = [
+                            lease_id
+                            for lease_id, lease in self._leases.items()
+                            if lease.due - self._interval(lease.ttl) / 2
+                            <= now
+                        ]
+                    else:
+                        self._condition.wait(
+                            None if next_due is None else next_due - now
+                        )
+
+            for start in range(0, len(batch), self._batch_size):
+                self._refresh(batch[start:start + self._batch_size])
+
+    def _refresh(self, lease_ids):
+        started = time.time()
+        try:
+            ttls = self._client.lease_keepalive(*lease_ids)
+        except EtcdException:
+            ttls = None
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('Failed to refresh leases %s', lease_ids)
+            ttls = None
+
+        lost = []
+        with self._condition:
+            self._requests += 1
+            if ttls is None:
+                self._failed += 1
+            for lease_id in lease_ids:
+                lease = self._leases.get(lease_id)
+                if lease is None:
+                    continue
+                if ttls is None:
+                    lease.due = started + min(self._retry_interval,
+                                              self._interval(lease.ttl))
+                elif ttls.get(lease_id, 0) > 0:
+                    self._refreshed += 1
+                    lease.due = started + self._interval(lease.ttl)
+                else:
+                    del self._leases[lease_id]
+                    lost.append(lease_id)
+
+        if self._on_lost is not None:
+            for lease_id in lost:
+                try:
+                    self._on_lost(lease_id)
+                except Exception:  # pylint: disable=broad-except
+                    LOG.exception('Lost lease callback failed on %s',
+                                  lease_id)
@@ -0,0 +1,184 @@
+"""module to copy keys from the etcd v2 keys API to etcd v3."""
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from pyetcd import EtcdException
+from pyetcd.checkpoint import Checkpoint
+from pyetcd.client import ClientException
+from pyetcd.dump import iter_nodes
+from pyetcd.txn import put
+
+MigrationReport = namedtuple(
+    'MigrationReport',
+    ['migrated', 'skipped', 'failed',
+     'source_count', 'source_hash', 'target_count', 'target_hash',
+     'verified']
+)
+
+
+class _KeyHash(object):
+    """
+    Order independent hash of key-value pairs.
+    """
+    def __init__(self):
+        self.count = 0
+        self._sum = 0
+
+    def add(self, key, value):
+        digest = hashlib.sha256()
+        for data in (key, b'\0', value):
+            digest.update(data if isinstance(data, bytes)
+                          else data.encode('utf-8'))
+        self._sum = (self._sum + int(digest.hexdigest(), 16)) % 2 ** 256
+        self.count += 1
+
+    @property
+    def hexdigest(self):
+        return '%064x' % self._sum
+
+
+class _Migration(object):  # pylint: disable=too-many-instance-attributes
+    def __init__(self, target, parallel, checkpoint, source):
+        self._target = target
+        self._executor = ThreadPoolExecutor(max_workers=parallel)
+        self._slots = threading.BoundedSemaphore(parallel)
+        self._checkpoint = Checkpoint(checkpoint, source)
+        self._lock = threading.Lock()
+        self._migrated = 0
+        self._failed = []
+        self.skipped = 0
+        self.source_hash = _KeyHash()
+
+    def run(self, items, batch_size, checkpoint_interval):
+        try:
+            for position, batch in enumerate(
+                    self._batches(items, batch_size), 1):
+                if position <= self._checkpoint.position:
+                    continue
+                self._slots.acquire()
+                future = self._executor.submit(self._put, position, batch)
+                future.add_done_callback(self._release)
+                if position % checkpoint_interval == 0:
+                    self._checkpoint.save()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._checkpoint.save()
+        return self._migrated, list(self._failed)
+
+    def _batches(self, items, batch_size):
+        batch = []
+        for key, value in items:
+            self.source_hash.add(key, value)
+            batch.append((key, value))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _release(self, _):
+        self._slots.release()
+
+    def _put(self, position, batch):
+        try:
+            self._target.txn().then(
+                *[put(key, value) for key, value in batch]
+            ).commit()
+        except (EtcdException, ClientException):
+            with self._lock:
+                self._failed.extend(key for key, _ in batch)
+            return
+        with self._lock:
+            self._migrated += len(batch)
+        self._checkpoint.finish(position)
+
+
+def migrate(  # pylint: disable=too-many-arguments,too-many-locals
+        source, target,
+        prefix='/', target_prefix=None, batch_size=100, parallel=8,
+        checkpoint=None, checkpoint_interval=100, verify=True):
+    """
+    Copy keys of a v2 directory to etcd v3.
+
+    The v2 tree is walked one directory level at a time, see
+    :py:func:`pyetcd.dump.iter_nodes`. Directories become key prefixes:
+    ``/app/db/port`` is put as the v3 key ``/app/db/port``, or under
+    ``target_prefix`` if it's given. Empty directories aren't copied,
+    keys with a TTL are ephemeral and are skipped.
+
+    Keys are put in transactions of ``batch_size`` keys sent through the
+    v3 JSON gateway (``/v3/kv/txn``) by up to ``parallel`` concurrent
+    requests. etcd limits the number of operations in a transaction
+    (``--max-txn-ops``, 128 by default).
+
+    With a checkpoint file the number of finished transactions is saved,
+    and a migration of the same prefixes resumes after them. The v2
+    directory shouldn't change while it's migrated, otherwise a resumed
+    migration may skip keys; the verification detects it.
+
+    To verify, all keys under the target prefix are read back and their
+    number and an order independent hash of keys and values are compared
+    with the migrated ones.
+
+    :param source: Client of the v2 cluster.
+    :type source: pyetcd.client.Client
+    :param target: Client of the v3 cluster.
+    :type target: pyetcd.v3.V3Client
+    :param prefix: v2 directory to migrate.
+    :param target_prefix: v3 key prefix. Default is ``prefix``.
+    :param batch_size: Number of keys in a transaction.
+    :param parallel: Number of concurrent transactions.
+    :param checkpoint: Checkpoint file name.
+    :param checkpoint_interval: Number of transactions between
+        checkpoint saves.
+    :param verify: Read migrated keys back and compare them.
+    :return: Number of migrated and skipped keys, keys that failed,
+        the number and hash of keys in the source and in the target
+        and whether they match. The target figures and ``verified``
+        are None if ``verify`` is False.
+    :rtype: MigrationReport
+    :raise EtcdException: if etcd responds with error or HTTP error
+        when the source is read.
+    :raise ClientException: if the checkpoint is from another migration.
+    """
+    prefix = prefix.rstrip('/')
+    if target_prefix is None:
+        target_prefix = prefix
+    target_prefix = target_prefix.rstrip('/')
+
+    migration = _Migration(target, parallel, checkpoint,
+                           [prefix, target_prefix])
+
+    def _items():
+        nodes = iter_nodes(source, prefix=prefix or '/', parallel=parallel)
+        # Skip the read result that comes first
+        next(nodes, None)
+        for node in nodes:
+            if node.get('dir'):
+                continue
+            if node.get('ttl'):
+                migration.skipped += 1
+                continue
+            yield target_prefix + node['key'][len(prefix):], node['value']
+
+    migrated, failed = migration.run(_items(), batch_size,
+                                     checkpoint_interval)
+
+    source_hash = migration.source_hash
+    target_count = target_hash = verified = None
+    if verify:
+        key_hash = _KeyHash()
+        for item in target.iter_range(target_prefix + '/', prefix=True):
+            key_hash.add(item.key, item.value)
+        target_count, target_hash = key_hash.count, key_hash.hexdigest
+        verified = (target_count, target_hash) \
+            == (source_hash.count, source_hash.hexdigest)
+
+    return MigrationReport(
+        migrated=migrated, skipped=migration.skipped, failed=failed,
+        source_count=source_hash.count, source_hash=source_hash.hexdigest,
+        target_count=target_count, target_hash=target_hash,
+        verified=verified
+    )
@@ -0,0 +1,54 @@
+"""module to limit the rate of requests."""
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Token bucket rate limiter.
+
+    Tokens are added at ``rate`` per second up to ``burst``.
+    :py:meth:`acquire` takes tokens and blocks until enough
+    of them are available. The limiter is thread safe.
+
+    :param rate: Tokens per second.
+    :param burst: Maximum number of tokens in the bucket.
+        Default is ``rate`` but at least one.
+    """
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('Rate must be positive, got %r' % rate)
+        self._rate = float(rate)
+        self._burst = burst or max(rate, 1)
+        self._tokens = float(self._burst)
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """Tokens per second."""
+        return self._rate
+
+    def acquire(self, tokens=1):
+        """
+        Take tokens from the bucket, wait until they're available.
+
+        :param tokens: Number of tokens.
+        :return: Seconds spent waiting.
+        :rtype: float
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(
+                    self._burst,
+                    self._tokens + (now - self._updated_at) * self._rate
+                )
+                self._updated_at = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self._rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,10 @@
+"""Distributed synchronization and configuration recipes built on etcd."""
+from pyetcd.recipes.barrier import Barrier
+from pyetcd.recipes.config import ConfigTree, ConfigSnapshot, ConfigDiff
+from pyetcd.recipes.counter import ShardedCounter
+from pyetcd.recipes.election import Election
+from pyetcd.recipes.lock import Lock, FairLock
+from pyetcd.recipes.queue import Queue, QueueItem, ClaimLost
+from pyetcd.recipes.registry import ServiceRegistry
+from pyetcd.recipes.semaphore import Semaphore
+from pyetcd.recipes.sequence import SequenceGenerator
@@ -0,0 +1,140 @@
+"""module with distributed barrier recipe."""
+import time
+
+from pyetcd import EtcdNodeExist, EtcdKeyNotFound, EtcdTimeout, \
+    EtcdEventIndexCleared, EtcdEmptyResponse
+from pyetcd.client import CONSISTENCY_LINEARIZABLE
+from pyetcd.recipes.lock import TTLRefresher, next_index
+
+
+class Barrier(object):
+    """
+    Distributed barrier that blocks participants until ``parties``
+    of them are waiting.
+
+    A participant appends an in-order key with a TTL to
+    ``<directory>/waiting``, so participants that crash are cleaned up.
+    The participant that sees enough waiting keys creates
+    ``<directory>/ready``. Everybody else watches only the ready key,
+    so each participant is woken up exactly once when the barrier opens.
+
+    The barrier stays open until :py:meth:`reset` is called.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Barrier directory.
+    :param parties: Number of participants to wait for.
+    :param ttl: Participant key TTL in seconds.
+    """
+    def __init__(self, client, directory, parties, ttl=30):
+        self._client = client
+        self._directory = directory.rstrip('/')
+        self._waiting = self._directory + '/waiting'
+        self._ready = self._directory + '/ready'
+        self._parties = parties
+        self._ttl = ttl
+
+    def wait(self, timeout=None):
+        """
+        Wait until ``parties`` participants are waiting.
+
+        :param timeout: Seconds to wait. By default waits forever.
+        :return: True if the barrier is open, False on timeout.
+        :rtype: bool
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        key = self._client.append(self._waiting, 'waiting',
+                                  ttl=self._ttl).node['key']
+        refresher = TTLRefresher(self._client, key, self._ttl,
+                                 value='waiting')
+        refresher.start()
+        try:
+            while True:
+                index = self._check()
+                if index is None:
+                    return True
+                ready = self._wait_ready(index, deadline)
+                if ready is not None:
+                    return ready
+        finally:
+            refresher.stop()
+            try:
+                self._client.delete(key)
+            except EtcdKeyNotFound:
+                pass
+
+    @property
+    def is_open(self):
+        """
+        True if the barrier is open.
+
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        try:
+            self._client.read(self._ready)
+            return True
+        except EtcdKeyNotFound:
+            return False
+
+    def reset(self):
+        """
+        Close the barrier so it can be used again.
+
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        try:
+            self._client.rmdir(self._directory, recursive=True)
+        except EtcdKeyNotFound:
+            pass
+
+    def _check(self):
+        """
+        Open the barrier if enough participants are waiting.
+
+        :return: None if the barrier is open, otherwise index to watch
+            the ready key from.
+        """
+        # A quorum read always sees our own participant key
+        result = self._client.read(self._directory, recursive=True,
+                                   consistency=CONSISTENCY_LINEARIZABLE)
+        waiting = 0
+        for node in result.node.get('nodes', []):
+            if node['key'] == self._ready:
+                return None
+            if node['key'] == self._waiting:
+                waiting = len(node.get('nodes', []))
+
+        if waiting < self._parties:
+            return next_index(result)
+        try:
+            self._client.compare_and_swap(self._ready, 'ready',
+                                          prev_exist=False)
+        except EtcdNodeExist:
+            pass
+        return None
+
+    def _wait_ready(self, index, deadline):
+        """
+        Wait for the ready key.
+
+        :return: True if the ready key is created, False on timeout,
+            None if the barrier must be checked again.
+        """
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return False
+            try:
+                event = self._client.watch(self._ready, wait_index=index,
+                                           timeout=timeout)
+            except EtcdTimeout:
+                return False
+            except (EtcdEventIndexCleared, EtcdEmptyResponse):
+                return None
+
+            if 'value' in event.node:
+                return True
+            index = event.node['modifiedIndex'] + 1
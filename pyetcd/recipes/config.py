@@ -0,0 +1,359 @@
+"""module with typed configuration tree recipe."""
+import json
+import logging
+import re
+import threading
+from collections import namedtuple
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from pyetcd.recipes.lock import RELEASE_ACTIONS
+from pyetcd.recipes.watcher import DirectoryWatcher
+
+LOG = logging.getLogger(__name__)
+
+ConfigDiff = namedtuple('ConfigDiff', ['added', 'changed', 'removed'])
+
+_DURATION_UNITS = {
+    'ms': 0.001,
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+}
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h|d)')
+_BOOLEANS = {
+    'true': True, 'yes': True, 'on': True, '1': True,
+    'false': False, 'no': False, 'off': False, '0': False,
+}
+_MISSING = object()
+
+
+def parse_duration(text):
+    """
+    Parse a duration like ``'90'``, ``'1.5s'``, ``'250ms'`` or ``'1h30m'``.
+
+    :param text: Duration. A plain number is seconds.
+    :return: Duration in seconds.
+    :rtype: float
+    :raise ValueError: if the text isn't a duration.
+    """
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(text)
+    if not parts or ''.join(number + unit for number, unit in parts) != text:
+        raise ValueError('Invalid duration %r' % text)
+    return sum(float(number) * _DURATION_UNITS[unit]
+               for number, unit in parts)
+
+
+def _index_directories(paths):
+    """
+    :param paths: Relative paths of keys.
+    :return: Dictionary directory prefix -> set of names in it,
+        ``''`` is the root directory.
+    """
+    directories = {'': set()}
+    for path in paths:
+        prefix = ''
+        for name in path.split('/'):
+            directories.setdefault(prefix, set()).add(name)
+            prefix += name + '/'
+    return directories
+
+
+def parse_bool(text):
+    """
+    Parse a boolean like ``'true'``, ``'no'``, ``'on'`` or ``'0'``.
+
+    :rtype: bool
+    :raise ValueError: if the text isn't a boolean.
+    """
+    try:
+        return _BOOLEANS[text.strip().lower()]
+    except KeyError:
+        raise ValueError('Invalid boolean %r' % text)
+
+
+class ConfigValue(object):
+    """
+    Configuration value parsed into every supported type when it's
+    loaded, so accessors don't parse it again.
+
+    :param raw: Value of the key.
+    """
+    __slots__ = ('raw', '_parsed')
+
+    _parsers = (
+        ('int', int),
+        ('float', float),
+        ('bool', parse_bool),
+        ('duration', parse_duration),
+        ('json', json.loads),
+    )
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._parsed = {}
+        for kind, parser in self._parsers:
+            try:
+                self._parsed[kind] = parser(raw)
+            except (ValueError, TypeError) as err:
+                self._parsed[kind] = ValueError(
+                    'Value %r is not %s: %s' % (raw, kind, err)
+                )
+
+    def __eq__(self, other):
+        return isinstance(other, ConfigValue) and self.raw == other.raw
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    def __repr__(self):
+        return 'ConfigValue(%r)' % self.raw
+
+    def as_type(self, kind):
+        """
+        :param kind: One of 'int', 'float', 'bool', 'duration', 'json'.
+        :return: The value of the type.
+        :raise ValueError: if the value isn't of the type.
+        """
+        value = self._parsed[kind]
+        if isinstance(value, ValueError):
+            raise value
+        return value
+
+
+class ConfigSnapshot(Mapping):
+    """
+    Immutable copy of a configuration directory.
+
+    It's a nested read-only mapping: a subdirectory is
+    a :py:class:`ConfigSnapshot`, a key is its string value.
+    Typed accessors take a path relative to the snapshot,
+    e.g. ``snapshot.get_int('db/port')``.
+
+    :param values: Dictionary relative path -> :py:class:`ConfigValue`.
+    :param index: etcd index the snapshot corresponds to.
+    :param prefix: Path of this snapshot relative to the root one.
+    :param directories: Directory prefix -> names in it. The root
+        snapshot builds it once and shares it with nested ones.
+    """
+    def __init__(self, values, index=None, prefix='', directories=None):
+        self._values = values
+        self.index = index
+        self._prefix = prefix
+        if directories is None:
+            directories = _index_directories(values)
+        self._directories = directories
+        self._children = directories.get(prefix, frozenset())
+
+    def __getitem__(self, name):
+        if name not in self._children:
+            raise KeyError(name)
+        path = self._prefix + name
+        if path in self._values:
+            return self._values[path].raw
+        return ConfigSnapshot(self._values, self.index, path + '/',
+                              self._directories)
+
+    def __iter__(self):
+        return iter(sorted(self._children))
+
+    def __len__(self):
+        return len(self._children)
+
+    def __repr__(self):
+        return 'ConfigSnapshot(%r)' % dict(self)
+
+    def flat(self):
+        """
+        :return: Dictionary relative path -> string value of all keys
+            in the snapshot.
+        :rtype: dict
+        """
+        return dict(
+            (path[len(self._prefix):], value.raw)
+            for path, value in self._values.items()
+            if path.startswith(self._prefix)
+        )
+
+    def get_str(self, path, default=_MISSING):
+        """
+        :return: String value of a key.
+        :raise KeyError: if the key doesn't exist and there is no default.
+        """
+        return self._get(path, None, default)
+
+    def get_int(self, path, default=_MISSING):
+        """
+        :return: Integer value of a key.
+        :raise KeyError: if the key doesn't exist and there is no default.
+        :raise ValueError: if the value isn't an integer.
+        """
+        return self._get(path, 'int', default)
+
+    def get_float(self, path, default=_MISSING):
+        """
+        :return: Float value of a key.
+        :raise KeyError: if the key doesn't exist and there is no default.
+        :raise ValueError: if the value isn't a number.
+        """
+        return self._get(path, 'float', default)
+
+    def get_bool(self, path, default=_MISSING):
+        """
+        :return: Boolean value of a key. See :py:func:`parse_bool`.
+        :raise KeyError: if the key doesn't exist and there is no default.
+        :raise ValueError: if the value isn't a boolean.
+        """
+        return self._get(path, 'bool', default)
+
+    def get_duration(self, path, default=_MISSING):
+        """
+        :return: Duration in seconds. See :py:func:`parse_duration`.
+        :raise KeyError: if the key doesn't exist and there is no default.
+        :raise ValueError: if the value isn't a duration.
+        """
+        return self._get(path, 'duration', default)
+
+    def get_json(self, path, default=_MISSING):
+        """
+        :return: Decoded JSON value of a key. Don't modify it, it's
+            shared by all readers of the snapshot.
+        :raise KeyError: if the key doesn't exist and there is no default.
+        :raise ValueError: if the value isn't valid JSON.
+        """
+        return self._get(path, 'json', default)
+
+    def _get(self, path, kind, default):
+        try:
+            value = self._values[self._prefix + path.strip('/')]
+        except KeyError:
+            if default is _MISSING:
+                raise
+            return default
+        if kind is None:
+            return value.raw
+        return value.as_type(kind)
+
+
+class ConfigTree(DirectoryWatcher):
+    """
+    Configuration loaded from an etcd directory.
+
+    :py:attr:`snapshot` is an immutable :py:class:`ConfigSnapshot`.
+    Values are parsed into typed values once when they're loaded.
+    A recursive watch builds a new snapshot on every change and replaces
+    the old one in one assignment, so application threads read
+    configuration without locks and without etcd requests.
+    Subscribers are called with the new snapshot and
+    a :py:class:`ConfigDiff` of relative paths. An error
+    of a subscriber is logged and doesn't affect other subscribers.
+
+    ::
+
+        with ConfigTree(client, '/config/app') as config:
+            port = config.snapshot.get_int('db/port')
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Configuration directory.
+    :param watch_timeout: Seconds after which a watch request
+        is restarted.
+    :param retry_interval: Seconds to wait after a failed watch.
+    """
+    def __init__(self, client, directory, watch_timeout=60,
+                 retry_interval=1):
+        super(ConfigTree, self).__init__(client, directory,
+                                         watch_timeout=watch_timeout,
+                                         retry_interval=retry_interval)
+        self._snapshot = ConfigSnapshot({})
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+
+    @property
+    def snapshot(self):
+        """The latest configuration snapshot."""
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """
+        Call a function on every configuration change.
+
+        :param callback: Function that takes the new snapshot
+            and the :py:class:`ConfigDiff`.
+        """
+        with self._subscribers_lock:
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        """
+        Stop calling a function on configuration changes.
+
+        :param callback: Function passed to :py:meth:`subscribe`.
+        """
+        with self._subscribers_lock:
+            self._subscribers = [
+                subscriber for subscriber in self._subscribers
+                if subscriber is not callback
+            ]
+
+    def _on_load(self, nodes):
+        values = {}
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node.get('dir'):
+                stack.extend(node.get('nodes', []))
+            else:
+                values[self._relative_path(node['key'])] = \
+                    ConfigValue(node['value'])
+        self._swap(values)
+
+    def _on_event(self, event):
+        path = self._relative_path(event.node['key'])
+        values = self._snapshot._values  # pylint: disable=protected-access
+        if event.action in RELEASE_ACTIONS:
+            if not path:
+                # The directory itself is gone
+                values = {}
+            else:
+                values = dict(
+                    (key, value) for key, value in values.items()
+                    if key != path and not key.startswith(path + '/')
+                )
+        elif not event.node.get('dir') and 'value' in event.node:
+            values = dict(values)
+            values[path] = ConfigValue(event.node['value'])
+        self._swap(values)
+
+    def _swap(self, values):
+        old = self._snapshot._values  # pylint: disable=protected-access
+        snapshot = ConfigSnapshot(values, index=self._index)
+        self._snapshot = snapshot
+
+        diff = ConfigDiff(
+            added=sorted(set(values) - set(old)),
+            changed=sorted(
+                path for path in set(values) & set(old)
+                if values[path] != old[path]
+            ),
+            removed=sorted(set(old) - set(values))
+        )
+        if diff.added or diff.changed or diff.removed:
+            for subscriber in self._subscribers:
+                try:
+                    subscriber(snapshot, diff)
+                except Exception:  # pylint: disable=broad-except
+                    LOG.exception('Config subscriber %r of %s failed',
+                                  subscriber, self._directory)
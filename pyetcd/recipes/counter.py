@@ -0,0 +1,163 @@
+"""module with sharded counter recipe."""
+import random
+import time
+import zlib
+
+from pyetcd import EtcdKeyNotFound, EtcdTestFailed
+
+
+class ShardedCounter(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Counter that spreads increments over several shard keys
+    in ``<directory>/shards``, so concurrent increments rarely
+    conflict on the same key.
+
+    The counter value is the sum of all shards and is read with one
+    recursive read. The number of shards is stored in
+    ``<directory>/size`` and can be changed online with
+    :py:meth:`resize`. Every instance reads it again
+    ``refresh_interval`` seconds after the last read. Instances that use
+    an outdated number of shards meanwhile stay correct because every
+    shard is summed up.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Counter directory.
+    :param shards: Number of shards used if ``<directory>/size``
+        doesn't exist.
+    :param client_id: If given, the instance always increments
+        the same shard chosen by the identifier. Otherwise the shard
+        is random.
+    :param refresh_interval: Seconds between reads of the number
+        of shards. If None it's read only by :py:meth:`refresh`.
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 client, directory, shards=8, client_id=None,
+                 refresh_interval=30):
+        self._client = client
+        self._directory = directory.rstrip('/')
+        self._shards_dir = self._directory + '/shards'
+        self._size_key = self._directory + '/size'
+        self._shards = shards
+        self._client_id = client_id
+        self._refresh_interval = refresh_interval
+        self._refreshed_at = None
+
+    @property
+    def shards(self):
+        """Number of shards the instance increments."""
+        return self._shards
+
+    def increment(self, delta=1):
+        """
+        Add ``delta`` to the counter.
+
+        :param delta: Integer to add. It may be negative.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        if self._refresh_interval is not None \
+                and (self._refreshed_at is None
+                     or time.time() - self._refreshed_at
+                     >= self._refresh_interval):
+            self.refresh()
+        self._add(self._shard_key(self._pick()), delta)
+
+    def decrement(self, delta=1):
+        """
+        Subtract ``delta`` from the counter.
+
+        :param delta: Integer to subtract.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        self.increment(-delta)
+
+    @property
+    def value(self):
+        """
+        Sum of all shards.
+
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        return sum(int(node['value']) for node in self._shard_nodes())
+
+    def refresh(self):
+        """
+        Load the number of shards from etcd.
+
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        self._refreshed_at = time.time()
+        try:
+            self._shards = int(self._client.read(self._size_key).node['value'])
+        except EtcdKeyNotFound:
+            pass
+
+    def resize(self, shards):
+        """
+        Change the number of shards. Values of removed shards are added
+        to the remaining ones. While they move the counter value may be
+        temporarily higher.
+
+        A value is first added to the remaining shard and then
+        subtracted from the removed one, so it's never lost. The removed
+        shard is deleted once it holds zero. Concurrent increments of
+        the removed shard are moved the same way.
+
+        :param shards: New number of shards.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        self._client.write(self._size_key, shards)
+        self._shards = shards
+        self._refreshed_at = time.time()
+        for node in self._shard_nodes():
+            shard = int(node['key'].rsplit('/', 1)[-1])
+            if shard >= shards:
+                self._move(node, self._shard_key(shard % shards))
+
+    def _move(self, node, target):
+        """
+        Move the value of a removed shard node to the target shard key
+        and delete the node.
+        """
+        while True:
+            value = int(node['value'])
+            if value != 0:
+                self._add(target, value)
+                node = self._add(node['key'], -value).node
+                continue
+            try:
+                self._client.compare_and_delete(
+                    node['key'], prev_index=node['modifiedIndex']
+                )
+                return
+            except EtcdTestFailed:
+                # Incremented meanwhile
+                pass
+            except EtcdKeyNotFound:
+                return
+            try:
+                node = self._client.read(node['key']).node
+            except EtcdKeyNotFound:
+                return
+
+    def _add(self, key, delta):
+        return self._client.atomic_update(
+            key, lambda value: str(int(value or 0) + delta)
+        )
+
+    def _shard_key(self, shard):
+        return '%s/%d' % (self._shards_dir, shard)
+
+    def _pick(self):
+        if self._client_id is None:
+            return random.randrange(self._shards)
+        return (zlib.crc32(str(self._client_id).encode('utf-8'))
+                & 0xffffffff) % self._shards
+
+    def _shard_nodes(self):
+        try:
+            result = self._client.read(self._shards_dir, recursive=True)
+        except EtcdKeyNotFound:
+            return []
+        return [node for node in result.node.get('nodes', [])
+                if not node.get('dir')]
@@ -0,0 +1,59 @@
+"""module with leader election recipe."""
+from pyetcd import EtcdKeyNotFound
+from pyetcd.recipes.lock import FairLock
+
+
+class Election(FairLock):
+    """
+    Leader election. Candidates become leaders in the order
+    they start the campaign. A candidate watches only the candidate
+    right before it, so a resignation wakes up just the next one.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Election directory.
+    :param value: Candidate identity, e.g. its address.
+        It's what :py:meth:`leader` returns.
+    :param ttl: Candidate key TTL in seconds.
+    """
+    def __init__(self, client, directory, value, ttl=30):
+        super(Election, self).__init__(client, directory,
+                                       ttl=ttl, value=value)
+
+    @property
+    def is_leader(self):
+        """True if this candidate is the leader."""
+        return self.is_acquired
+
+    def campaign(self, timeout=None):
+        """
+        Wait until this candidate becomes the leader.
+
+        :param timeout: Seconds to wait. By default waits forever.
+        :return: True if the candidate is the leader.
+        :rtype: bool
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        return self.acquire(timeout=timeout)
+
+    def resign(self):
+        """
+        Give up leadership.
+
+        :raise RuntimeError: if the candidate isn't the leader.
+        """
+        self.release()
+
+    def leader(self):
+        """
+        :return: Value of the current leader or None if there is
+            no leader.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        try:
+            candidates, _ = self._contenders()
+        except EtcdKeyNotFound:
+            return None
+        if candidates:
+            return candidates[0]['value']
+        return None
@@ -0,0 +1,359 @@
+"""module with distributed lock recipes."""
+import threading
+import time
+import uuid
+
+from pyetcd import EtcdNodeExist, EtcdKeyNotFound, EtcdTestFailed, \
+    EtcdEventIndexCleared, EtcdEmptyResponse, EtcdTimeout, EtcdException
+from pyetcd.client import CONSISTENCY_LINEARIZABLE
+
+RELEASE_ACTIONS = ['delete', 'expire', 'compareAndDelete']
+
+
+class Lock(object):
+    """
+    Distributed lock.
+
+    The lock is a key created with ``prevExist=false`` and a TTL.
+    While the lock is held a background thread refreshes the TTL,
+    so the lock is released by etcd if the holder dies.
+    Waiters watch the key and try again as soon as it is deleted
+    or expires.
+
+    The lock can be used as a context manager::
+
+        with Lock(client, '/locks/foo'):
+            do_something()
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param key: Lock key.
+    :param ttl: Lock key TTL in seconds.
+    """
+    def __init__(self, client, key, ttl=30):
+        self._client = client
+        self._key = key
+        self._ttl = ttl
+        self._value = None
+        self._index = None
+        self._refresher = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @property
+    def key(self):
+        """Lock key."""
+        return self._key
+
+    @property
+    def fencing_token(self):
+        """
+        ``modifiedIndex`` of the lock key when it was acquired.
+        It grows with every acquisition, so storage that remembers
+        the highest token seen can reject writes of a stale holder.
+        None if the lock isn't held.
+        """
+        return self._index
+
+    @property
+    def is_acquired(self):
+        """
+        True if the lock is held by this instance and its TTL
+        didn't run out.
+        """
+        return self._value is not None and not self._refresher.lost
+
+    def acquire(self, blocking=True, timeout=None):
+        """
+        Acquire the lock.
+
+        :param blocking: If False return immediately if the lock is held
+            by someone else.
+        :param timeout: Seconds to wait for the lock.
+            By default waits forever.
+        :return: True if the lock is acquired.
+        :rtype: bool
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        value = uuid.uuid4().hex
+        while True:
+            try:
+                result = self._client.compare_and_swap(
+                    self._key, value,
+                    prev_exist=False,
+                    ttl=self._ttl
+                )
+                self._value = value
+                self._index = result.node['modifiedIndex']
+                self._refresher = TTLRefresher(
+                    self._client, self._key, self._ttl, value=value
+                )
+                self._refresher.start()
+                return True
+            except EtcdNodeExist:
+                if not blocking:
+                    return False
+
+            if not wait_for_delete(self._client, self._key, deadline):
+                return False
+
+    def release(self):
+        """
+        Release the lock. It's deleted only if it's still held
+        by this instance.
+
+        :raise RuntimeError: if the lock isn't acquired.
+        """
+        if self._value is None:
+            raise RuntimeError('Lock %s is not acquired' % self._key)
+        self._refresher.stop()
+        try:
+            self._client.compare_and_delete(self._key,
+                                            prev_value=self._value)
+        except (EtcdKeyNotFound, EtcdTestFailed):
+            # The lock expired and maybe someone else took it
+            pass
+        finally:
+            self._value = None
+            self._index = None
+            self._refresher = None
+
+
+class FairLock(object):
+    """
+    Distributed lock that is granted in the order of requests.
+
+    Every contender appends an in-order key with a TTL to the lock
+    directory. The contender with the first key holds the lock.
+    Others watch only the key right before their own, so a release
+    wakes up just the next contender.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Lock directory.
+    :param ttl: Contender key TTL in seconds.
+    :param value: Value of the contender key. Random by default.
+    """
+    _slots = 1
+
+    def __init__(self, client, directory, ttl=30, value=None):
+        self._client = client
+        self._directory = directory
+        self._ttl = ttl
+        self._value = value or uuid.uuid4().hex
+        self._key = None
+        self._index = None
+        self._refresher = None
+        self._acquired = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @property
+    def fencing_token(self):
+        """
+        ``createdIndex`` of the contender key if the lock is held,
+        None otherwise.
+        """
+        return self._index if self._acquired else None
+
+    @property
+    def is_acquired(self):
+        """
+        True if the lock is held by this instance and its TTL
+        didn't run out.
+        """
+        return self._acquired and not self._refresher.lost
+
+    def acquire(self, blocking=True, timeout=None):
+        """
+        Acquire the lock.
+
+        :param blocking: If False return immediately if the lock is held
+            by someone else.
+        :param timeout: Seconds to wait for the lock.
+            By default waits forever.
+        :return: True if the lock is acquired.
+        :rtype: bool
+        :raise EtcdKeyNotFound: if the contender key expired while waiting.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        if self._key is None:
+            result = self._client.append(self._directory, self._value,
+                                         ttl=self._ttl)
+            self._key = result.node['key']
+            self._index = result.node['createdIndex']
+            self._refresher = TTLRefresher(self._client, self._key,
+                                           self._ttl, value=self._value)
+            self._refresher.start()
+
+        try:
+            while True:
+                nodes, result = self._contenders()
+                keys = [node['key'] for node in nodes]
+                if self._key not in keys:
+                    raise EtcdKeyNotFound(
+                        'Contender key %s expired' % self._key
+                    )
+                position = keys.index(self._key)
+                if position < self._slots:
+                    self._acquired = True
+                    return True
+
+                if not blocking or not self._wait_turn(
+                        keys[:position], result, deadline):
+                    self._withdraw()
+                    return False
+        except EtcdException:
+            self._withdraw()
+            raise
+
+    def release(self):
+        """
+        Release the lock.
+
+        :raise RuntimeError: if the lock isn't acquired.
+        """
+        if not self._acquired:
+            raise RuntimeError('Lock %s is not acquired' % self._directory)
+        self._withdraw()
+
+    def _contenders(self):
+        """
+        :return: Contender nodes in the order of their keys
+            and the read result.
+        """
+        # A quorum read always sees our own contender key
+        result = self._client.read(self._directory, sorted=True,
+                                   consistency=CONSISTENCY_LINEARIZABLE)
+        nodes = sorted(result.node.get('nodes', []),
+                       key=lambda node: node['key'])
+        return nodes, result
+
+    def _wait_turn(self, predecessors, result, deadline):
+        """
+        Wait until the contender may be first.
+
+        :param predecessors: Contender keys before ours.
+        :param result: Result of the read of the contenders.
+        :param deadline: Time to give up at.
+        :return: False on timeout.
+        """
+        # pylint: disable=unused-argument
+        return wait_for_delete(self._client, predecessors[-1], deadline)
+
+    def _withdraw(self):
+        self._refresher.stop()
+        try:
+            self._client.delete(self._key)
+        except EtcdKeyNotFound:
+            pass
+        finally:
+            self._key = None
+            self._index = None
+            self._refresher = None
+            self._acquired = False
+
+
+class TTLRefresher(threading.Thread):
+    """
+    Thread that refreshes TTL of a key every third of the TTL.
+
+    The key is refreshed only while it has ``value``, so if it expired
+    and someone else created it again the refresher doesn't keep
+    the other owner's key alive. Then :py:attr:`lost` is set.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param key: Key to refresh.
+    :param ttl: Key TTL in seconds.
+    :param value: Value the key must have. By default any value.
+    """
+    def __init__(self, client, key, ttl, value=None):
+        super(TTLRefresher, self).__init__()
+        self.daemon = True
+        self._client = client
+        self._key = key
+        self._ttl = ttl
+        self._value = value
+        self._stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self._stopped.wait(self._ttl / 3.0):
+            try:
+                self._client.update_ttl(self._key, self._ttl,
+                                        prev_value=self._value)
+            except (EtcdKeyNotFound, EtcdTestFailed):
+                self.lost = True
+                return
+            except EtcdException:
+                # Try again on the next round
+                pass
+
+    def stop(self):
+        """Stop refreshing the key."""
+        self._stopped.set()
+
+
+def wait_for_delete(client, key, deadline=None):
+    """
+    Wait until a key is deleted or expires.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param key: Key to watch.
+    :param deadline: Give up at this time (as returned by ``time.time()``).
+        By default waits forever.
+    :return: True if the key is gone or may be gone, False on timeout.
+    :rtype: bool
+    :raise EtcdException: if etcd responds with error or HTTP error
+    """
+    try:
+        result = client.read(key)
+    except EtcdKeyNotFound:
+        return True
+
+    index = next_index(result)
+    while True:
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                return False
+        try:
+            event = client.watch(key, wait_index=index, timeout=timeout)
+        except EtcdTimeout:
+            return False
+        except EtcdEventIndexCleared:
+            return True
+        except EtcdEmptyResponse:
+            continue
+
+        if event.action in RELEASE_ACTIONS:
+            return True
+        index = event.node['modifiedIndex'] + 1
+
+
+def next_index(result):
+    """
+    Index to start watching from to see changes made after a read.
+
+    :param result: Result of a read.
+    :type result: EtcdResult
+    :rtype: int
+    """
+    if result.x_etcd_index is not None:
+        return result.x_etcd_index + 1
+    return result.node['modifiedIndex'] + 1
@@ -0,0 +1,240 @@
+"""module with distributed work queue recipe."""
+import time
+import uuid
+from collections import namedtuple
+
+from pyetcd import EtcdException, EtcdKeyNotFound, EtcdTestFailed, \
+    EtcdNodeExist, EtcdTimeout, EtcdEventIndexCleared, EtcdEmptyResponse
+from pyetcd.client import CONSISTENCY_LINEARIZABLE
+from pyetcd.recipes.lock import next_index
+
+QueueItem = namedtuple('QueueItem', ['key', 'value', 'index'])
+
+# Actions that add an item to the queue
+_ADD_ACTIONS = frozenset(['create', 'set', 'update', 'compareAndSwap'])
+
+
+class ClaimLost(EtcdException):
+    """
+    Error that raises if a consumer acks an item whose claim expired,
+    so the item could be given to another consumer.
+    """
+
+
+class Queue(object):
+    """
+    Distributed FIFO work queue.
+
+    Items are in-order keys in ``<directory>/items``. A consumer claims
+    an item by deleting it with ``prevIndex`` of the item, so only
+    one consumer gets it. When the queue is empty consumers watch
+    the queue directory instead of polling it.
+
+    If ``visibility_timeout`` is given an item isn't deleted when it's
+    taken. Instead the consumer creates a claim key with a TTL
+    in ``<directory>/claims``. The item is deleted by :py:meth:`ack`.
+    If the consumer doesn't ack the item before the claim expires
+    the item is given to another consumer and :py:meth:`ack` raises
+    :py:class:`ClaimLost`. A claim is dropped if the item was acked
+    by another consumer after it was listed.
+
+    Waiting consumers watch only the items, so they aren't woken up
+    by claims and acks of other consumers. Claims that expire aren't
+    watched; with a visibility timeout a waiting consumer lists
+    the queue again at least every ``visibility_timeout`` seconds.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Queue directory.
+    :param visibility_timeout: Seconds a taken item is invisible
+        to other consumers.
+    """
+    def __init__(self, client, directory, visibility_timeout=None):
+        self._client = client
+        self._directory = directory.rstrip('/')
+        self._items = self._directory + '/items'
+        self._claims = self._directory + '/claims'
+        self._visibility_timeout = visibility_timeout
+        self._consumer = uuid.uuid4().hex
+
+    def put(self, value, ttl=None):
+        """
+        Add an item to the end of the queue.
+
+        :param value: Item value.
+        :param ttl: Item TTL in seconds. The item is dropped if nobody
+            takes it in time.
+        :return: Key of the item.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        return self._client.append(self._items, value, ttl=ttl).node['key']
+
+    def get(self, block=True, timeout=None):
+        """
+        Take an item from the head of the queue.
+
+        :param block: Wait for an item if the queue is empty.
+        :param timeout: Seconds to wait. By default waits forever.
+        :return: Item or None if the queue is empty.
+        :rtype: QueueItem
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        items = self.get_batch(1, block=block, timeout=timeout)
+        return items[0] if items else None
+
+    def get_batch(self, max_items, block=True, timeout=None):
+        """
+        Take up to ``max_items`` items from the head of the queue.
+
+        :param max_items: Maximum number of items to take.
+        :param block: Wait for items if the queue is empty.
+        :param timeout: Seconds to wait. By default waits forever.
+        :return: Taken items, empty list if the queue is empty.
+        :rtype: list(QueueItem)
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            nodes, index = self._list()
+            taken = []
+            for node in nodes:
+                item = self._take(node)
+                if item is not None:
+                    taken.append(item)
+                    if len(taken) == max_items:
+                        break
+            if taken or not block:
+                return taken
+            if not self._wait(index, deadline):
+                return []
+
+    def ack(self, item):
+        """
+        Confirm the item is processed. It's needed only if the queue
+        has a visibility timeout.
+
+        :param item: Item returned by :py:meth:`get`.
+        :type item: QueueItem
+        :raise ClaimLost: if the claim of the item expired or another
+            consumer claimed the item.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        if self._visibility_timeout is None:
+            return
+        claim = self._claim_key(item.key)
+        try:
+            # Refresh the claim so it can't expire before the item
+            # is deleted
+            self._client.update_ttl(claim, self._visibility_timeout,
+                                    prev_value=self._consumer)
+        except (EtcdKeyNotFound, EtcdTestFailed):
+            raise ClaimLost('Claim of %s is lost' % item.key)
+        try:
+            self._client.compare_and_delete(item.key, prev_index=item.index)
+        except (EtcdKeyNotFound, EtcdTestFailed):
+            pass
+        try:
+            self._client.compare_and_delete(claim, prev_value=self._consumer)
+        except (EtcdKeyNotFound, EtcdTestFailed):
+            pass
+
+    def __len__(self):
+        return len(self._list()[0])
+
+    def _list(self):
+        """
+        :return: Unclaimed items in the queue order and the index
+            to watch the queue from.
+        """
+        try:
+            result = self._client.read(self._directory,
+                                       recursive=True, sorted=True)
+        except EtcdKeyNotFound as err:
+            return [], None if err.index is None else err.index + 1
+
+        items = []
+        claimed = set()
+        for child in result.node.get('nodes', []):
+            if child['key'] == self._items:
+                items = child.get('nodes', [])
+            elif child['key'] == self._claims:
+                claimed = set(
+                    claim['key'] for claim in child.get('nodes', [])
+                )
+        items = [
+            node for node in sorted(items, key=lambda node: node['key'])
+            if self._claim_key(node['key']) not in claimed
+        ]
+        return items, next_index(result)
+
+    def _take(self, node):
+        item = QueueItem(node['key'], node['value'], node['modifiedIndex'])
+        if self._visibility_timeout is None:
+            try:
+                self._client.compare_and_delete(item.key,
+                                                prev_index=item.index)
+            except (EtcdKeyNotFound, EtcdTestFailed):
+                return None
+            return item
+
+        claim = self._claim_key(item.key)
+        try:
+            self._client.compare_and_swap(
+                claim, self._consumer,
+                prev_exist=False,
+                ttl=self._visibility_timeout
+            )
+        except (EtcdKeyNotFound, EtcdTestFailed, EtcdNodeExist):
+            return None
+        if self._listed(item):
+            return item
+        # Another consumer acked the item and deleted its claim after
+        # the item was listed
+        try:
+            self._client.compare_and_delete(claim, prev_value=self._consumer)
+        except (EtcdKeyNotFound, EtcdTestFailed):
+            pass
+        return None
+
+    def _listed(self, item):
+        """
+        :return: True if the item is still in the queue as listed.
+        """
+        try:
+            result = self._client.read(item.key,
+                                       consistency=CONSISTENCY_LINEARIZABLE)
+        except EtcdKeyNotFound:
+            return False
+        return result.node['modifiedIndex'] == item.index
+
+    def _claim_key(self, key):
+        return self._claims + '/' + key.rsplit('/', 1)[-1]
+
+    def _wait(self, index, deadline):
+        """
+        Wait until an item is added to the queue.
+
+        :return: False on timeout.
+        """
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return False
+            if self._visibility_timeout is not None:
+                timeout = self._visibility_timeout if timeout is None \
+                    else min(timeout, self._visibility_timeout)
+            try:
+                result = self._client.watch(self._items, wait_index=index,
+                                            recursive=True, timeout=timeout)
+            except (EtcdKeyNotFound, EtcdEventIndexCleared,
+                    EtcdEmptyResponse):
+                return True
+            except EtcdTimeout:
+                # Look for items with expired claims
+                return self._visibility_timeout is not None \
+                    and (deadline is None or time.time() < deadline)
+            if result.action in _ADD_ACTIONS:
+                return True
+            index = result.node['modifiedIndex'] + 1
@@ -0,0 +1,159 @@
+"""module with service registry and discovery recipe."""
+from pyetcd import EtcdKeyNotFound
+from pyetcd.keepalive import KeepAliveManager
+from pyetcd.recipes.lock import RELEASE_ACTIONS
+from pyetcd.recipes.watcher import DirectoryWatcher
+
+
+class ServiceRegistry(DirectoryWatcher):
+    """
+    Service registry.
+
+    An instance of a service is the key ``<prefix>/<service>/<instance>``
+    with a TTL that holds the instance address. Registered instances
+    are kept alive by a :py:class:`~pyetcd.keepalive.KeepAliveManager`.
+
+    Lookups are served from a local copy of the ``<prefix>`` directory.
+    :py:meth:`start` loads it and starts a thread that keeps it up
+    to date with a recursive watch (see
+    :py:class:`~pyetcd.recipes.watcher.DirectoryWatcher`).
+    :py:meth:`resolve` never makes network calls.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param prefix: Registry directory.
+    :param ttl: TTL of instance keys in seconds.
+    :param keepalive: Keepalive manager for registered instances.
+        A new one is created if not given.
+    :type keepalive: KeepAliveManager
+    :param on_change: Function that is called with the service name
+        and the list of its addresses when they change.
+    :param watch_timeout: Seconds after which a watch request
+        is restarted.
+    :param retry_interval: Seconds to wait after a failed watch.
+    """
+    def __init__(  # pylint: disable=too-many-arguments
+            self, client,
+            prefix='/services',
+            ttl=30,
+            keepalive=None,
+            on_change=None,
+            watch_timeout=60,
+            retry_interval=1):
+        super(ServiceRegistry, self).__init__(client, prefix,
+                                              watch_timeout=watch_timeout,
+                                              retry_interval=retry_interval)
+        self._ttl = ttl
+        self._keepalive = keepalive
+        self._own_keepalive = keepalive is None
+        self._on_change = on_change
+        self._services = {}
+
+    def register(self, service, instance, address):
+        """
+        Register an instance of a service and keep it alive.
+
+        :param service: Service name.
+        :param instance: Instance identifier unique within the service.
+        :param address: Instance address.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        key = self._key(service, instance)
+        self._client.write(key, address, ttl=self._ttl)
+        if self._keepalive is None:
+            self._keepalive = KeepAliveManager(self._client)
+        self._keepalive.add(key, self._ttl, value=address)
+
+    def deregister(self, service, instance):
+        """
+        Remove an instance of a service.
+
+        :param service: Service name.
+        :param instance: Instance identifier.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        key = self._key(service, instance)
+        if self._keepalive is not None:
+            self._keepalive.remove(key)
+        try:
+            self._client.delete(key)
+        except EtcdKeyNotFound:
+            pass
+
+    def resolve(self, service):
+        """
+        Addresses of a service from the local copy of the registry.
+
+        :param service: Service name.
+        :return: List of addresses.
+        :rtype: list(str)
+        """
+        return list(self._services.get(service, {}).values())
+
+    def instances(self, service):
+        """
+        Instances of a service from the local copy of the registry.
+
+        :param service: Service name.
+        :return: Dictionary instance identifier -> address.
+        :rtype: dict
+        """
+        return dict(self._services.get(service, {}))
+
+    def stop(self):
+        """
+        Stop watching the registry and stop keeping registered
+        instances alive. The watch thread exits when its current
+        watch request returns.
+        """
+        super(ServiceRegistry, self).stop()
+        if self._own_keepalive and self._keepalive is not None:
+            self._keepalive.close()
+            self._keepalive = None
+
+    def _key(self, service, instance):
+        return '%s/%s/%s' % (self._directory, service, instance)
+
+    def _on_load(self, nodes):
+        services = {}
+        for service in nodes:
+            name = service['key'].rsplit('/', 1)[-1]
+            services[name] = dict(
+                (node['key'].rsplit('/', 1)[-1], node['value'])
+                for node in service.get('nodes', [])
+                if not node.get('dir')
+            )
+
+        old_services, self._services = self._services, services
+        for name in set(old_services) | set(services):
+            if old_services.get(name) != services.get(name):
+                self._notify(name)
+
+    def _on_event(self, event):
+        path = self._relative_path(event.node['key']).split('/')
+        if len(path) > 2 or not path[0]:
+            return
+
+        service = path[0]
+        instances = dict(self._services.get(service, {}))
+        if event.action in RELEASE_ACTIONS:
+            if len(path) == 1:
+                instances = {}
+            else:
+                instances.pop(path[1], None)
+        elif len(path) == 2 and not event.node.get('dir'):
+            instances[path[1]] = event.node['value']
+        else:
+            return
+
+        services = dict(self._services)
+        if instances:
+            services[service] = instances
+        else:
+            services.pop(service, None)
+        self._services = services
+        self._notify(service)
+
+    def _notify(self, service):
+        if self._on_change is not None:
+            self._on_change(service, self.resolve(service))
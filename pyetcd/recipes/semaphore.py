@@ -0,0 +1,52 @@
+"""module with distributed counting semaphore recipe."""
+import time
+
+from pyetcd import EtcdTimeout, EtcdEventIndexCleared, EtcdEmptyResponse
+from pyetcd.recipes.lock import FairLock, RELEASE_ACTIONS, next_index
+
+
+class Semaphore(FairLock):
+    """
+    Distributed counting semaphore that lets ``slots`` holders in
+    at once in the order of requests.
+
+    Every contender appends an in-order key with a TTL to the semaphore
+    directory. Contenders with the first ``slots`` keys hold
+    the semaphore. Others watch the directory and check again only
+    when a key before theirs is deleted or expires, so keys of crashed
+    holders are cleaned up by their TTL.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Semaphore directory.
+    :param slots: Number of holders allowed at once.
+    :param ttl: Contender key TTL in seconds.
+    :param value: Value of the contender key. Random by default.
+    """
+    def __init__(self, client, directory, slots, ttl=30, value=None):
+        super(Semaphore, self).__init__(client, directory,
+                                        ttl=ttl, value=value)
+        self._slots = slots
+
+    def _wait_turn(self, predecessors, result, deadline):
+        index = next_index(result)
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return False
+            try:
+                event = self._client.watch(self._directory,
+                                           wait_index=index,
+                                           recursive=True,
+                                           timeout=timeout)
+            except EtcdTimeout:
+                return False
+            except (EtcdEventIndexCleared, EtcdEmptyResponse):
+                return True
+
+            if event.action in RELEASE_ACTIONS \
+                    and event.node['key'] in predecessors:
+                return True
+            index = event.node['modifiedIndex'] + 1
@@ -0,0 +1,78 @@
+"""module with unique ID generator recipe."""
+import threading
+
+
+class SequenceGenerator(object):
+    """
+    Generator of unique increasing integer IDs.
+
+    The counter key holds the last claimed ID. The generator claims
+    a block of ``block_size`` IDs at once with
+    :py:meth:`~pyetcd.client.Client.atomic_update` and hands them out
+    without network calls. When ``low_water`` of the block is left
+    the next block is claimed in the background with
+    :py:meth:`~pyetcd.client.Client.submit`.
+
+    IDs are unique across all generators of the key but they aren't
+    strictly ordered between generators, and IDs of a block that
+    wasn't used up are lost.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param key: Counter key.
+    :param block_size: Number of IDs claimed at once.
+    :param low_water: Fraction of the block left when the next block
+        is claimed.
+    """
+    def __init__(self, client, key, block_size=1000, low_water=0.2):
+        self._client = client
+        self._key = key
+        self._block_size = block_size
+        self._low_water = int(block_size * low_water)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._prefetch = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        """
+        :return: Next unique ID.
+        :rtype: int
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        with self._lock:
+            if self._next >= self._end:
+                if self._prefetch is None:
+                    block = self._claim()
+                else:
+                    prefetch, self._prefetch = self._prefetch, None
+                    block = prefetch.result()
+                self._next, self._end = block
+
+            value = self._next
+            self._next += 1
+            if self._prefetch is None \
+                    and self._end - self._next <= self._low_water:
+                self._prefetch = self._client.submit(self._claim)
+            return value
+
+    def _claim(self):
+        """
+        Claim the next block of IDs.
+
+        :return: The first ID of the block and the ID after the last one.
+        :rtype: tuple(int, int)
+        """
+        block_size = self._block_size
+        result = self._client.atomic_update(
+            self._key,
+            lambda value: str(int(value or 0) + block_size)
+        )
+        last = int(result.node['value'])
+        return last - block_size + 1, last + 1
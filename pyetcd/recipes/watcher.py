@@ -0,0 +1,140 @@
+"""module with a base class for local copies of etcd directories."""
+import logging
+import threading
+
+from pyetcd import EtcdException, EtcdKeyNotFound, EtcdTimeout, \
+    EtcdEventIndexCleared, EtcdEmptyResponse
+from pyetcd.recipes.lock import next_index
+
+LOG = logging.getLogger(__name__)
+
+
+class DirectoryWatcher(object):
+    """
+    Base class that keeps a local copy of an etcd directory.
+
+    :py:meth:`start` reads the directory recursively and starts
+    a thread that applies changes from a recursive watch. If etcd
+    no longer has the history of changes the directory is read again.
+    Subclasses implement ``_on_load()`` and ``_on_event()``.
+    An exception other than :py:class:`~pyetcd.EtcdException` raised
+    by them, e.g. by a user callback, is logged and the watch goes on
+    with the next change.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param directory: Directory to watch.
+    :param watch_timeout: Seconds after which a watch request
+        is restarted.
+    :param retry_interval: Seconds to wait after a failed watch.
+    """
+    def __init__(self, client, directory, watch_timeout=60,
+                 retry_interval=1):
+        self._client = client
+        self._directory = directory.rstrip('/')
+        self._watch_timeout = watch_timeout
+        self._retry_interval = retry_interval
+        self._index = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Load the directory and start watching it.
+
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        self._load()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop watching the directory. The watch thread exits when its
+        current watch request returns.
+        """
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                event = self._client.watch(self._directory,
+                                           wait_index=self._index,
+                                           recursive=True,
+                                           timeout=self._watch_timeout)
+            except (EtcdTimeout, EtcdEmptyResponse):
+                continue
+            except EtcdEventIndexCleared:
+                self._reload()
+                continue
+            except EtcdException:
+                self._retry()
+                continue
+            if self._stopped.is_set():
+                break
+            try:
+                self._apply(event)
+            except EtcdException:
+                self._retry()
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Failed to apply a change of %s to %s',
+                              event.node.get('key'), self._directory)
+
+    def _retry(self):
+        self._stopped.wait(self._retry_interval)
+        self._reload()
+
+    def _reload(self):
+        try:
+            self._load()
+        except EtcdException:
+            pass
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('Failed to reload %s', self._directory)
+
+    def _load(self):
+        try:
+            result = self._client.read(self._directory, recursive=True)
+        except EtcdKeyNotFound as err:
+            self._index = None if err.index is None else err.index + 1
+            self._on_load([])
+        else:
+            self._index = next_index(result)
+            self._on_load(result.node.get('nodes', []))
+
+    def _apply(self, event):
+        self._index = event.node['modifiedIndex'] + 1
+        self._on_event(event)
+
+    def _relative_path(self, key):
+        """
+        :return: Key path relative to the directory, e.g. ``'foo/bar'``.
+        """
+        return key[len(self._directory) + 1:]
+
+    def _on_load(self, nodes):
+        """
+        Replace the local copy.
+
+        :param nodes: Children of the directory, empty if it
+            doesn't exist.
+        """
+        raise NotImplementedError
+
+    def _on_event(self, event):
+        """
+        Apply a change to the local copy.
+
+        :param event: Watch result.
+        :type event: EtcdResult
+        """
+        raise NotImplementedError
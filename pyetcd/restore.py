@@ -0,0 +1,231 @@
+"""module to import keys from a newline-delimited JSON dump."""
+import calendar
+import logging
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from pyetcd import EtcdException, EtcdKeyNotFound, EtcdNodeExist, \
+    EtcdTestFailed, EtcdNotFile
+from pyetcd.checkpoint import Checkpoint
+from pyetcd.client import ClientException
+from pyetcd.dump import read_dump
+from pyetcd.ratelimit import RateLimiter
+
+LOG = logging.getLogger(__name__)
+
+RestoreReport = namedtuple('RestoreReport',
+                           ['restored', 'skipped', 'expired', 'failed'])
+
+_EXPIRATION = re.compile(
+    r'^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(\.\d+)?'
+    r'(Z|([+-])(\d\d):(\d\d))$'
+)
+
+RESTORED = 'restored'
+SKIPPED = 'skipped'
+EXPIRED = 'expired'
+
+
+def parse_expiration(expiration):
+    """
+    Parse an RFC 3339 time as etcd returns it in ``expiration``,
+    e.g. ``'2013-12-04T12:01:21.874888581-08:00'``.
+
+    :return: Unix timestamp.
+    :rtype: float
+    :raise ValueError: if the time is invalid.
+    """
+    match = _EXPIRATION.match(expiration)
+    if not match:
+        raise ValueError('Invalid expiration %r' % expiration)
+    parts = match.groups()
+    timestamp = calendar.timegm([int(part) for part in parts[:6]])
+    if parts[6]:
+        timestamp += float(parts[6])
+    if parts[7] != 'Z':
+        offset = int(parts[9]) * 3600 + int(parts[10]) * 60
+        timestamp -= offset if parts[8] == '+' else -offset
+    return timestamp
+
+
+class _Restore(object):  # pylint: disable=too-many-instance-attributes
+    def __init__(self, client, header,  # pylint: disable=too-many-arguments
+                 parallel, rate, cas, checkpoint):
+        self._client = client
+        self._index = header.get('x_etcd_index')
+        self._cas = cas
+        self._limiter = RateLimiter(rate) if rate else None
+        if cas:
+            self._check_cluster(header.get('cluster_id'))
+        self._executor = ThreadPoolExecutor(max_workers=parallel)
+        self._slots = threading.BoundedSemaphore(parallel)
+        self._checkpoint = Checkpoint(
+            checkpoint,
+            [header.get('cluster_id'), header.get('prefix'), self._index]
+        )
+        self._lock = threading.Lock()
+        self._counts = {RESTORED: 0, SKIPPED: 0, EXPIRED: 0}
+        self._failed = []
+
+    def run(self, nodes, checkpoint_interval):
+        try:
+            for position, node in enumerate(nodes, 1):
+                if position <= self._checkpoint.position:
+                    continue
+                if node.get('dir'):
+                    # Children come after their directory in the dump,
+                    # create the directory before any of them is sent.
+                    self._restore(position, node)
+                else:
+                    self._slots.acquire()
+                    future = self._executor.submit(self._restore,
+                                                   position, node)
+                    future.add_done_callback(self._release)
+                if position % checkpoint_interval == 0:
+                    self._checkpoint.save()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._checkpoint.save()
+        return RestoreReport(failed=list(self._failed), **self._counts)
+
+    def _check_cluster(self, cluster_id):
+        """
+        Indexes of different clusters aren't comparable, so CAS mode
+        only restores a dump to the cluster it was taken from.
+        """
+        self._throttle()
+        target_id = self._client.read('/').x_etcd_cluster_id
+        if cluster_id is None or cluster_id != target_id:
+            raise ClientException(
+                'CAS restore needs a dump of the target cluster %s, '
+                'the dump is of cluster %s' % (target_id, cluster_id)
+            )
+
+    def _throttle(self):
+        """Wait before a request to keep the rate."""
+        if self._limiter:
+            self._limiter.acquire()
+
+    def _release(self, _):
+        self._slots.release()
+
+    def _restore(self, position, node):
+        try:
+            outcome = self._restore_node(node)
+        except (EtcdException, ClientException):
+            self._fail(position, node)
+            return
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('Failed to restore record %d %s',
+                          position, node.get('key'))
+            self._fail(position, node)
+            return
+        with self._lock:
+            self._counts[outcome] += 1
+        self._checkpoint.finish(position)
+
+    def _fail(self, position, node):
+        with self._lock:
+            self._failed.append(node.get('key'))
+        self._checkpoint.fail(position)
+
+    def _restore_node(self, node):
+        ttl = None
+        if node.get('expiration'):
+            ttl = int(math.ceil(
+                parse_expiration(node['expiration']) - time.time()
+            ))
+            if ttl <= 0:
+                return EXPIRED
+
+        if node.get('dir'):
+            self._throttle()
+            try:
+                self._client.mkdir(node['key'], ttl=ttl)
+            except (EtcdNodeExist, EtcdNotFile):
+                return SKIPPED
+            return RESTORED
+
+        if not self._cas:
+            self._throttle()
+            self._client.write(node['key'], node['value'], ttl=ttl)
+            return RESTORED
+        return self._compare_and_restore(node, ttl)
+
+    def _compare_and_restore(self, node, ttl):
+        key, value = node['key'], node['value']
+        self._throttle()
+        try:
+            current = self._client.read(key).node
+        except EtcdKeyNotFound:
+            self._throttle()
+            try:
+                self._client.compare_and_swap(key, value, prev_exist=False,
+                                              ttl=ttl)
+            except EtcdNodeExist:
+                return SKIPPED
+            return RESTORED
+
+        if current.get('dir') \
+                or current['modifiedIndex'] > self._index \
+                or (current.get('value') == value and ttl is None
+                    and 'ttl' not in current):
+            return SKIPPED
+        self._throttle()
+        try:
+            self._client.compare_and_swap(
+                key, value, prev_index=current['modifiedIndex'], ttl=ttl
+            )
+        except EtcdTestFailed:
+            return SKIPPED
+        return RESTORED
+
+
+def restore(client, fileobj,  # pylint: disable=too-many-arguments
+            parallel=16, rate=None, cas=False,
+            checkpoint=None, checkpoint_interval=1000):
+    """
+    Import keys from a dump written by :py:func:`pyetcd.dump.dump`.
+
+    The dump is read as a stream. Directories are created as they're
+    read, keys are written by up to ``parallel`` concurrent requests.
+    Keys and directories with a TTL get the TTL that remains until their
+    ``expiration``, the ones that have already expired are skipped.
+
+    With a checkpoint file the number of restored records is saved every
+    ``checkpoint_interval`` records and when the restore finishes,
+    and a restore of the same dump resumes after them. A dump is
+    identified by its cluster id, prefix and ``x_etcd_index``.
+
+    In CAS mode a key is written only if it doesn't exist in the target
+    or it hasn't changed since the dump was taken, i.e. its
+    ``modifiedIndex`` isn't greater than ``x_etcd_index`` of the dump.
+    Writes use ``prevExist`` and ``prevIndex`` so keys changed
+    during the restore aren't overwritten either. Indexes of different
+    clusters can't be compared, so CAS mode needs a dump of the target
+    cluster, e.g. to roll back keys changed by mistake.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param fileobj: Binary file object, see :py:func:`pyetcd.dump.open_dump`.
+    :param parallel: Number of concurrent write requests.
+    :param rate: Maximum number of requests per second. In CAS mode
+        a key takes a read and a write request. Default is no limit.
+    :param cas: Skip keys that are newer in the target.
+    :param checkpoint: Checkpoint file name.
+    :param checkpoint_interval: Number of records between checkpoint saves.
+    :return: Number of restored, skipped and expired records,
+        and list of keys that failed to restore.
+    :rtype: RestoreReport
+    :raise ClientException: if the file isn't a dump, the checkpoint
+        is from another dump or in CAS mode the dump is of another
+        cluster.
+    """
+    header, nodes = read_dump(fileobj)
+    return _Restore(
+        client, header, parallel, rate, cas, checkpoint
+    ).run(nodes, checkpoint_interval)
@@ -0,0 +1,138 @@
+"""module to choose which cluster member serves a request."""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from requests import RequestException
+
+
+class EndpointSelector(object):
+    """
+    Keeps per-member load figures and orders cluster members for a request.
+
+    Every request made through :py:meth:`track` updates the number
+    of requests in flight and an exponentially weighted moving average
+    of the response time of the member.
+
+    :param urls: List of member URLs in the configured order.
+    :type urls: list(str)
+    :param decay: Weight of the latest response time in the moving average.
+    :param retry_after: Number of seconds a member that failed to respond
+        is moved to the end of the list.
+    """
+    def __init__(self, urls, decay=0.3, retry_after=5):
+        self._urls = list(urls)
+        self._decay = decay
+        self._retry_after = retry_after
+        self._lock = threading.Lock()
+        self._inflight = dict((url, 0) for url in self._urls)
+        self._latency = dict((url, 0.0) for url in self._urls)
+        self._failed_at = dict((url, None) for url in self._urls)
+        self.leader = None
+
+    @property
+    def urls(self):
+        """Member URLs in the configured order."""
+        return list(self._urls)
+
+    def inflight(self, url):
+        """
+        :return: Number of requests currently sent to the member.
+        :rtype: int
+        """
+        return self._inflight[url]
+
+    def latency(self, url):
+        """
+        :return: Moving average of the member response time in seconds.
+        :rtype: float
+        """
+        return self._latency[url]
+
+    def ordered(self):
+        """
+        Members in the configured order. Members that recently failed
+        are tried last.
+
+        :rtype: list(str)
+        """
+        with self._lock:
+            return sorted(self._urls, key=self._is_failing)
+
+    def by_load(self):
+        """
+        Members ordered for a request that any member can serve.
+
+        The first member is the less loaded one of two members picked
+        at random ("power of two choices"), so requests spread across
+        the cluster while slow or busy members get fewer of them.
+        The rest of the list is the failover order.
+
+        :rtype: list(str)
+        """
+        with self._lock:
+            urls = list(self._urls)
+            random.shuffle(urls)
+            urls.sort(key=self._is_failing)
+            if len(urls) > 1 \
+                    and not self._is_failing(urls[1]) \
+                    and self._score(urls[1]) < self._score(urls[0]):
+                urls[0], urls[1] = urls[1], urls[0]
+            return urls
+
+    def forget_leader(self, url):
+        """
+        Drop the cached leader if it's the member, so the leader
+        is looked up again.
+
+        :param url: Member URL.
+        """
+        with self._lock:
+            if self.leader == url:
+                self.leader = None
+
+    @contextmanager
+    def track(self, url, measure=True):
+        """
+        Context manager that accounts a request to a member.
+
+        :param url: Member URL.
+        :param measure: Count the request in flight and its response
+            time. A long poll, e.g. a watch, only records failures:
+            its wait isn't the response time of the member.
+        """
+        started = time.time()
+        if measure:
+            with self._lock:
+                self._inflight[url] += 1
+        try:
+            yield
+        except RequestException:
+            with self._lock:
+                self._failed_at[url] = time.time()
+            self.forget_leader(url)
+            raise
+        else:
+            with self._lock:
+                self._failed_at[url] = None
+        finally:
+            if measure:
+                self._measure(url, time.time() - started)
+
+    def _measure(self, url, elapsed):
+        with self._lock:
+            self._inflight[url] -= 1
+            if self._latency[url]:
+                self._latency[url] += \
+                    self._decay * (elapsed - self._latency[url])
+            else:
+                self._latency[url] = elapsed
+
+    def _score(self, url):
+        return (self._inflight[url] + 1) * self._latency[url]
+
+    def _is_failing(self, url):
+        failed_at = self._failed_at[url]
+        return failed_at is not None \
+            and time.time() - failed_at < self._retry_after
@@ -0,0 +1,134 @@
+"""module to read your own writes while reading from any node."""
+import time
+
+from pyetcd import EtcdException
+from pyetcd.client import CONSISTENCY_STALE, CONSISTENCY_LINEARIZABLE
+
+
+class Session(object):
+    """
+    Read-your-writes session on top of a :py:class:`~pyetcd.client.Client`.
+
+    The session remembers the highest etcd index returned by writes made
+    through it. Reads go without quorum to the least loaded node.
+    If the node returns ``X-Etcd-Index`` lower than the remembered index
+    it hasn't applied the session writes yet, so the read is repeated
+    on other nodes. If all nodes lag the session waits for them
+    to catch up and eventually falls back to a quorum read.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param index: Initial session index. Use it to continue a session
+        started elsewhere, e.g. in another process.
+    :param max_wait: How many seconds to wait for nodes to catch up
+        before falling back to a quorum read.
+    :param retry_interval: Pause in seconds between rounds of reads
+        when all nodes lag.
+    """
+    def __init__(self, client, index=0, max_wait=1.0, retry_interval=0.05):
+        self._client = client
+        self._index = index
+        self._max_wait = max_wait
+        self._retry_interval = retry_interval
+
+    @property
+    def index(self):
+        """Highest etcd index this session has observed from writes."""
+        return self._index
+
+    def observe(self, index):
+        """
+        Make the session never read data older than the index.
+
+        :param index: etcd index, e.g. ``x_etcd_index`` of a write result.
+        """
+        if index is not None and index > self._index:
+            self._index = index
+
+    def read(self, key, **kwargs):
+        """
+        Read key value that is at least as new as the session writes.
+
+        :param key: Key
+        :param kwargs: Parameters that will be added to URI.
+            Watches (``wait=True``) are passed to the client as is.
+        :return: Result of operation.
+        :rtype: EtcdResult
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        if kwargs.get('wait'):
+            return self._client.read(key, **kwargs)
+
+        lagging = set()
+        deadline = time.time() + self._max_wait
+        while True:
+            try:
+                # pylint: disable=protected-access
+                result = self._client._request_key(
+                    key,
+                    params=kwargs,
+                    consistency=CONSISTENCY_STALE,
+                    exclude=lagging
+                )
+                if self._is_fresh(result.x_etcd_index):
+                    return result
+                lagging.add(result.endpoint)
+            except EtcdException as err:
+                if err.endpoint is None or self._is_fresh(err.index):
+                    raise
+                lagging.add(err.endpoint)
+
+            if time.time() >= deadline:
+                break
+            if lagging.issuperset(self._client.endpoints):
+                lagging.clear()
+                time.sleep(self._retry_interval)
+
+        return self._client.read(
+            key,
+            consistency=CONSISTENCY_LINEARIZABLE,
+            **kwargs
+        )
+
+    def write(self, key, value, ttl=None):
+        """Same as :py:meth:`pyetcd.client.Client.write`."""
+        return self._track(self._client.write(key, value, ttl=ttl))
+
+    def delete(self, key):
+        """Same as :py:meth:`pyetcd.client.Client.delete`."""
+        return self._track(self._client.delete(key))
+
+    def mkdir(self, directory):
+        """Same as :py:meth:`pyetcd.client.Client.mkdir`."""
+        return self._track(self._client.mkdir(directory))
+
+    def rmdir(self, directory, recursive=False):
+        """Same as :py:meth:`pyetcd.client.Client.rmdir`."""
+        return self._track(
+            self._client.rmdir(directory, recursive=recursive)
+        )
+
+    def compare_and_swap(self, key, value, **kwargs):
+        """Same as :py:meth:`pyetcd.client.Client.compare_and_swap`."""
+        return self._track(
+            self._client.compare_and_swap(key, value, **kwargs)
+        )
+
+    def compare_and_delete(self, key, **kwargs):
+        """Same as :py:meth:`pyetcd.client.Client.compare_and_delete`."""
+        return self._track(self._client.compare_and_delete(key, **kwargs))
+
+    def update_ttl(self, key, ttl, **kwargs):
+        """Same as :py:meth:`pyetcd.client.Client.update_ttl`."""
+        return self._track(self._client.update_ttl(key, ttl, **kwargs))
+
+    def _track(self, result):
+        self.observe(result.x_etcd_index)
+        try:
+            self.observe(result.node['modifiedIndex'])
+        except (TypeError, KeyError):
+            pass
+        return result
+
+    def _is_fresh(self, index):
+        return index is None or index >= self._index
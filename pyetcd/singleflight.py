@@ -0,0 +1,65 @@
+"""module to share one call among concurrent identical calls."""
+import threading
+
+
+class _Call(object):  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key.
+
+    While a call with some key is in progress other callers with the same
+    key don't make their own call. They wait for the first one and get
+    its result or its exception.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._coalesced = 0
+
+    @property
+    def coalesced(self):
+        """Number of calls that were served by another in-flight call."""
+        return self._coalesced
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call ``func(*args, **kwargs)`` unless a call with the same key
+        is already in progress.
+
+        :param key: Hashable call identifier.
+        :param func: Function to call.
+        :return: Whatever the function returns.
+        :raise Exception: whatever the function raises.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                owner = True
+            else:
+                self._coalesced += 1
+                owner = False
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,183 @@
+"""module to bring an etcd directory to a desired state."""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from pyetcd import EtcdException, EtcdKeyNotFound, EtcdNodeExist, \
+    EtcdTestFailed
+from pyetcd.client import ClientException
+
+SyncReport = namedtuple(
+    'SyncReport',
+    ['created', 'updated', 'deleted', 'unchanged', 'conflicts', 'failed']
+)
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+def flatten(desired, prefix=''):
+    """
+    Flatten nested mappings into a dictionary of relative key paths,
+    e.g. ``{'db': {'port': 5432}}`` becomes ``{'db/port': '5432'}``.
+
+    Values are converted to strings the way they're written,
+    so they compare equal to the values etcd returns.
+
+    :param desired: Mapping of names to values or nested mappings.
+    :param prefix: Path prepended to all keys.
+    :rtype: dict
+    """
+    flat = {}
+    for name, value in desired.items():
+        path = prefix + name.strip('/')
+        if isinstance(value, Mapping):
+            flat.update(flatten(value, path + '/'))
+        else:
+            flat[path] = _to_text(value)
+    return flat
+
+
+def _to_text(value):
+    # A form-encoded value is sent as str(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    if isinstance(value, type(u'')):
+        return value
+    return str(value)
+
+
+def diff_prefix(current, desired, delete=True):
+    """
+    Compute operations that turn the current keys into the desired ones.
+
+    :param current: Dictionary relative path -> (value, modifiedIndex).
+    :param desired: Dictionary relative path -> value.
+    :param delete: Delete keys that aren't in ``desired``.
+    :return: List of operations ``(action, path, value, modifiedIndex)``
+        sorted by path, and list of unchanged paths.
+    :rtype: tuple(list, list)
+    """
+    operations = []
+    unchanged = []
+    for path in sorted(set(current) | set(desired)):
+        if path not in current:
+            operations.append((CREATE, path, desired[path], None))
+        elif path not in desired:
+            if delete:
+                operations.append((DELETE, path, None, current[path][1]))
+        elif current[path][0] != desired[path]:
+            operations.append(
+                (UPDATE, path, desired[path], current[path][1])
+            )
+        else:
+            unchanged.append(path)
+    return operations, unchanged
+
+
+def sync_prefix(client, prefix, desired,  # pylint: disable=too-many-arguments
+                dry_run=False, delete=True, parallel=8):
+    """
+    Make keys under a directory match a desired state and change only
+    the keys that differ.
+
+    The directory is read once. Keys that don't exist are created with
+    ``prevExist=false``, keys with a different value are updated with
+    ``prevIndex`` of the value that was read and keys that aren't
+    desired are deleted with ``prevIndex``. So a key changed by someone
+    else since the read isn't overwritten, it's reported as a conflict.
+    The changes are sent by up to ``parallel`` concurrent requests.
+    Directories left empty by deletes aren't removed.
+
+    ::
+
+        report = sync_prefix(client, '/config/app',
+                             {'db': {'host': 'db1', 'port': '5432'}})
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param prefix: Directory to sync.
+    :param desired: Mapping of key paths relative to ``prefix`` to values.
+        Nested mappings are subdirectories, see :py:func:`flatten`.
+    :param dry_run: Only report what would change.
+    :param delete: Delete keys that aren't in ``desired``.
+    :param parallel: Number of concurrent requests.
+    :return: Relative paths of created, updated, deleted, unchanged,
+        conflicting and failed keys.
+    :rtype: SyncReport
+    :raise EtcdException: if etcd responds with error or HTTP error
+        when the directory is read.
+    """
+    prefix = prefix.rstrip('/')
+    operations, unchanged = diff_prefix(
+        _read_prefix(client, prefix), flatten(desired), delete=delete
+    )
+    done = dict((action, []) for action in (CREATE, UPDATE, DELETE))
+    conflicts = []
+    failed = []
+    if dry_run:
+        for action, path, _, _ in operations:
+            done[action].append(path)
+    elif operations:
+        executor = ThreadPoolExecutor(max_workers=parallel)
+        try:
+            futures = [
+                (executor.submit(_apply, client, prefix, operation),
+                 operation)
+                for operation in operations
+            ]
+            for future, (action, path, _, _) in futures:
+                try:
+                    if future.result():
+                        done[action].append(path)
+                    else:
+                        conflicts.append(path)
+                except (EtcdException, ClientException):
+                    failed.append(path)
+        finally:
+            executor.shutdown()
+    return SyncReport(created=done[CREATE], updated=done[UPDATE],
+                      deleted=done[DELETE], unchanged=unchanged,
+                      conflicts=conflicts, failed=failed)
+
+
+def _read_prefix(client, prefix):
+    try:
+        result = client.read(prefix or '/', recursive=True)
+    except EtcdKeyNotFound:
+        return {}
+    current = {}
+    stack = [result.node]
+    while stack:
+        node = stack.pop()
+        if node.get('dir'):
+            stack.extend(node.get('nodes', []))
+        else:
+            current[node['key'][len(prefix) + 1:]] = \
+                (node.get('value'), node['modifiedIndex'])
+    return current
+
+
+def _apply(client, prefix, operation):
+    """
+    :return: False if the key changed since it was read.
+    """
+    action, path, value, index = operation
+    key = '%s/%s' % (prefix, path)
+    try:
+        if action == CREATE:
+            client.compare_and_swap(key, value, prev_exist=False)
+        elif action == UPDATE:
+            client.compare_and_swap(key, value, prev_index=index)
+        else:
+            client.compare_and_delete(key, prev_index=index)
+    except (EtcdTestFailed, EtcdNodeExist):
+        return False
+    except EtcdKeyNotFound:
+        return action == DELETE
+    return True
@@ -0,0 +1,154 @@
+"""module with TLS connections that reuse sessions."""
+import ssl
+import threading
+
+from requests.adapters import HTTPAdapter
+
+#: The ssl module can resume TLS sessions, which needs Python 3.6.
+SESSION_REUSE = hasattr(ssl.SSLSocket, 'session')
+
+# PROTOCOL_TLS_CLIENT is new in Python 3.6
+_PROTOCOL = getattr(ssl, 'PROTOCOL_TLS_CLIENT', None)
+
+
+class _SessionSocket(ssl.SSLSocket):  # pylint: disable=abstract-method
+    def close(self):
+        # TLS 1.3 session tickets arrive after the handshake,
+        # so the session is saved again before the socket is closed.
+        self.context.save_session(self)
+        super(_SessionSocket, self).close()
+
+
+class SessionReusingContext(ssl.SSLContext):
+    """
+    SSL context that resumes TLS sessions.
+
+    The last session of every server is kept and offered when
+    a new connection to the server is opened. If the server resumes it,
+    the connection skips the certificate exchange and key agreement
+    of a full handshake.
+
+    Sessions are resumed with Python 3.6 and newer, see
+    :py:data:`SESSION_REUSE`. With older versions the context only
+    counts handshakes.
+    """
+    # Used by Python 3.7 and newer
+    sslsocket_class = _SessionSocket
+
+    def __new__(cls, protocol, *args, **kwargs):
+        # Set up in __new__(), SSLContext.__init__() takes the protocol
+        # with Python 2 and doesn't exist with Python 3.7 and newer.
+        self = super(SessionReusingContext, cls).__new__(cls, protocol,
+                                                         *args, **kwargs)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.handshakes = 0
+        self.sessions_reused = 0
+        return self
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        server = self._server(sock, kwargs.get('server_hostname'))
+        if SESSION_REUSE and kwargs.get('session') is None:
+            with self._lock:
+                kwargs['session'] = self._sessions.get(server)
+        try:
+            ssock = super(SessionReusingContext, self).wrap_socket(
+                sock, *args, **kwargs
+            )
+        except ssl.SSLError:
+            with self._lock:
+                self._sessions.pop(server, None)
+            raise
+        ssock.session_key = server
+        with self._lock:
+            self.handshakes += 1
+            if getattr(ssock, 'session_reused', False):
+                self.sessions_reused += 1
+        self.save_session(ssock)
+        return ssock
+
+    def save_session(self, ssock):
+        """
+        Remember the session of a connection to resume it later.
+
+        :param ssock: TLS connection.
+        :type ssock: ssl.SSLSocket
+        """
+        server = getattr(ssock, 'session_key', None)
+        try:
+            session = ssock.session
+            # A TLS 1.3 session can only be resumed with a ticket
+            resumable = session is not None and (
+                session.has_ticket
+                or session.id and ssock.version() != 'TLSv1.3'
+            )
+        except (AttributeError, ValueError):
+            return
+        if server is not None and resumable:
+            with self._lock:
+                self._sessions[server] = session
+
+    @staticmethod
+    def _server(sock, server_hostname):
+        try:
+            address = sock.getpeername()[:2]
+        except (AttributeError, OSError):
+            address = None
+        return server_hostname, address
+
+
+def create_context(ca_cert=None, cert=None, key=None):
+    """
+    Create an SSL context for client connections.
+
+    :param ca_cert: Path to a CA bundle that signed the server
+        certificates. Default is the system CA certificates.
+    :param cert: Path to the client certificate.
+    :param key: Path to the client certificate key. Default is
+        the key in the ``cert`` file.
+    :rtype: SessionReusingContext
+    """
+    if _PROTOCOL is None:
+        context = SessionReusingContext(ssl.PROTOCOL_SSLv23)
+        # Negotiate TLS only, like PROTOCOL_TLS_CLIENT
+        context.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3
+    else:
+        context = SessionReusingContext(_PROTOCOL)
+    context.verify_mode = ssl.CERT_REQUIRED
+    context.check_hostname = True
+    if ca_cert:
+        context.load_verify_locations(cafile=ca_cert)
+    else:
+        context.load_default_certs()
+    if cert:
+        context.load_cert_chain(cert, keyfile=key)
+    return context
+
+
+class TLSAdapter(HTTPAdapter):
+    """
+    Transport adapter that connects to all endpoints with one
+    SSL context, so the CA bundle and the client certificate are loaded
+    once and TLS sessions are resumed.
+
+    :param ssl_context: SSL context of the connections.
+    :type ssl_context: ssl.SSLContext
+    :param kwargs: Keyword arguments of
+        :py:class:`requests.adapters.HTTPAdapter`.
+    """
+    def __init__(self, ssl_context, **kwargs):
+        self._ssl_context = ssl_context
+        super(TLSAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super(TLSAdapter, self).init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super(TLSAdapter, self).proxy_manager_for(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        # Certificates are verified by the SSL context. Letting requests
+        # configure them would load the CA bundle on every connection.
+        pass
@@ -0,0 +1,258 @@
+"""module to build etcd v3 transactions."""
+# pylint: disable=protected-access
+from collections import namedtuple
+
+from pyetcd.client import ClientException
+
+TxnResponse = namedtuple('TxnResponse',
+                         ['succeeded', 'revision', 'responses'])
+
+
+class Compare(object):
+    """
+    Condition of a transaction. Build it by comparing
+    :py:func:`value`, :py:func:`version`, :py:func:`create_revision`,
+    :py:func:`mod_revision` or :py:func:`lease` of a key with a value,
+    e.g. ``mod_revision('/foo') < 10``.
+
+    A key that doesn't exist has value, version and revisions of zero,
+    so ``version('/foo') == 0`` checks that the key doesn't exist.
+    """
+    def __init__(self, target, key, result, operand):
+        self.target = target
+        self.key = key
+        self.result = result
+        self.operand = operand
+
+    def __repr__(self):
+        return 'Compare(%s(%r) %s %r)' % (self.target, self.key,
+                                          self.result, self.operand)
+
+    def _request(self, client):
+        field = _TARGET_FIELDS[self.target]
+        if self.target == 'VALUE':
+            operand = client._encode(client._value_to_text(self.operand))
+        else:
+            operand = int(self.operand)
+        return {
+            'key': client._encode(self.key),
+            'target': self.target,
+            'result': self.result,
+            field: operand
+        }
+
+
+_TARGET_FIELDS = {
+    'VALUE': 'value',
+    'VERSION': 'version',
+    'CREATE': 'create_revision',
+    'MOD': 'mod_revision',
+    'LEASE': 'lease',
+}
+
+
+class _CompareTarget(object):
+    def __init__(self, target, key):
+        self._target = target
+        self._key = key
+
+    def __eq__(self, other):
+        return Compare(self._target, self._key, 'EQUAL', other)
+
+    def __ne__(self, other):
+        return Compare(self._target, self._key, 'NOT_EQUAL', other)
+
+    def __lt__(self, other):
+        return Compare(self._target, self._key, 'LESS', other)
+
+    def __gt__(self, other):
+        return Compare(self._target, self._key, 'GREATER', other)
+
+    __hash__ = None
+
+
+def value(key):
+    """Value of a key in a :py:class:`Compare`."""
+    return _CompareTarget('VALUE', key)
+
+
+def version(key):
+    """Number of writes to a key since it was created
+    in a :py:class:`Compare`."""
+    return _CompareTarget('VERSION', key)
+
+
+def create_revision(key):
+    """Revision when a key was created in a :py:class:`Compare`."""
+    return _CompareTarget('CREATE', key)
+
+
+def mod_revision(key):
+    """Revision when a key was last modified in a :py:class:`Compare`."""
+    return _CompareTarget('MOD', key)
+
+
+def lease(key):
+    """Lease ID of a key in a :py:class:`Compare`."""
+    return _CompareTarget('LEASE', key)
+
+
+class Op(object):
+    """
+    Operation of a transaction, see :py:func:`put`, :py:func:`get`
+    and :py:func:`delete`.
+    """
+    _kinds = {
+        'range': ('request_range', 'response_range'),
+        'put': ('request_put', 'response_put'),
+        'delete_range': ('request_delete_range', 'response_delete_range'),
+    }
+
+    def __init__(self, kind, key, **kwargs):
+        self.kind = kind
+        self.key = key
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return 'Op(%s, %r)' % (self.kind, self.key)
+
+    def _request(self, client):
+        build = getattr(client, '_%s_request' % self.kind)
+        return {self._kinds[self.kind][0]: build(self.key, **self.kwargs)}
+
+    def _response(self, client, response):
+        field = self._kinds[self.kind][1]
+        parse = getattr(client, '_%s_response' % self.kind)
+        if self.kind == 'range':
+            return parse(response.get(field, {}),
+                         keys_only=self.kwargs.get('keys_only', False))
+        return parse(response.get(field, {}))
+
+
+def get(key, range_end=None, prefix=False, **kwargs):
+    """
+    Read a key or a range of keys in a transaction. It takes the same
+    arguments as :py:meth:`~pyetcd.v3.V3Client.range`.
+
+    :rtype: Op
+    """
+    return Op('range', key, range_end=range_end, prefix=prefix, **kwargs)
+
+
+def put(key, value, prev_kv=False,  # pylint: disable=redefined-outer-name
+        **kwargs):
+    """
+    Write a key in a transaction. It takes the same
+    arguments as :py:meth:`~pyetcd.v3.V3Client.put`.
+
+    :rtype: Op
+    """
+    return Op('put', key, value=value, prev_kv=prev_kv, **kwargs)
+
+
+def delete(key, range_end=None, prefix=False, prev_kv=False):
+    """
+    Delete a key or a range of keys in a transaction. It takes the same
+    arguments as :py:meth:`~pyetcd.v3.V3Client.delete_range`.
+
+    :rtype: Op
+    """
+    return Op('delete_range', key, range_end=range_end, prefix=prefix,
+              prev_kv=prev_kv)
+
+
+class Txn(object):
+    """
+    Transaction builder. All conditions, operations and their results
+    travel in one ``/v3/kv/txn`` request and etcd applies them
+    atomically::
+
+        from pyetcd.txn import value, mod_revision, put, delete, get
+
+        response = client.txn().if_(
+            value('/config/version') == '41',
+            mod_revision('/config/lock') < 100
+        ).then(
+            put('/config/version', '42'),
+            delete('/config/pending', prefix=True)
+        ).else_(
+            get('/config/version')
+        ).commit()
+
+    If all conditions hold the ``then`` operations run, otherwise
+    the ``else`` ones. A transaction without conditions always
+    runs the ``then`` operations.
+
+    :param client: v3 client.
+    :type client: pyetcd.v3.V3Client
+    """
+    def __init__(self, client):
+        self._client = client
+        self._compares = []
+        self._success = []
+        self._failure = []
+
+    def if_(self, *compares):
+        """
+        Add conditions. All of them must hold.
+
+        :param compares: :py:class:`Compare` conditions.
+        :return: The transaction.
+        :raise ClientException: if an argument isn't a condition.
+        """
+        for compare in compares:
+            if not isinstance(compare, Compare):
+                raise ClientException('%r is not a condition' % (compare,))
+        self._compares.extend(compares)
+        return self
+
+    def then(self, *ops):
+        """
+        Add operations that run if the conditions hold.
+
+        :param ops: :py:class:`Op` operations.
+        :return: The transaction.
+        """
+        self._success.extend(ops)
+        return self
+
+    def else_(self, *ops):
+        """
+        Add operations that run if a condition fails.
+
+        :param ops: :py:class:`Op` operations.
+        :return: The transaction.
+        """
+        self._failure.extend(ops)
+        return self
+
+    def commit(self):
+        """
+        Send the transaction.
+
+        :return: Whether the conditions held, revision after
+            the transaction and responses of the operations that ran:
+            :py:class:`~pyetcd.v3.RangeResponse`,
+            :py:class:`~pyetcd.v3.PutResponse` or
+            :py:class:`~pyetcd.v3.DeleteRangeResponse`.
+        :rtype: TxnResponse
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        client = self._client
+        body = {
+            'compare': [compare._request(client)
+                        for compare in self._compares],
+            'success': [op._request(client) for op in self._success],
+            'failure': [op._request(client) for op in self._failure],
+        }
+        response = client.request('kv/txn', body)
+        succeeded = bool(response.get('succeeded', False))
+        ops = self._success if succeeded else self._failure
+        return TxnResponse(
+            succeeded=succeeded,
+            revision=client._revision(response),
+            responses=[
+                op._response(client, item)
+                for op, item in zip(ops, response.get('responses', []))
+            ]
+        )
@@ -0,0 +1,449 @@
+"""module with a client of the etcd v3 API through its JSON gateway."""
+import base64
+import json
+import threading
+from collections import namedtuple
+
+from pyetcd import EtcdStreamResult
+from pyetcd.auth import AUTH_TOKEN
+from pyetcd.client import Client, ClientException
+from pyetcd.lease import LeaseKeepAlive
+from pyetcd.txn import Txn
+
+_TEXT = type(u'')
+
+KeyValue = namedtuple(
+    'KeyValue',
+    ['key', 'value', 'create_revision', 'mod_revision', 'version', 'lease']
+)
+RangeResponse = namedtuple('RangeResponse',
+                           ['kvs', 'count', 'more', 'revision'])
+PutResponse = namedtuple('PutResponse', ['revision', 'prev_kv'])
+DeleteRangeResponse = namedtuple('DeleteRangeResponse',
+                                 ['deleted', 'revision', 'prev_kvs'])
+LeaseGrantResponse = namedtuple('LeaseGrantResponse', ['id', 'ttl'])
+LeaseTimeToLiveResponse = namedtuple(
+    'LeaseTimeToLiveResponse',
+    ['id', 'ttl', 'granted_ttl', 'keys']
+)
+
+SORT_ORDERS = ['NONE', 'ASCEND', 'DESCEND']
+SORT_TARGETS = ['KEY', 'VERSION', 'CREATE', 'MOD', 'VALUE']
+
+
+def prefix_range_end(prefix):
+    """
+    :param prefix: Key prefix.
+    :type prefix: bytes
+    :return: ``range_end`` that selects all keys starting with the prefix.
+    :rtype: bytes
+    """
+    end = bytearray(prefix)
+    while end and end[-1] == 0xff:
+        end.pop()
+    if not end:
+        # No key is greater than the prefix, select all keys after it
+        return b'\0'
+    end[-1] += 1
+    return bytes(end)
+
+
+class V3Client(Client):
+    """
+    Client of the etcd v3 API through its JSON gRPC gateway.
+
+    It accepts the same arguments as :py:class:`~pyetcd.client.Client`
+    and shares its nodes, failover and :py:meth:`submit`. v2 methods
+    keep working if the cluster serves the v2 API too.
+
+    Keys and values are sent base64 encoded as the gateway expects.
+    Strings are encoded with ``encoding``; keys and values in responses
+    are decoded with it, or returned as bytes if ``encoding`` is None.
+
+    :param kwargs: Keyword arguments of :py:class:`~pyetcd.client.Client`
+        and:
+
+        - **encoding** (str) - Encoding of keys and values.
+            Default is 'utf-8'.
+
+        ``auth`` defaults to 'token', the gateway checks the password
+        only when a token is fetched.
+    """
+    _default_auth = AUTH_TOKEN
+
+    def __init__(self, **kwargs):
+        self._encoding = kwargs.pop('encoding', 'utf-8')
+        super(V3Client, self).__init__(**kwargs)
+        self._lease_keeper = None
+        self._lease_keeper_lock = threading.Lock()
+
+    def close(self):
+        """
+        Stop keeping leases alive, wait for submitted requests to finish
+        and close connections to the cluster.
+        """
+        with self._lease_keeper_lock:
+            keeper, self._lease_keeper = self._lease_keeper, None
+        if keeper is not None:
+            keeper.close()
+        super(V3Client, self).close()
+
+    @property
+    def lease_keeper(self):
+        """
+        :py:class:`~pyetcd.lease.LeaseKeepAlive` shared by all leases
+        of the client. It's started on first use.
+        """
+        with self._lease_keeper_lock:
+            if self._lease_keeper is None:
+                self._lease_keeper = LeaseKeepAlive(self)
+            return self._lease_keeper
+
+    def request(self, path, body=None):
+        """
+        Send a request to a gateway endpoint.
+
+        :param path: Endpoint path after the gateway prefix,
+            e.g. ``'kv/range'``.
+        :param body: Request that will be sent as JSON.
+        :type body: dict
+        :return: Decoded response.
+        :rtype: dict
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        return self._request_call(
+            '%s/%s' % (self._gateway_prefix, path),
+            method='post',
+            json=body or {}
+        ).payload
+
+    def range(self,  # pylint: disable=too-many-arguments
+              key, range_end=None, prefix=False, limit=None,
+              keys_only=False, count_only=False,
+              sort_order=None, sort_target=None,
+              revision=None, serializable=False):
+        """
+        Read a key or a range of keys.
+
+        :param key: Key, or the first key of the range.
+        :param range_end: Key after the last key of the range.
+            ``'\\0'`` means all keys from ``key``.
+        :param prefix: Read all keys that start with ``key``.
+        :param limit: Maximum number of keys in the response.
+        :param keys_only: Return keys without values.
+        :param count_only: Return only the number of keys.
+        :param sort_order: One of 'NONE', 'ASCEND', 'DESCEND'.
+        :param sort_target: One of 'KEY', 'VERSION', 'CREATE', 'MOD',
+            'VALUE'.
+        :param revision: Read keys as of this revision.
+        :param serializable: Let the member serve the read from its local
+            data without a quorum. It's faster but may be stale.
+        :return: Keys, total number of keys in the range, whether there
+            are more keys than ``limit`` and the revision of the read.
+        :rtype: RangeResponse
+        :raise EtcdException: if etcd responds with error or HTTP error
+        :raise ClientException: if sort order or target is unknown.
+        """
+        body = self._range_request(
+            key, range_end=range_end, prefix=prefix, limit=limit,
+            keys_only=keys_only, count_only=count_only,
+            sort_order=sort_order, sort_target=sort_target,
+            revision=revision, serializable=serializable
+        )
+        return self._range_response(self.request('kv/range', body),
+                                    keys_only=keys_only)
+
+    def get(self, key, revision=None):
+        """
+        Read a key.
+
+        :param key: Key.
+        :param revision: Read the key as of this revision.
+        :return: The key or None if it doesn't exist.
+        :rtype: KeyValue
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        kvs = self.range(key, revision=revision).kvs
+        return kvs[0] if kvs else None
+
+    def iter_range(self,  # pylint: disable=too-many-arguments
+                   key, range_end=None, prefix=False, page_size=1000,
+                   keys_only=False, revision=None):
+        """
+        Read a range of keys page by page.
+
+        All pages are read at the revision of the first one, so they are
+        a consistent snapshot. Memory is bounded by ``page_size`` keys.
+
+        :param key: First key of the range.
+        :param range_end: Key after the last key of the range.
+        :param prefix: Read all keys that start with ``key``.
+        :param page_size: Number of keys read in one request.
+        :param keys_only: Return keys without values.
+        :param revision: Read keys as of this revision.
+            Default is the current revision.
+        :return: Generator of keys in ascending order.
+        :rtype: generator(KeyValue)
+        :raise EtcdException: if etcd responds with error or HTTP error
+        :raise EtcdCompacted: if the revision was compacted
+            while the range was read.
+        """
+        key = self._to_bytes(key)
+        if prefix:
+            range_end = prefix_range_end(key)
+        elif range_end is None:
+            range_end = b'\0'
+        while True:
+            response = self.range(key, range_end=range_end, limit=page_size,
+                                  keys_only=keys_only, revision=revision)
+            revision = revision or response.revision
+            for item in response.kvs:
+                yield item
+            if not response.more or not response.kvs:
+                return
+            key = self._to_bytes(response.kvs[-1].key) + b'\0'
+
+    def put(self, key, value, lease=None, prev_kv=False):
+        """
+        Write a key.
+
+        :param key: Key.
+        :param value: Value. A value that isn't a string or bytes is
+            converted to a string, as
+            :py:meth:`~pyetcd.client.Client.write` does.
+        :param lease: Lease ID. The key is deleted when the lease expires
+            or is revoked.
+        :param prev_kv: Return the previous key.
+        :return: Revision of the write and the previous key if requested
+            and the key existed.
+        :rtype: PutResponse
+        :raise TypeError: if the key isn't a string or bytes.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        return self._put_response(self.request(
+            'kv/put',
+            self._put_request(key, value, lease=lease, prev_kv=prev_kv)
+        ))
+
+    def delete_range(self, key, range_end=None, prefix=False, prev_kv=False):
+        """
+        Delete a key or a range of keys.
+
+        :param key: Key, or the first key of the range.
+        :param range_end: Key after the last key of the range.
+        :param prefix: Delete all keys that start with ``key``.
+        :param prev_kv: Return the deleted keys.
+        :return: Number of deleted keys, revision of the delete
+            and the deleted keys if requested.
+        :rtype: DeleteRangeResponse
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        return self._delete_range_response(self.request(
+            'kv/deleterange',
+            self._delete_range_request(key, range_end=range_end,
+                                       prefix=prefix, prev_kv=prev_kv)
+        ))
+
+    def lease_grant(self, ttl, lease_id=None, keepalive=False):
+        """
+        Create a lease. Keys put with the lease are deleted when it
+        expires or is revoked.
+
+        :param ttl: Lease TTL in seconds.
+        :param lease_id: Lease ID. Default is chosen by etcd.
+        :param keepalive: Keep the lease alive with :py:attr:`lease_keeper`
+            until it's revoked.
+        :return: Lease ID and TTL granted by etcd.
+        :rtype: LeaseGrantResponse
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        body = {'TTL': int(ttl)}
+        if lease_id:
+            body['ID'] = int(lease_id)
+        response = self.request('lease/grant', body)
+        grant = LeaseGrantResponse(id=int(response['ID']),
+                                   ttl=int(response['TTL']))
+        if keepalive:
+            self.lease_keeper.add(grant.id, grant.ttl)
+        return grant
+
+    def lease_revoke(self, lease_id):
+        """
+        Revoke a lease and delete its keys.
+
+        :param lease_id: Lease ID.
+        :raise EtcdException: if etcd responds with error or HTTP error
+        :raise EtcdKeyNotFound: if the lease doesn't exist.
+        """
+        if self._lease_keeper is not None:
+            self._lease_keeper.remove(lease_id)
+        self.request('lease/revoke', {'ID': int(lease_id)})
+
+    def lease_keepalive(self, *lease_ids):
+        """
+        Refresh leases. All of them are refreshed in one request:
+        the keepalive messages are streamed in one request body.
+
+        :param lease_ids: Lease IDs.
+        :return: Dictionary lease ID -> TTL after the refresh.
+            TTL is zero if the lease has expired.
+        :rtype: dict
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        if not lease_ids:
+            return {}
+        data = '\n'.join(json.dumps({'ID': int(lease_id)})
+                         for lease_id in lease_ids)
+        results = self._request_call(
+            '%s/lease/keepalive' % self._gateway_prefix,
+            method='post',
+            data=data,
+            headers={'Content-Type': 'application/json'},
+            result_class=EtcdStreamResult
+        ).payload
+        ttls = dict((int(lease_id), 0) for lease_id in lease_ids)
+        for result in results:
+            if 'ID' in result:
+                ttls[int(result['ID'])] = int(result.get('TTL', 0))
+        return ttls
+
+    def lease_timetolive(self, lease_id, keys=False):
+        """
+        Read remaining TTL of a lease.
+
+        :param lease_id: Lease ID.
+        :param keys: Return keys attached to the lease.
+        :return: Lease ID, remaining TTL, which is -1 if the lease
+            has expired, granted TTL and keys if requested.
+        :rtype: LeaseTimeToLiveResponse
+        :raise EtcdException: if etcd responds with error or HTTP error
+        """
+        body = {'ID': int(lease_id)}
+        if keys:
+            body['keys'] = True
+        response = self.request('lease/timetolive', body)
+        return LeaseTimeToLiveResponse(
+            id=int(response.get('ID', lease_id)),
+            ttl=int(response.get('TTL', -1)),
+            granted_ttl=int(response.get('grantedTTL', 0)),
+            keys=[self._decode(key) for key in response.get('keys', [])]
+        )
+
+    def txn(self):
+        """
+        Start a transaction, see :py:class:`~pyetcd.txn.Txn`.
+
+        :rtype: pyetcd.txn.Txn
+        """
+        return Txn(self)
+
+    def _range_request(self,  # pylint: disable=too-many-arguments
+                       key, range_end=None, prefix=False, limit=None,
+                       keys_only=False, count_only=False,
+                       sort_order=None, sort_target=None,
+                       revision=None, serializable=False):
+        body = self._key_range(key, range_end, prefix)
+        if sort_order is not None:
+            if sort_order not in SORT_ORDERS:
+                raise ClientException('Unknown sort order %s' % sort_order)
+            body['sort_order'] = sort_order
+        if sort_target is not None:
+            if sort_target not in SORT_TARGETS:
+                raise ClientException('Unknown sort target %s' % sort_target)
+            body['sort_target'] = sort_target
+        for name, value in (('limit', limit), ('revision', revision)):
+            if value:
+                body[name] = int(value)
+        for name, value in (('keys_only', keys_only),
+                            ('count_only', count_only),
+                            ('serializable', serializable)):
+            if value:
+                body[name] = True
+        return body
+
+    def _range_response(self, response, keys_only=False):
+        return RangeResponse(
+            kvs=[self._key_value(item, keys_only=keys_only)
+                 for item in response.get('kvs', [])],
+            count=int(response.get('count', 0)),
+            more=bool(response.get('more', False)),
+            revision=self._revision(response)
+        )
+
+    def _put_request(self, key, value, lease=None, prev_kv=False):
+        body = {'key': self._encode(key),
+                'value': self._encode(self._value_to_text(value))}
+        if lease:
+            body['lease'] = int(lease)
+        if prev_kv:
+            body['prev_kv'] = True
+        return body
+
+    def _put_response(self, response):
+        previous = response.get('prev_kv')
+        return PutResponse(
+            revision=self._revision(response),
+            prev_kv=self._key_value(previous) if previous else None
+        )
+
+    def _delete_range_request(self, key, range_end=None, prefix=False,
+                              prev_kv=False):
+        body = self._key_range(key, range_end, prefix)
+        if prev_kv:
+            body['prev_kv'] = True
+        return body
+
+    def _delete_range_response(self, response):
+        return DeleteRangeResponse(
+            deleted=int(response.get('deleted', 0)),
+            revision=self._revision(response),
+            prev_kvs=[self._key_value(item)
+                      for item in response.get('prev_kvs', [])]
+        )
+
+    def _key_range(self, key, range_end, prefix):
+        key = self._to_bytes(key)
+        if prefix:
+            range_end = prefix_range_end(key)
+        body = {'key': self._encode(key)}
+        if range_end is not None:
+            body['range_end'] = self._encode(range_end)
+        return body
+
+    def _to_bytes(self, data):
+        if isinstance(data, bytes):
+            return data
+        if not isinstance(data, _TEXT):
+            raise TypeError('Keys and values must be str or bytes, not %s'
+                            % type(data).__name__)
+        return data.encode(self._encoding or 'utf-8')
+
+    @staticmethod
+    def _value_to_text(value):
+        """Convert a value like the v2 API does with form fields."""
+        if isinstance(value, (bytes, _TEXT)):
+            return value
+        return str(value)
+
+    def _encode(self, data):
+        return base64.b64encode(self._to_bytes(data)).decode('ascii')
+
+    def _decode(self, data):
+        data = base64.b64decode(data or '')
+        if self._encoding:
+            return data.decode(self._encoding)
+        return data
+
+    def _key_value(self, item, keys_only=False):
+        return KeyValue(
+            key=self._decode(item['key']),
+            value=None if keys_only else self._decode(item.get('value')),
+            create_revision=int(item.get('create_revision', 0)),
+            mod_revision=int(item.get('mod_revision', 0)),
+            version=int(item.get('version', 0)),
+            lease=int(item.get('lease', 0))
+        )
+
+    @staticmethod
+    def _revision(response):
+        return int(response.get('header', {}).get('revision', 0))
@@ -0,0 +1,420 @@
+"""module to watch etcd v3 keys through the gateway's streaming endpoint."""
+# pylint: disable=protected-access
+import codecs
+import json
+import logging
+import re
+import socket
+import threading
+from collections import namedtuple
+
+from requests import RequestException
+
+from pyetcd import EtcdException, EtcdCompacted, EtcdResult
+from pyetcd.client import ClientException
+from pyetcd.v3 import prefix_range_end
+
+LOG = logging.getLogger(__name__)
+
+EVENT_PUT = 'PUT'
+EVENT_DELETE = 'DELETE'
+
+WatchEvent = namedtuple('WatchEvent', ['type', 'kv', 'prev_kv'])
+
+
+class JSONStreamDecoder(object):  # pylint: disable=too-few-public-methods
+    """
+    Incremental decoder of a stream of JSON objects.
+
+    The gateway sends one object per message, but an HTTP chunk may hold
+    a part of a message or several of them. :py:meth:`feed` scans only
+    the new data for the end of the current object and returns
+    the objects that are complete so far, so a large message split
+    into many chunks isn't parsed again with every chunk.
+    """
+    _TOKENS = re.compile(r'\\.|["{}\\]', re.DOTALL)
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, data):
+        """
+        Add data received from the stream.
+
+        :param data: Next part of the stream.
+        :type data: bytes
+        :return: Objects completed by the data.
+        :rtype: list
+        :raise ValueError: if the stream isn't valid JSON.
+        """
+        text = self._text.decode(data)
+        objects = []
+        start = 0
+        position = 0
+        if self._escape and text:
+            # The previous part ended with a backslash in a string
+            self._escape = False
+            position = 1
+        for match in self._TOKENS.finditer(text, position):
+            token = match.group()
+            if self._in_string:
+                if token == '"':
+                    self._in_string = False
+                elif token == '\\':
+                    self._escape = True
+            elif token == '"':
+                self._in_string = True
+            elif token == '{':
+                self._depth += 1
+            elif token == '}':
+                self._depth -= 1
+                if self._depth < 0:
+                    raise ValueError('Unexpected } in the stream')
+                if self._depth == 0:
+                    self._parts.append(text[start:match.end()])
+                    start = match.end()
+                    objects.append(json.loads(''.join(self._parts)))
+                    self._parts = []
+        if start < len(text):
+            self._parts.append(text[start:])
+        return objects
+
+
+class Watch(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Watch of a key or a range of keys in a :py:class:`WatchStream`.
+
+    :py:attr:`revision` is the revision the watch resumes from if the
+    stream reconnects. It moves past every delivered event and with
+    progress notifications.
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 stream, key, range_end, callback, start_revision, prev_kv):
+        self._stream = stream
+        self.key = key
+        self.range_end = range_end
+        self.callback = callback
+        self.revision = start_revision
+        self.prev_kv = prev_kv
+        self.watch_id = None
+        self.error = None
+
+    def __repr__(self):
+        return 'Watch(%r, %r, revision=%r)' % (self.key, self.range_end,
+                                               self.revision)
+
+    def cancel(self):
+        """Stop delivering events of the watch."""
+        self._stream.cancel(self)
+
+    def _request(self, client, progress_notify):
+        request = {'key': client._encode(self.key)}
+        if self.range_end is not None:
+            request['range_end'] = client._encode(self.range_end)
+        if self.revision:
+            request['start_revision'] = self.revision
+        if self.prev_kv:
+            request['prev_kv'] = True
+        if progress_notify:
+            request['progress_notify'] = True
+        return {'create_request': request}
+
+
+class WatchStream(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Watches many keys and ranges over one streaming ``/v3/watch``
+    request.
+
+    The create requests of all watches are sent in one request body and
+    etcd sends their events back in one chunked response, which is
+    parsed as it arrives. Unlike a v2 watch there's no new request
+    per event, so no change falls into a gap between requests.
+
+    If the connection drops the stream reconnects after
+    ``retry_interval`` seconds and every watch resumes from its
+    :py:attr:`Watch.revision`, so no event is lost or delivered twice.
+    A connection that receives nothing for ``read_timeout`` seconds
+    is treated as dropped, so a half-open connection doesn't stop
+    the watches.
+    With ``progress_notify`` etcd periodically reports the revision
+    a watch has reached even if its keys don't change, which keeps
+    the resume revision recent.
+
+    Adding a watch reconnects the stream with all watches. A cancelled
+    watch is dropped from the next connection; until then its events
+    are ignored.
+
+    If etcd cancels a watch, e.g. because its revision was compacted,
+    the watch is dropped, its :py:attr:`Watch.error` is set
+    and ``on_cancel`` is called with the watch.
+
+    Callbacks run in the stream thread. An exception raised by one
+    is logged and doesn't affect other events or watches.
+
+    :param client: v3 client.
+    :type client: pyetcd.v3.V3Client
+    :param progress_notify: Ask etcd for progress notifications.
+    :param retry_interval: Seconds before reconnecting.
+    :param on_cancel: Function that is called with a watch
+        cancelled by etcd.
+    :param read_timeout: Seconds to wait for data on the connection.
+        Keep it longer than etcd's progress notification interval,
+        10 minutes by default, or quiet streams reconnect.
+    """
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 client, progress_notify=True, retry_interval=1.0,
+                 on_cancel=None, read_timeout=660):
+        self._client = client
+        self._progress_notify = progress_notify
+        self._retry_interval = retry_interval
+        self._read_timeout = read_timeout
+        self._on_cancel = on_cancel
+        self._watches = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._reconnect = False
+        self._response = None
+        self._connects = 0
+        self._failed = 0
+        self._events = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._watches)
+
+    @property
+    def connects(self):
+        """Number of stream connections."""
+        return self._connects
+
+    @property
+    def failed(self):
+        """Number of connections that failed or dropped."""
+        return self._failed
+
+    @property
+    def events(self):
+        """Number of delivered events."""
+        return self._events
+
+    def watch(self,  # pylint: disable=too-many-arguments
+              key, callback, range_end=None, prefix=False,
+              start_revision=None, prev_kv=False):
+        """
+        Start watching a key or a range of keys.
+
+        :param key: Key, or the first key of the range.
+        :param callback: Function that is called with every
+            :py:class:`WatchEvent`.
+        :param range_end: Key after the last key of the range.
+        :param prefix: Watch all keys that start with ``key``.
+        :param start_revision: Deliver events from this revision.
+            Default is events after the watch is created.
+        :param prev_kv: Deliver keys as they were before the events.
+        :return: The watch.
+        :rtype: Watch
+        :raise ClientException: if the stream is closed.
+        """
+        key = self._client._to_bytes(key)
+        if prefix:
+            range_end = prefix_range_end(key)
+        elif range_end is not None:
+            range_end = self._client._to_bytes(range_end)
+        watch = Watch(self, key, range_end, callback,
+                      start_revision, prev_kv)
+        with self._condition:
+            if self._closed:
+                raise ClientException('Watch stream is closed')
+            self._watches.append(watch)
+            self._reconnect = True
+            self._condition.notify()
+        self._interrupt()
+        return watch
+
+    def cancel(self, watch):
+        """
+        Stop delivering events of a watch.
+
+        :param watch: The watch.
+        :type watch: Watch
+        """
+        with self._condition:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def close(self):
+        """Stop all watches and close the connection."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            del self._watches[:]
+            self._condition.notify()
+        self._interrupt()
+        self._thread.join()
+
+    def _interrupt(self):
+        with self._condition:
+            response = self._response
+        if response is None:
+            return
+        # Shut the socket down to wake up the thread blocked reading it,
+        # closing the response alone doesn't.
+        try:
+            response.raw.connection.sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, socket.error):
+            pass
+        response.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._watches:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._reconnect = False
+                watches = list(self._watches)
+
+            try:
+                self._stream(watches)
+            except (RequestException, EtcdException, ValueError):
+                pass
+
+            with self._condition:
+                self._response = None
+                if not self._reconnect and not self._closed:
+                    self._failed += 1
+                    self._condition.wait(self._retry_interval)
+
+    def _stream(self, watches):
+        client = self._client
+        body = '\n'.join(
+            json.dumps(watch._request(client, self._progress_notify))
+            for watch in watches
+        )
+        response = self._connect(body)
+        with self._condition:
+            self._connects += 1
+            if self._closed or self._reconnect:
+                response.close()
+                return
+            self._response = response
+
+        decoder = JSONStreamDecoder()
+        pending = list(watches)
+        by_id = {}
+        for chunk in response.iter_content(chunk_size=None):
+            for message in decoder.feed(chunk):
+                if 'error' in message:
+                    raise EtcdException(message['error'])
+                self._dispatch(message.get('result', {}), pending, by_id)
+
+    def _connect(self, body):
+        client = self._client
+        uri = '%s/watch' % client._gateway_prefix
+        error_messages = []
+        for endpoint in client._select_urls():
+            try:
+                response = client._session.post(
+                    endpoint + uri,
+                    data=body,
+                    headers={'Content-Type': 'application/json'},
+                    stream=True,
+                    timeout=self._read_timeout
+                )
+            except RequestException as err:
+                error_messages.append('%s: %s' % (endpoint, err))
+                continue
+            if response.status_code != 200:
+                # Raises an exception that matches the error
+                EtcdResult(response)
+                raise EtcdException('%s: HTTP %d'
+                                    % (endpoint, response.status_code))
+            return response
+        raise EtcdException(
+            'No more hosts to connect.\nErrors: %s'
+            % '\n'.join(error_messages)
+        )
+
+    def _dispatch(self, result, pending, by_id):
+        revision = self._client._revision(result)
+        watch_id = int(result.get('watch_id', 0))
+        if result.get('created') and pending:
+            # etcd creates watches in the order of the requests
+            watch = pending.pop(0)
+            watch.watch_id = watch_id
+            by_id[watch_id] = watch
+            with self._condition:
+                if not watch.revision:
+                    watch.revision = revision + 1
+            if not result.get('canceled'):
+                return
+
+        if watch_id == -1:
+            # Progress of all watches of the stream
+            watches = list(by_id.values())
+        else:
+            watches = [by_id[watch_id]] if watch_id in by_id else []
+        with self._condition:
+            watches = [watch for watch in watches if watch in self._watches]
+        if not watches:
+            return
+
+        if result.get('canceled'):
+            self._cancelled(watches[0], result)
+        elif result.get('events'):
+            self._deliver(watches[0], result['events'])
+        else:
+            with self._condition:
+                for watch in watches:
+                    watch.revision = max(watch.revision or 0, revision + 1)
+
+    def _deliver(self, watch, events):
+        client = self._client
+        for event in events:
+            previous = event.get('prev_kv')
+            watch_event = WatchEvent(
+                type=event.get('type', EVENT_PUT),
+                kv=client._key_value(event['kv']),
+                prev_kv=client._key_value(previous) if previous else None
+            )
+            with self._condition:
+                self._events += 1
+                watch.revision = max(watch.revision or 0,
+                                     watch_event.kv.mod_revision + 1)
+            try:
+                watch.callback(watch_event)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Watch callback failed on %s',
+                              watch_event.kv.key)
+
+    def _cancelled(self, watch, result):
+        compact_revision = int(result.get('compact_revision', 0))
+        if compact_revision:
+            watch.error = EtcdCompacted(
+                'Revision %s is compacted, the oldest available is %d'
+                % (watch.revision, compact_revision)
+            )
+        else:
+            watch.error = EtcdException(
+                result.get('cancel_reason') or 'Watch cancelled by etcd'
+            )
+        self.cancel(watch)
+        if self._on_cancel is not None:
+            try:
+                self._on_cancel(watch)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Watch cancel callback failed on %r', watch)
@@ -0,0 +1,158 @@
+"""module to buffer writes of keys where only the latest value matters."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pyetcd import EtcdException
+from pyetcd.client import ClientException
+
+LOG = logging.getLogger(__name__)
+
+
+class CoalescingWriter(object):
+    """
+    Buffers :py:meth:`~pyetcd.client.Client.write` calls and keeps
+    only the newest value of each key.
+
+    Pending keys are written concurrently every ``interval`` seconds
+    or as soon as ``max_pending`` keys are buffered.
+    A key that failed to write with :py:class:`~pyetcd.EtcdException`
+    is written on the next flush unless a newer value has been buffered
+    since. A key that failed with any other error is dropped.
+
+    :param client: etcd client.
+    :type client: pyetcd.client.Client
+    :param interval: Seconds between flushes.
+    :param max_pending: Number of pending keys that triggers a flush.
+    :param max_workers: Number of concurrent write requests.
+    """
+    def __init__(self, client, interval=1.0, max_pending=100, max_workers=8):
+        self._client = client
+        self._interval = interval
+        self._max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._collapsed = 0
+        self._written = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def collapsed(self):
+        """Number of writes replaced by a newer value before a flush."""
+        return self._collapsed
+
+    @property
+    def written(self):
+        """Number of keys written to etcd."""
+        return self._written
+
+    @property
+    def pending(self):
+        """Number of keys waiting for a flush."""
+        return len(self._pending)
+
+    def write(self, key, value, ttl=None):
+        """
+        Buffer a write. It replaces a pending write of the same key.
+
+        :param key: Key
+        :param value: Value
+        :param ttl: Key TTL in seconds.
+        :raise ClientException: if the writer is closed.
+        """
+        with self._lock:
+            if self._closed:
+                raise ClientException('Writer is closed')
+            if key in self._pending:
+                self._collapsed += 1
+            self._pending[key] = (value, ttl)
+            full = len(self._pending) >= self._max_pending
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Write all pending keys and wait for the writes to finish.
+
+        :return: Number of written keys.
+        :rtype: int
+        :raise EtcdException: if any key failed to write.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+
+            futures = dict(
+                (
+                    self._executor.submit(
+                        self._client.write, key, value, ttl=ttl
+                    ),
+                    key
+                )
+                for key, (value, ttl) in batch.items()
+            )
+            errors = []
+            written = 0
+            for future, key in futures.items():
+                try:
+                    future.result()
+                    written += 1
+                except EtcdException as err:
+                    errors.append("%s: %s" % (key, err))
+                    with self._lock:
+                        self._pending.setdefault(key, batch[key])
+                except Exception as err:  # pylint: disable=broad-except
+                    # Not an etcd error, the write would fail again
+                    errors.append("%s: %r" % (key, err))
+
+            with self._lock:
+                self._written += written
+            if errors:
+                raise EtcdException(
+                    'Failed to write %d keys.\nErrors: %s'
+                    % (len(errors), '\n'.join(errors))
+                )
+            return written
+
+    def close(self):
+        """
+        Stop the background flushes and write pending keys.
+
+        :raise EtcdException: if any key failed to write.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except EtcdException:
+                # Failed keys are written on the next flush
+                pass
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Flush of buffered writes failed')
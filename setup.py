@@ -26,10 +26,16 @@ setup(
     url='https://github.com/twindb/pyetcd',
     packages=[
         'pyetcd',
+        'pyetcd.recipes',
     ],
     package_dir={'pyetcd':
                  'pyetcd'},
     include_package_data=True,
+    entry_points={
+        'console_scripts': [
+            'pyetcd=pyetcd.cli:main',
+        ],
+    },
     install_requires=requirements,
     license="Apache Software License 2.0",
     zip_safe=False,
@@ -0,0 +1,49 @@
+import mock
+import pytest
+
+from pyetcd.client import Client
+
+
+@pytest.mark.parametrize('ttl, data', [
+    (
+        None,
+        {
+            'value': 'bar'
+        }
+    ),
+    (
+        10,
+        {
+            'value': 'bar',
+            'ttl': 10
+        }
+    )
+])
+@mock.patch.object(Client, '_request_key')
+def test_append(mock_request_key, ttl, data, default_etcd):
+    default_etcd.append('/queue', 'bar', ttl=ttl)
+    mock_request_key.assert_called_once_with('/queue', method='post',
+                                             data=data)
+
+
+def test_append_response(default_etcd):
+    payload = """
+    {
+        "action": "create",
+        "node": {
+            "createdIndex": 6,
+            "key": "/queue/00000000000000000006",
+            "modifiedIndex": 6,
+            "value": "bar"
+        }
+    }
+    """
+    mock_requests = mock.Mock()
+    mock_requests.post.return_value = mock.Mock(content=payload)
+    default_etcd._session = mock_requests
+    response = default_etcd.append('/queue', 'bar')
+    assert response.node['key'] == '/queue/00000000000000000006'
+    mock_requests.post.assert_called_once_with(
+        'http://127.0.0.1:2379/v2/keys/queue',
+        data={'value': 'bar'}
+    )
@@ -0,0 +1,77 @@
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound, EtcdTestFailed, EtcdNodeExist
+from pyetcd.client import Client
+
+
+def _result(value, index):
+    return mock.Mock(node={'value': value, 'modifiedIndex': index})
+
+
+@mock.patch('pyetcd.client.time.sleep')
+@mock.patch.object(Client, 'compare_and_swap')
+@mock.patch.object(Client, 'read')
+def test_atomic_update(mock_read, mock_cas, mock_sleep, default_etcd):
+    mock_read.side_effect = [_result('1', 10), _result('5', 11)]
+    mock_cas.side_effect = [EtcdTestFailed, 'result']
+    assert default_etcd.atomic_update(
+        '/counter', lambda value: str(int(value) + 1)
+    ) == 'result'
+    assert mock_cas.call_args_list == [
+        mock.call('/counter', '2', prev_index=10),
+        mock.call('/counter', '6', prev_index=11),
+    ]
+    assert mock_sleep.call_count == 1
+    assert default_etcd.metrics['atomic_update_retries'] == 1
+    assert default_etcd.metrics['atomic_update_conflicts'] == 1
+    assert default_etcd.hot_keys() == [('/counter', 1)]
+
+
+@mock.patch.object(Client, 'compare_and_swap')
+@mock.patch.object(Client, 'read')
+def test_atomic_update_missing_key(mock_read, mock_cas, default_etcd):
+    mock_read.side_effect = EtcdKeyNotFound
+    default_etcd.atomic_update('/counter', lambda value: value or '1')
+    mock_cas.assert_called_once_with('/counter', '1', prev_exist=False)
+
+
+@mock.patch.object(Client, 'compare_and_swap')
+@mock.patch.object(Client, 'read')
+def test_atomic_update_same_value(mock_read, mock_cas, default_etcd):
+    current = _result('1', 10)
+    mock_read.return_value = current
+    assert default_etcd.atomic_update('/foo', lambda value: value) is current
+    assert not mock_cas.called
+
+
+@mock.patch('pyetcd.client.time.sleep')
+@mock.patch.object(Client, 'compare_and_swap')
+@mock.patch.object(Client, 'read')
+def test_atomic_update_gives_up(mock_read, mock_cas, mock_sleep,
+                                default_etcd):
+    mock_read.side_effect = EtcdKeyNotFound
+    mock_cas.side_effect = EtcdNodeExist
+    with pytest.raises(EtcdNodeExist):
+        default_etcd.atomic_update('/foo', lambda value: 'bar',
+                                   max_retries=3, backoff=0.1)
+    assert mock_cas.call_count == 4
+    assert default_etcd.metrics['atomic_update_retries'] == 3
+    assert default_etcd.metrics['atomic_update_conflicts'] == 4
+    for attempt, call in enumerate(mock_sleep.call_args_list):
+        assert 0 <= call[0][0] <= 0.1 * 2 ** attempt
+
+
+@mock.patch('pyetcd.client.time.sleep')
+@mock.patch.object(Client, 'compare_and_swap')
+@mock.patch.object(Client, 'read')
+def test_atomic_update_hot_keys_bounded(mock_read, mock_cas, mock_sleep):
+    client = Client(hot_keys_size=2)
+    mock_read.side_effect = EtcdKeyNotFound
+    mock_cas.side_effect = EtcdNodeExist
+    for key in ['/a', '/a', '/a', '/b', '/c', '/c', '/c']:
+        with pytest.raises(EtcdNodeExist):
+            client.atomic_update(key, lambda value: 'v', max_retries=0)
+    assert client.metrics['atomic_update_conflicts'] == 7
+    # /c took over the count of /b
+    assert client.hot_keys() == [('/c', 4), ('/a', 3)]
@@ -0,0 +1,223 @@
+import threading
+
+import mock
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from pyetcd import EtcdException, EtcdTimeout
+from pyetcd.client import Client, ClientException
+from tests.unit.util import wait_for
+
+
+@pytest.mark.parametrize('consistency, url', [
+    (
+        'linearizable',
+        'http://127.0.0.1:2379/v2/keys/foo?quorum=true'
+    ),
+    (
+        'stale',
+        'http://127.0.0.1:2379/v2/keys/foo'
+    )
+])
+def test_read_consistency(consistency, url, default_etcd,
+                          payload_read_success):
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = mock.Mock(content=payload_read_success)
+    default_etcd._session = mock_requests
+    response = default_etcd.read('/foo', consistency=consistency)
+    assert response.node['value'] == 'Hello world'
+    mock_requests.get.assert_called_once_with(url)
+
+
+def test_read_default_consistency(payload_read_success):
+    client = Client(consistency='linearizable')
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = mock.Mock(content=payload_read_success)
+    client._session = mock_requests
+    client.read('/foo')
+    mock_requests.get.assert_called_once_with(
+        'http://127.0.0.1:2379/v2/keys/foo?quorum=true')
+
+
+def test_read_unknown_consistency(default_etcd):
+    with pytest.raises(ClientException):
+        default_etcd.read('/foo', consistency='foo')
+    with pytest.raises(ClientException):
+        Client(consistency='foo')
+
+
+def test_read_leader(payload_read_success):
+    client = Client(host=['10.0.1.1', '10.0.1.2', '10.0.1.3'])
+    stats = {
+        'http://10.0.1.1:2379/v2/stats/self': '{"state": "StateFollower"}',
+        'http://10.0.1.2:2379/v2/stats/self': '{"state": "StateLeader"}',
+    }
+
+    def get(url):
+        return mock.Mock(content=stats.get(url, payload_read_success))
+
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(side_effect=get)
+    client._session = mock_requests
+
+    client.read('/foo', consistency='leader')
+    client.read('/foo', consistency='leader')
+    assert mock_requests.get.call_args_list == [
+        mock.call('http://10.0.1.1:2379/v2/stats/self'),
+        mock.call('http://10.0.1.2:2379/v2/stats/self'),
+        mock.call('http://10.0.1.2:2379/v2/keys/foo'),
+        mock.call('http://10.0.1.2:2379/v2/keys/foo'),
+    ]
+
+
+def test_read_leader_not_found(payload_read_success):
+    client = Client(host=['10.0.1.1', '10.0.1.2'])
+
+    def get(url):
+        if url.endswith('/v2/stats/self'):
+            return mock.Mock(content='{"state": "StateFollower"}')
+        return mock.Mock(content=payload_read_success)
+
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(side_effect=get)
+    client._session = mock_requests
+    # Falls back to a quorum read
+    assert client.read('/foo', consistency='leader').node['value'] \
+        == 'Hello world'
+    assert mock_requests.get.call_args_list[-1] == mock.call(
+        'http://10.0.1.1:2379/v2/keys/foo?quorum=true'
+    )
+
+
+def test_read_leader_unreachable():
+    client = Client(host=['10.0.1.1', '10.0.1.2'])
+    mock_requests = mock.Mock()
+    mock_requests.get.side_effect = ConnectionError('refused')
+    client._session = mock_requests
+    with pytest.raises(EtcdException):
+        client.read('/foo', consistency='leader')
+
+
+def test_read_leader_fails_over(payload_read_success):
+    client = Client(host=['10.0.1.1', '10.0.1.2', '10.0.1.3'])
+    stats = {
+        'http://10.0.1.1:2379/v2/stats/self': '{"state": "StateFollower"}',
+        'http://10.0.1.2:2379/v2/stats/self': '{"state": "StateLeader"}',
+        'http://10.0.1.3:2379/v2/stats/self': '{"state": "StateFollower"}',
+    }
+    down = set()
+
+    def get(url):
+        if url.split('/')[2] in down:
+            raise ConnectionError('refused')
+        return mock.Mock(content=stats.get(url, payload_read_success))
+
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(side_effect=get)
+    client._session = mock_requests
+    client.read('/foo', consistency='leader')
+
+    # The leader goes down and 10.0.1.3 is elected
+    down.add('10.0.1.2:2379')
+    stats['http://10.0.1.3:2379/v2/stats/self'] = '{"state": "StateLeader"}'
+    mock_requests.get.reset_mock()
+    client.read('/foo', consistency='leader')
+    client.read('/foo', consistency='leader')
+    assert mock_requests.get.call_args_list == [
+        mock.call('http://10.0.1.2:2379/v2/keys/foo'),
+        mock.call('http://10.0.1.1:2379/v2/stats/self'),
+        mock.call('http://10.0.1.3:2379/v2/stats/self'),
+        mock.call('http://10.0.1.3:2379/v2/keys/foo'),
+        mock.call('http://10.0.1.3:2379/v2/keys/foo'),
+    ]
+
+
+def test_read_leader_timeout_forgets_leader(payload_read_success):
+    client = Client(host=['10.0.1.1', '10.0.1.2'])
+    client._selector.leader = 'http://10.0.1.1:2379'
+    mock_requests = mock.Mock()
+    mock_requests.get.side_effect = ReadTimeout('timed out')
+    client._session = mock_requests
+    with pytest.raises(EtcdTimeout):
+        client.read('/foo', consistency='leader')
+    assert client._selector.leader is None
+
+
+def test_read_stale_spreads_across_nodes(payload_read_success):
+    client = Client(host=['10.0.1.1', '10.0.1.2', '10.0.1.3'])
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = mock.Mock(content=payload_read_success)
+    client._session = mock_requests
+    for _ in range(60):
+        client.read('/foo', consistency='stale')
+    hosts = set(
+        call[0][0].split('/')[2] for call in mock_requests.get.call_args_list
+    )
+    assert len(hosts) > 1
+
+
+def test_read_coalesced(payload_read_success):
+    client = Client(coalesce_reads=True)
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = mock.Mock(content=payload_read_success)
+    client._session = mock_requests
+    assert client.read('/foo').node['value'] == 'Hello world'
+    assert client.metrics['coalesced_reads'] == 0
+    mock_requests.get.assert_called_once_with(
+        'http://127.0.0.1:2379/v2/keys/foo')
+
+
+def _blocking_get(content):
+    release = threading.Event()
+
+    def get(url):
+        release.wait(5)
+        return mock.Mock(content=content)
+
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(side_effect=get)
+    return mock_requests, release
+
+
+def _run_threads(func, number):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(func()))
+               for _ in range(number)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_reads_coalesced(payload_read_success):
+    client = Client(coalesce_reads=True)
+    client._session, release = _blocking_get(payload_read_success)
+    threads, results = _run_threads(lambda: client.read('/foo'), 5)
+    assert wait_for(lambda: client.metrics['coalesced_reads'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    client._session.get.assert_called_once_with(
+        'http://127.0.0.1:2379/v2/keys/foo')
+    assert [result.node['value'] for result in results] \
+        == ['Hello world'] * 5
+
+
+def test_concurrent_watches_not_coalesced(payload_read_success):
+    client = Client(coalesce_reads=True)
+    client._session, release = _blocking_get(payload_read_success)
+    threads, _ = _run_threads(lambda: client.watch('/foo', wait_index=5), 3)
+    assert wait_for(lambda: client._session.get.call_count == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert client.metrics['coalesced_reads'] == 0
+
+
+def test_write_is_not_coalesced(payload_write_success):
+    client = Client(coalesce_reads=True)
+    client._singleflight = mock.Mock()
+    mock_requests = mock.Mock()
+    mock_requests.put.return_value = mock.Mock(content=payload_write_success)
+    client._session = mock_requests
+    client.write('/foo', 'bar')
+    assert not client._singleflight.do.called
@@ -0,0 +1,50 @@
+import threading
+
+import mock
+import pytest
+
+from pyetcd.client import Client, ClientException
+
+
+def test_submit_read(default_etcd, payload_read_success):
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = mock.Mock(content=payload_read_success)
+    default_etcd._session = mock_requests
+    futures = [default_etcd.submit_read('/foo') for _ in range(10)]
+    assert [f.result().node['value'] for f in futures] == ['Hello world'] * 10
+    default_etcd.close()
+
+
+@mock.patch.object(Client, 'write')
+def test_submit_write(mock_write, default_etcd):
+    default_etcd.submit_write('/foo', 'bar', ttl=10).result()
+    mock_write.assert_called_once_with('/foo', 'bar', ttl=10)
+    default_etcd.close()
+
+
+@mock.patch.object(Client, 'compare_and_delete')
+def test_submit_by_name(mock_cad, default_etcd):
+    mock_cad.return_value = 'foo'
+    future = default_etcd.submit('compare_and_delete', '/foo', prev_index=10)
+    assert future.result() == 'foo'
+    mock_cad.assert_called_once_with('/foo', prev_index=10)
+    default_etcd.close()
+
+
+def test_submit_cancel():
+    client = Client(max_workers=1)
+    release = threading.Event()
+    running = client.submit(release.wait)
+    pending = client.submit(lambda: 'foo')
+    assert pending.cancel()
+    release.set()
+    assert running.result() is True
+    assert pending.cancelled()
+    client.close()
+
+
+def test_submit_after_close(default_etcd):
+    with default_etcd:
+        pass
+    with pytest.raises(ClientException):
+        default_etcd.submit_read('/foo')
@@ -0,0 +1,88 @@
+import mock
+import pytest
+from requests import ReadTimeout, ConnectionError
+from urllib3.exceptions import ReadTimeoutError
+
+from pyetcd import EtcdTimeout, EtcdException
+from pyetcd.client import Client
+
+
+@pytest.mark.parametrize('kwargs, uri, request_kwargs', [
+    (
+        {},
+        '/v2/keys/foo?wait=true',
+        {
+            'coalesce': False,
+            'long_poll': True
+        }
+    ),
+    (
+        {
+            'wait_index': 10,
+            'recursive': True,
+            'timeout': 5
+        },
+        '/v2/keys/foo?recursive=true&wait=true&waitIndex=10',
+        {
+            'coalesce': False,
+            'long_poll': True,
+            'timeout': 5
+        }
+    ),
+])
+@mock.patch.object(Client, '_request_call')
+def test_watch(mock_call, kwargs, uri, request_kwargs, default_etcd):
+    default_etcd.watch('/foo', **kwargs)
+    mock_call.assert_called_once_with(uri, method='get', **request_kwargs)
+
+
+@pytest.mark.parametrize('error', [
+    ReadTimeout(),
+    ConnectionError(ReadTimeoutError(None, None, 'Read timed out.'))
+])
+def test_watch_timeout(error):
+    client = Client(host=['10.0.1.1', '10.0.1.2'])
+    mock_requests = mock.Mock()
+    mock_requests.get.side_effect = error
+    client._session = mock_requests
+    with pytest.raises(EtcdTimeout):
+        client.watch('/foo', timeout=1)
+    assert mock_requests.get.call_count == 1
+
+
+def test_connection_error_is_not_timeout():
+    client = Client(host=['10.0.1.1', '10.0.1.2'])
+    mock_requests = mock.Mock()
+    mock_requests.get.side_effect = ConnectionError()
+    client._session = mock_requests
+    with pytest.raises(EtcdException) as err:
+        client.watch('/foo', timeout=1)
+    assert not isinstance(err.value, EtcdTimeout)
+    assert mock_requests.get.call_count == 2
+
+
+def test_watch_does_not_affect_selection(payload_read_success):
+    client = Client(host=['10.0.1.1', '10.0.1.2', '10.0.1.3'])
+    client._selector.leader = 'http://10.0.1.1:2379'
+
+    def get(url, **kwargs):
+        if 'wait=true' in url:
+            raise ReadTimeout()
+        return mock.Mock(content=payload_read_success)
+
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(side_effect=get)
+    client._session = mock_requests
+    for _ in range(3):
+        with pytest.raises(EtcdTimeout):
+            client.watch('/foo', timeout=0.5)
+    selector = client._selector
+    assert selector.latency('http://10.0.1.1:2379') == 0
+    assert selector.inflight('http://10.0.1.1:2379') == 0
+    assert selector.leader == 'http://10.0.1.1:2379'
+
+    for _ in range(300):
+        client.read('/foo', consistency='stale')
+    hosts = [call[0][0].split('/')[2]
+             for call in mock_requests.get.call_args_list[3:]]
+    assert hosts.count('10.0.1.1:2379') > 0
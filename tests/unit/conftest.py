@@ -1,6 +1,7 @@
 import pytest
 
 from pyetcd.client import Client
+from tests.unit.v3_server import V3Server
 
 
 @pytest.fixture
@@ -97,3 +98,10 @@ def payload_self():
     "startTime": "2016-09-19T06:08:51.527241706Z",
     "state": "StateLeader"
 }"""
+
+
+@pytest.fixture
+def v3_server():
+    server = V3Server().start()
+    yield server
+    server.stop()
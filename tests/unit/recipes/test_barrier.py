@@ -0,0 +1,74 @@
+import mock
+import pytest
+
+from pyetcd import EtcdNodeExist, EtcdTimeout, EtcdKeyNotFound
+from pyetcd.client import Client
+from pyetcd.recipes import Barrier
+
+
+def _listing(waiting, ready=False):
+    nodes = [{
+        'key': '/b/waiting',
+        'dir': True,
+        'nodes': [{'key': '/b/waiting/%d' % i} for i in range(waiting)]
+    }]
+    if ready:
+        nodes.append({'key': '/b/ready', 'value': 'ready'})
+    return mock.Mock(node={'key': '/b', 'dir': True, 'nodes': nodes},
+                     x_etcd_index=100)
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.append.return_value = mock.Mock(node={'key': '/b/waiting/9'})
+    return client
+
+
+def test_barrier_last_participant_opens(client):
+    client.read.return_value = _listing(3)
+    assert Barrier(client, '/b', 3, ttl=10).wait()
+    client.append.assert_called_once_with('/b/waiting', 'waiting', ttl=10)
+    client.compare_and_swap.assert_called_once_with('/b/ready', 'ready',
+                                                    prev_exist=False)
+    client.delete.assert_called_once_with('/b/waiting/9')
+    assert not client.watch.called
+
+
+def test_barrier_opened_concurrently(client):
+    client.read.return_value = _listing(3)
+    client.compare_and_swap.side_effect = EtcdNodeExist
+    assert Barrier(client, '/b', 3).wait()
+
+
+def test_barrier_waits_for_ready_key(client):
+    client.read.return_value = _listing(1)
+    client.watch.return_value = mock.Mock(
+        action='create', node={'key': '/b/ready', 'value': 'ready',
+                               'modifiedIndex': 120}
+    )
+    assert Barrier(client, '/b', 3).wait()
+    client.watch.assert_called_once_with('/b/ready', wait_index=101,
+                                         timeout=None)
+    assert not client.compare_and_swap.called
+
+
+def test_barrier_already_open(client):
+    client.read.return_value = _listing(1, ready=True)
+    assert Barrier(client, '/b', 3).wait()
+    assert not client.watch.called
+
+
+def test_barrier_timeout(client):
+    client.read.return_value = _listing(1)
+    client.watch.side_effect = EtcdTimeout
+    assert not Barrier(client, '/b', 3).wait(timeout=1)
+    client.delete.assert_called_once_with('/b/waiting/9')
+
+
+def test_barrier_reset(client):
+    barrier = Barrier(client, '/b', 3)
+    client.read.side_effect = EtcdKeyNotFound
+    assert not barrier.is_open
+    barrier.reset()
+    client.rmdir.assert_called_once_with('/b', recursive=True)
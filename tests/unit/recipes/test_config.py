@@ -0,0 +1,231 @@
+import threading
+
+import mock
+import pytest
+
+from pyetcd.client import Client
+from pyetcd.recipes import ConfigTree, ConfigSnapshot
+from pyetcd.recipes.config import ConfigValue, parse_duration, parse_bool
+
+
+def _event(action, key, value=None, index=50, is_dir=False):
+    node = {'key': key, 'modifiedIndex': index}
+    if value is not None:
+        node['value'] = value
+    if is_dir:
+        node['dir'] = True
+    return mock.Mock(action=action, node=node)
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.read.return_value = mock.Mock(
+        node={
+            'key': '/config',
+            'dir': True,
+            'nodes': [
+                {'key': '/config/name', 'value': 'app'},
+                {
+                    'key': '/config/db',
+                    'dir': True,
+                    'nodes': [
+                        {'key': '/config/db/port', 'value': '5432'},
+                        {'key': '/config/db/timeout', 'value': '1m30s'},
+                    ]
+                }
+            ]
+        },
+        x_etcd_index=40
+    )
+    return client
+
+
+@pytest.mark.parametrize('text, seconds', [
+    ('10', 10),
+    ('1.5', 1.5),
+    ('250ms', 0.25),
+    ('10s', 10),
+    ('5m', 300),
+    ('1h30m', 5400),
+    ('1d', 86400),
+])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
+
+
+@pytest.mark.parametrize('text', ['', 'abc', '10x', '1h foo', 's'])
+def test_parse_duration_invalid(text):
+    with pytest.raises(ValueError):
+        parse_duration(text)
+
+
+def test_parse_bool():
+    assert parse_bool('True') is True
+    assert parse_bool('off') is False
+    with pytest.raises(ValueError):
+        parse_bool('maybe')
+
+
+def test_config_value_parses_once():
+    parser = mock.Mock(return_value={'a': 1})
+    with mock.patch.object(ConfigValue, '_parsers', (('json', parser),)):
+        value = ConfigValue('{"a": 1}')
+        assert value.as_type('json') == {'a': 1}
+        assert value.as_type('json') == {'a': 1}
+        parser.assert_called_once_with('{"a": 1}')
+
+
+def test_config_value_invalid():
+    value = ConfigValue('abc')
+    with pytest.raises(ValueError):
+        value.as_type('int')
+    with pytest.raises(ValueError):
+        value.as_type('json')
+
+
+def test_config_snapshot():
+    snapshot = ConfigSnapshot({
+        'name': ConfigValue('app'),
+        'db/port': ConfigValue('5432'),
+        'db/debug': ConfigValue('yes'),
+        'db/opts': ConfigValue('{"ssl": true}'),
+    }, index=41)
+    assert snapshot.index == 41
+    assert sorted(snapshot) == ['db', 'name']
+    assert snapshot['name'] == 'app'
+    assert dict(snapshot['db']) == {
+        'port': '5432', 'debug': 'yes', 'opts': '{"ssl": true}'
+    }
+    assert snapshot.get_int('db/port') == 5432
+    assert snapshot['db'].get_int('port') == 5432
+    assert snapshot.get_bool('db/debug') is True
+    assert snapshot.get_json('db/opts') == {'ssl': True}
+    assert snapshot.get_str('missing', 'x') == 'x'
+    assert snapshot.get_duration('missing', 3) == 3
+    with pytest.raises(KeyError):
+        snapshot.get_int('missing')
+    with pytest.raises(ValueError):
+        snapshot.get_int('name')
+    with pytest.raises(KeyError):
+        snapshot['missing']
+
+
+def test_config_snapshot_nested():
+    snapshot = ConfigSnapshot({
+        'a/b/c': ConfigValue('1'),
+        'a/b/d': ConfigValue('2'),
+        'a/e': ConfigValue('3'),
+        'f': ConfigValue('4'),
+    })
+    nested = snapshot['a']['b']
+    assert dict(nested) == {'c': '1', 'd': '2'}
+    assert nested.get_int('d') == 2
+    assert nested._directories is snapshot._directories
+    assert sorted(snapshot['a']) == ['b', 'e']
+    with pytest.raises(KeyError):
+        nested['e']
+    assert len(ConfigSnapshot({})) == 0
+
+
+def test_config_tree_load(client):
+    tree = ConfigTree(client, '/config/')
+    tree._load()
+    client.read.assert_called_once_with('/config', recursive=True)
+    snapshot = tree.snapshot
+    assert snapshot.index == 41
+    assert snapshot.flat() == {
+        'name': 'app', 'db/port': '5432', 'db/timeout': '1m30s'
+    }
+    assert snapshot.get_duration('db/timeout') == 90
+
+
+def test_config_tree_events(client):
+    tree = ConfigTree(client, '/config')
+    tree._load()
+    changes = []
+    tree.subscribe(lambda snapshot, diff: changes.append((snapshot, diff)))
+    old = tree.snapshot
+
+    tree._apply(_event('set', '/config/db/port', '6432', index=50))
+    assert old.get_int('db/port') == 5432
+    assert tree.snapshot.get_int('db/port') == 6432
+    assert tree.snapshot.index == 51
+    assert changes[-1][1].changed == ['db/port']
+
+    tree._apply(_event('create', '/config/db/user', 'root', index=51))
+    assert changes[-1][1].added == ['db/user']
+
+    tree._apply(_event('delete', '/config/db', index=52, is_dir=True))
+    assert changes[-1][1].removed == ['db/port', 'db/timeout', 'db/user']
+    assert tree.snapshot.flat() == {'name': 'app'}
+
+    tree._apply(_event('set', '/config/name', 'app', index=53))
+    tree._apply(_event('create', '/config/empty', index=54, is_dir=True))
+    assert len(changes) == 3
+
+
+@pytest.mark.parametrize('action', ['delete', 'expire'])
+def test_config_tree_root_deleted(client, action):
+    tree = ConfigTree(client, '/config')
+    tree._load()
+    changes = []
+    tree.subscribe(lambda snapshot, diff: changes.append(diff))
+    tree._apply(_event(action, '/config', index=50, is_dir=True))
+    assert tree.snapshot.flat() == {}
+    assert changes[-1].removed == ['db/port', 'db/timeout', 'name']
+
+
+def test_config_tree_survives_subscriber_error(client):
+    applied = threading.Event()
+    block = threading.Event()
+
+    def watch(*args, **kwargs):
+        if client.watch.call_count == 1:
+            return _event('set', '/config/name', 'bad', index=50)
+        if client.watch.call_count == 2:
+            return _event('set', '/config/name', 'good', index=51)
+        applied.set()
+        block.wait()
+        return _event('set', '/config/name', 'good', index=52)
+
+    def subscriber(snapshot, diff):
+        if snapshot.get_str('name') == 'bad':
+            raise ValueError('bad value')
+
+    client.watch.side_effect = watch
+    tree = ConfigTree(client, '/config', watch_timeout=5)
+    tree.subscribe(subscriber)
+    with tree:
+        assert applied.wait(5)
+        assert tree.snapshot.get_str('name') == 'good'
+        assert client.watch.call_args_list[1][1]['wait_index'] == 51
+    block.set()
+
+
+def test_config_tree_isolates_subscribers(client):
+    tree = ConfigTree(client, '/config')
+    failing = mock.Mock(side_effect=ValueError('bad subscriber'))
+    callback = mock.Mock()
+    tree.subscribe(failing)
+    tree.subscribe(callback)
+    tree._load()
+    assert failing.called
+    callback.assert_called_once_with(tree.snapshot, mock.ANY)
+
+
+def test_config_tree_reuses_parsed_values(client):
+    tree = ConfigTree(client, '/config')
+    tree._load()
+    name = tree.snapshot._values['name']
+    tree._apply(_event('set', '/config/db/port', '6432'))
+    assert tree.snapshot._values['name'] is name
+
+
+def test_config_tree_unsubscribe(client):
+    tree = ConfigTree(client, '/config')
+    callback = mock.Mock()
+    tree.subscribe(callback)
+    tree.unsubscribe(callback)
+    tree._load()
+    assert not callback.called
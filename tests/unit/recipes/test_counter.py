@@ -0,0 +1,121 @@
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound, EtcdTestFailed
+from pyetcd.client import Client
+from pyetcd.recipes import ShardedCounter
+
+
+def _shards(**values):
+    return mock.Mock(node={
+        'key': '/c/shards',
+        'dir': True,
+        'nodes': [
+            {'key': '/c/shards/%s' % shard[1:], 'value': str(value),
+             'modifiedIndex': 10 + int(shard[1:])}
+            for shard, value in sorted(values.items())
+        ]
+    })
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    # No size key, the default number of shards is used
+    client.read.side_effect = EtcdKeyNotFound
+    return client
+
+
+def test_counter_increment_random_shard(client):
+    counter = ShardedCounter(client, '/c', shards=4)
+    for _ in range(50):
+        counter.increment(5)
+    keys = set(call[0][0] for call in client.atomic_update.call_args_list)
+    assert len(keys) > 1
+    assert keys <= set('/c/shards/%d' % i for i in range(4))
+    func = client.atomic_update.call_args[0][1]
+    assert func(None) == '5'
+    assert func('10') == '15'
+
+
+def test_counter_increment_client_shard(client):
+    counter = ShardedCounter(client, '/c', shards=4, client_id='host1')
+    counter.increment()
+    counter.decrement()
+    keys = set(call[0][0] for call in client.atomic_update.call_args_list)
+    assert len(keys) == 1
+    assert client.atomic_update.call_args[0][1]('3') == '2'
+
+
+def test_counter_value(client):
+    client.read.side_effect = None
+    client.read.return_value = _shards(s0=3, s1=4, s7=10)
+    assert ShardedCounter(client, '/c').value == 17
+    client.read.assert_called_once_with('/c/shards', recursive=True)
+
+
+def test_counter_value_empty(client):
+    assert ShardedCounter(client, '/c').value == 0
+
+
+def test_counter_refresh(client):
+    client.read.side_effect = None
+    client.read.return_value = mock.Mock(node={'value': '16'})
+    counter = ShardedCounter(client, '/c')
+    counter.refresh()
+    assert counter.shards == 16
+
+
+def _node(shard, value, index):
+    return {'key': '/c/shards/%d' % shard, 'value': str(value),
+            'modifiedIndex': index}
+
+
+def test_counter_increment_reads_size(client):
+    client.read.side_effect = [mock.Mock(node={'value': '2'}),
+                               mock.Mock(node={'value': '3'})]
+    counter = ShardedCounter(client, '/c', shards=8, client_id='host1')
+    with mock.patch('pyetcd.recipes.counter.time') as mock_time:
+        mock_time.time.return_value = 100
+        counter.increment()
+        assert counter.shards == 2
+        mock_time.time.return_value = 129
+        counter.increment()
+        assert client.read.call_count == 1
+        mock_time.time.return_value = 130
+        counter.increment()
+    assert counter.shards == 3
+    client.read.assert_called_with('/c/size')
+
+
+def test_counter_resize_moves_before_delete(client):
+    client.read.side_effect = [
+        _shards(s0=1, s1=2, s2=3, s3=4),
+        mock.Mock(node=_node(3, 5, 21)),
+    ]
+    # Shard 3 is incremented by 5 while its value moves
+    client.atomic_update.side_effect = [
+        mock.Mock(node=_node(0, 4, 14)),
+        mock.Mock(node=_node(2, 0, 15)),
+        mock.Mock(node=_node(1, 6, 16)),
+        mock.Mock(node=_node(3, 0, 17)),
+        mock.Mock(node=_node(1, 11, 22)),
+        mock.Mock(node=_node(3, 0, 23)),
+    ]
+    client.compare_and_delete.side_effect = [None, EtcdTestFailed, None]
+    counter = ShardedCounter(client, '/c', shards=4)
+    counter.resize(2)
+    assert counter.shards == 2
+    client.write.assert_called_once_with('/c/size', 2)
+    changes = [(call[0][0], call[0][1]('0'))
+               for call in client.atomic_update.call_args_list]
+    assert changes == [
+        ('/c/shards/0', '3'), ('/c/shards/2', '-3'),
+        ('/c/shards/1', '4'), ('/c/shards/3', '-4'),
+        ('/c/shards/1', '5'), ('/c/shards/3', '-5'),
+    ]
+    assert client.compare_and_delete.call_args_list == [
+        mock.call('/c/shards/2', prev_index=15),
+        mock.call('/c/shards/3', prev_index=17),
+        mock.call('/c/shards/3', prev_index=23),
+    ]
@@ -0,0 +1,39 @@
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound
+from pyetcd.client import Client
+from pyetcd.recipes import Election
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.append.return_value = mock.Mock(
+        node={'key': '/election/5', 'createdIndex': 5}
+    )
+    client.read.return_value = mock.Mock(
+        node={
+            'key': '/election',
+            'nodes': [
+                {'key': '/election/5', 'value': '10.0.0.1:80'}
+            ]
+        }
+    )
+    return client
+
+
+def test_election_campaign(client):
+    election = Election(client, '/election', '10.0.0.1:80', ttl=10)
+    assert election.campaign()
+    assert election.is_leader
+    assert election.leader() == '10.0.0.1:80'
+    client.append.assert_called_once_with('/election', '10.0.0.1:80',
+                                          ttl=10)
+    election.resign()
+    assert not election.is_leader
+
+
+def test_election_no_leader(client):
+    client.read.side_effect = EtcdKeyNotFound
+    assert Election(client, '/election', 'foo').leader() is None
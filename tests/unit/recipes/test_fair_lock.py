@@ -0,0 +1,85 @@
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound, EtcdTimeout
+from pyetcd.client import Client
+from pyetcd.recipes import FairLock
+
+
+def _listing(*keys):
+    return mock.Mock(
+        node={
+            'key': '/lock',
+            'dir': True,
+            'nodes': [
+                {'key': key, 'value': key[-1], 'modifiedIndex': 1}
+                for key in keys
+            ]
+        },
+        x_etcd_index=100
+    )
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.append.return_value = mock.Mock(
+        node={'key': '/lock/3', 'createdIndex': 3}
+    )
+    return client
+
+
+def test_fair_lock_first_contender(client):
+    client.read.return_value = _listing('/lock/3')
+    lock = FairLock(client, '/lock', ttl=10, value='foo')
+    assert lock.acquire()
+    assert lock.is_acquired
+    assert lock.fencing_token == 3
+    client.append.assert_called_once_with('/lock', 'foo', ttl=10)
+    lock.release()
+    client.delete.assert_called_once_with('/lock/3')
+    assert not lock.is_acquired
+
+
+def test_fair_lock_watches_predecessor(client):
+    client.read.side_effect = [
+        _listing('/lock/1', '/lock/2', '/lock/3'),
+        _listing('/lock/2'),
+        _listing('/lock/3'),
+    ]
+    client.watch.return_value = mock.Mock(action='delete')
+    lock = FairLock(client, '/lock')
+    assert lock.acquire()
+    assert client.read.call_args_list == [
+        mock.call('/lock', sorted=True, consistency='linearizable'),
+        mock.call('/lock/2'),
+        mock.call('/lock', sorted=True, consistency='linearizable'),
+    ]
+    client.watch.assert_called_once_with('/lock/2', wait_index=101,
+                                         timeout=None)
+    lock.release()
+
+
+def test_fair_lock_non_blocking(client):
+    client.read.return_value = _listing('/lock/1', '/lock/3')
+    lock = FairLock(client, '/lock')
+    assert not lock.acquire(blocking=False)
+    client.delete.assert_called_once_with('/lock/3')
+    assert not client.watch.called
+
+
+def test_fair_lock_timeout(client):
+    client.read.return_value = _listing('/lock/1', '/lock/3')
+    client.watch.side_effect = EtcdTimeout
+    lock = FairLock(client, '/lock')
+    assert not lock.acquire(timeout=1)
+    client.delete.assert_called_once_with('/lock/3')
+
+
+def test_fair_lock_contender_expired(client):
+    client.read.return_value = _listing('/lock/1')
+    lock = FairLock(client, '/lock')
+    with pytest.raises(EtcdKeyNotFound):
+        lock.acquire()
+    with pytest.raises(RuntimeError):
+        lock.release()
@@ -0,0 +1,115 @@
+import mock
+import pytest
+
+from pyetcd import EtcdNodeExist, EtcdKeyNotFound, EtcdTimeout, \
+    EtcdTestFailed, EtcdEventIndexCleared
+from pyetcd.client import Client
+from pyetcd.recipes import Lock
+from pyetcd.recipes.lock import TTLRefresher, wait_for_delete
+
+
+def _result(action='get', index=10, x_etcd_index=None):
+    return mock.Mock(
+        action=action,
+        node={'key': '/lock', 'modifiedIndex': index},
+        x_etcd_index=x_etcd_index
+    )
+
+
+@pytest.fixture
+def client():
+    return mock.Mock(spec=Client)
+
+
+def test_lock_acquire(client):
+    client.compare_and_swap.return_value = _result(index=42)
+    lock = Lock(client, '/lock', ttl=30)
+    assert lock.acquire()
+    assert lock.is_acquired
+    assert lock.fencing_token == 42
+    args, kwargs = client.compare_and_swap.call_args
+    assert args[0] == '/lock'
+    assert kwargs == {'prev_exist': False, 'ttl': 30}
+
+    lock.release()
+    client.compare_and_delete.assert_called_once_with('/lock',
+                                                      prev_value=args[1])
+    assert not lock.is_acquired
+    assert lock.fencing_token is None
+
+
+def test_lock_non_blocking(client):
+    client.compare_and_swap.side_effect = EtcdNodeExist
+    assert not Lock(client, '/lock').acquire(blocking=False)
+    assert not client.watch.called
+
+
+def test_lock_waits_for_delete(client):
+    client.compare_and_swap.side_effect = [EtcdNodeExist, _result(index=50)]
+    client.read.return_value = _result(index=10, x_etcd_index=20)
+    client.watch.side_effect = [
+        _result(action='update', index=30),
+        _result(action='expire', index=40),
+    ]
+    lock = Lock(client, '/lock')
+    assert lock.acquire()
+    assert client.watch.call_args_list == [
+        mock.call('/lock', wait_index=21, timeout=None),
+        mock.call('/lock', wait_index=31, timeout=None),
+    ]
+    assert lock.fencing_token == 50
+    lock.release()
+
+
+def test_lock_timeout(client):
+    client.compare_and_swap.side_effect = EtcdNodeExist
+    client.read.return_value = _result()
+    client.watch.side_effect = EtcdTimeout
+    assert not Lock(client, '/lock').acquire(timeout=1)
+
+
+def test_lock_release_lost(client):
+    client.compare_and_swap.return_value = _result()
+    client.compare_and_delete.side_effect = EtcdTestFailed
+    lock = Lock(client, '/lock')
+    lock.acquire()
+    lock.release()
+    with pytest.raises(RuntimeError):
+        lock.release()
+
+
+def test_lock_context_manager(client):
+    client.compare_and_swap.return_value = _result()
+    with Lock(client, '/lock') as lock:
+        assert lock.is_acquired
+    assert client.compare_and_delete.called
+
+
+def test_wait_for_delete_key_not_found(client):
+    client.read.side_effect = EtcdKeyNotFound
+    assert wait_for_delete(client, '/lock')
+
+
+def test_wait_for_delete_index_cleared(client):
+    client.read.return_value = _result()
+    client.watch.side_effect = EtcdEventIndexCleared
+    assert wait_for_delete(client, '/lock')
+
+
+def test_refresher_refreshes_ttl(client):
+    refresher = TTLRefresher(client, '/lock', 0.03)
+    client.update_ttl.side_effect = [None, EtcdKeyNotFound]
+    refresher.start()
+    refresher.join(5)
+    assert refresher.lost
+    client.update_ttl.assert_called_with('/lock', 0.03, prev_value=None)
+
+
+def test_refresher_lost_to_another_holder(client):
+    refresher = TTLRefresher(client, '/lock', 0.03, value='mine')
+    client.update_ttl.side_effect = [None, EtcdTestFailed]
+    refresher.start()
+    refresher.join(5)
+    assert refresher.lost
+    assert client.update_ttl.call_count == 2
+    client.update_ttl.assert_called_with('/lock', 0.03, prev_value='mine')
@@ -0,0 +1,190 @@
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound, EtcdTestFailed, EtcdTimeout
+from pyetcd.client import Client
+from pyetcd.recipes import Queue, QueueItem, ClaimLost
+
+
+def _listing(items, claims=(), x_etcd_index=100):
+    nodes = [
+        {
+            'key': '/q/items',
+            'dir': True,
+            'nodes': [
+                {'key': '/q/items/%d' % i, 'value': 'v%d' % i,
+                 'modifiedIndex': i}
+                for i in items
+            ]
+        }
+    ]
+    if claims:
+        nodes.append({
+            'key': '/q/claims',
+            'dir': True,
+            'nodes': [{'key': '/q/claims/%d' % i} for i in claims]
+        })
+    return mock.Mock(node={'key': '/q', 'dir': True, 'nodes': nodes},
+                     x_etcd_index=x_etcd_index)
+
+
+def _reads(*listings):
+    """Read side effect that lists the queue and reads listed items."""
+    listings = list(listings)
+
+    def read(key, **kwargs):
+        if key == '/q':
+            return listings.pop(0)
+        return mock.Mock(node={'key': key,
+                               'modifiedIndex': int(key.rsplit('/', 1)[-1])})
+    return read
+
+
+@pytest.fixture
+def client():
+    return mock.Mock(spec=Client)
+
+
+def test_queue_put(client):
+    client.append.return_value = mock.Mock(node={'key': '/q/items/5'})
+    assert Queue(client, '/q').put('foo', ttl=10) == '/q/items/5'
+    client.append.assert_called_once_with('/q/items', 'foo', ttl=10)
+
+
+def test_queue_get_claims_head(client):
+    client.read.return_value = _listing([7, 3])
+    client.compare_and_delete.side_effect = [EtcdTestFailed, None]
+    item = Queue(client, '/q').get()
+    assert item == QueueItem('/q/items/7', 'v7', 7)
+    assert client.compare_and_delete.call_args_list == [
+        mock.call('/q/items/3', prev_index=3),
+        mock.call('/q/items/7', prev_index=7),
+    ]
+
+
+def test_queue_get_batch(client):
+    client.read.return_value = _listing([1, 2, 3])
+    items = Queue(client, '/q').get_batch(2)
+    assert [item.key for item in items] == ['/q/items/1', '/q/items/2']
+
+
+def _event(action, index):
+    return mock.Mock(action=action,
+                     node={'key': '/q/items/%d' % index,
+                           'modifiedIndex': index})
+
+
+def test_queue_get_waits_when_empty(client):
+    client.read.side_effect = [_listing([], x_etcd_index=100), _listing([1])]
+    client.watch.return_value = _event('create', 101)
+    assert Queue(client, '/q').get().value == 'v1'
+    client.watch.assert_called_once_with('/q/items', wait_index=101,
+                                         recursive=True, timeout=None)
+
+
+def test_queue_get_ignores_deletes_while_waiting(client):
+    client.read.side_effect = [_listing([], x_etcd_index=100), _listing([3])]
+    client.watch.side_effect = [_event('compareAndDelete', 101),
+                                _event('delete', 102),
+                                _event('create', 103)]
+    assert Queue(client, '/q').get().value == 'v3'
+    assert client.read.call_count == 2
+    assert [call[1]['wait_index']
+            for call in client.watch.call_args_list] == [101, 102, 103]
+
+
+def test_queue_get_relists_for_expired_claims(client):
+    client.read.side_effect = _reads(_listing([1], claims=[1]),
+                                     _listing([1]))
+    client.watch.side_effect = EtcdTimeout
+    queue = Queue(client, '/q', visibility_timeout=60)
+    assert queue.get().key == '/q/items/1'
+    client.watch.assert_called_once_with('/q/items', wait_index=101,
+                                         recursive=True, timeout=60)
+
+
+def test_queue_get_missing_directory(client):
+    error = EtcdKeyNotFound('Key not found')
+    error.index = 50
+    client.read.side_effect = error
+    client.watch.side_effect = EtcdTimeout
+    assert Queue(client, '/q').get(timeout=1) is None
+    client.watch.assert_called_once_with('/q/items', wait_index=51,
+                                         recursive=True, timeout=mock.ANY)
+
+
+def test_queue_get_non_blocking(client):
+    client.read.return_value = _listing([])
+    assert Queue(client, '/q').get(block=False) is None
+    assert not client.watch.called
+
+
+def test_queue_visibility_timeout(client):
+    client.read.side_effect = _reads(_listing([1, 2], claims=[1]))
+    queue = Queue(client, '/q', visibility_timeout=60)
+    item = queue.get()
+    assert item.key == '/q/items/2'
+    client.compare_and_swap.assert_called_once_with(
+        '/q/claims/2', mock.ANY, prev_exist=False, ttl=60
+    )
+    client.read.assert_called_with('/q/items/2',
+                                   consistency='linearizable')
+    assert not client.compare_and_delete.called
+
+    consumer = client.compare_and_swap.call_args[0][1]
+    queue.ack(item)
+    client.update_ttl.assert_called_once_with('/q/claims/2', 60,
+                                              prev_value=consumer)
+    assert client.compare_and_delete.call_args_list == [
+        mock.call('/q/items/2', prev_index=2),
+        mock.call('/q/claims/2', prev_value=consumer),
+    ]
+
+
+@pytest.mark.parametrize('error', [EtcdKeyNotFound, EtcdTestFailed])
+def test_queue_ack_claim_lost(client, error):
+    client.read.side_effect = _reads(_listing([1]))
+    queue = Queue(client, '/q', visibility_timeout=60)
+    item = queue.get()
+    client.update_ttl.side_effect = error
+    with pytest.raises(ClaimLost):
+        queue.ack(item)
+    assert not client.compare_and_delete.called
+
+
+def test_queue_claim_of_acked_item(client):
+    consumer_a = Queue(client, '/q', visibility_timeout=60)
+    consumer_b = Queue(client, '/q', visibility_timeout=60)
+    deleted = set()
+
+    def read(key, **kwargs):
+        if key == '/q':
+            return _listing([1])
+        if key in deleted:
+            raise EtcdKeyNotFound('Key not found')
+        return mock.Mock(node={'key': key, 'modifiedIndex': 1})
+
+    def compare_and_swap(key, value, **kwargs):
+        if len(client.compare_and_swap.call_args_list) == 1:
+            # A claims, processes and acks the item after B listed it
+            # and before B claims it
+            consumer_a.ack(consumer_a.get())
+
+    client.read.side_effect = read
+    client.compare_and_swap.side_effect = compare_and_swap
+    client.compare_and_delete.side_effect = \
+        lambda key, **kwargs: deleted.add(key)
+    assert consumer_b.get(block=False) is None
+
+    claims = client.compare_and_swap.call_args_list
+    assert [call[0][0] for call in claims] == ['/q/claims/1'] * 2
+    assert client.compare_and_delete.call_args_list == [
+        mock.call('/q/items/1', prev_index=1),
+        mock.call('/q/claims/1', prev_value=claims[1][0][1]),
+        mock.call('/q/claims/1', prev_value=claims[0][0][1]),
+    ]
+
+
+def test_queue_len(client):
+    client.read.return_value = _listing([1, 2, 3], claims=[2])
+    assert len(Queue(client, '/q')) == 2
@@ -0,0 +1,122 @@
+import threading
+
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound, EtcdEventIndexCleared
+from pyetcd.client import Client
+from pyetcd.keepalive import KeepAliveManager
+from pyetcd.recipes import ServiceRegistry
+
+
+def _event(action, key, value=None, index=50, is_dir=False):
+    node = {'key': key, 'modifiedIndex': index}
+    if value is not None:
+        node['value'] = value
+    if is_dir:
+        node['dir'] = True
+    return mock.Mock(action=action, node=node)
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.read.return_value = mock.Mock(
+        node={
+            'key': '/services',
+            'dir': True,
+            'nodes': [
+                {
+                    'key': '/services/db',
+                    'dir': True,
+                    'nodes': [
+                        {'key': '/services/db/a', 'value': '10.0.0.1:5432'},
+                        {'key': '/services/db/b', 'value': '10.0.0.2:5432'},
+                    ]
+                }
+            ]
+        },
+        x_etcd_index=40
+    )
+    return client
+
+
+def test_registry_register(client):
+    keepalive = mock.Mock(spec=KeepAliveManager)
+    registry = ServiceRegistry(client, ttl=10, keepalive=keepalive)
+    registry.register('db', 'a', '10.0.0.1:5432')
+    client.write.assert_called_once_with('/services/db/a', '10.0.0.1:5432',
+                                         ttl=10)
+    keepalive.add.assert_called_once_with('/services/db/a', 10,
+                                          value='10.0.0.1:5432')
+    registry.deregister('db', 'a')
+    keepalive.remove.assert_called_once_with('/services/db/a')
+    client.delete.assert_called_once_with('/services/db/a')
+
+
+def test_registry_load(client):
+    registry = ServiceRegistry(client)
+    registry._load()
+    assert sorted(registry.resolve('db')) == ['10.0.0.1:5432',
+                                              '10.0.0.2:5432']
+    assert registry.resolve('web') == []
+    assert registry._index == 41
+
+
+def test_registry_load_missing(client):
+    error = EtcdKeyNotFound('Key not found')
+    error.index = 7
+    client.read.side_effect = error
+    registry = ServiceRegistry(client)
+    registry._load()
+    assert registry.resolve('db') == []
+    assert registry._index == 8
+
+
+def test_registry_apply_events(client):
+    changes = []
+    registry = ServiceRegistry(
+        client,
+        on_change=lambda service, addresses:
+        changes.append((service, sorted(addresses)))
+    )
+    registry._load()
+    registry._apply(_event('set', '/services/web/x', '10.0.1.1:80'))
+    registry._apply(_event('expire', '/services/db/a', index=51))
+    registry._apply(_event('set', '/services/web', index=52, is_dir=True))
+    registry._apply(_event('set', '/services/web/x/y', 'foo', index=53))
+    assert registry.resolve('web') == ['10.0.1.1:80']
+    assert registry.instances('db') == {'b': '10.0.0.2:5432'}
+    registry._apply(_event('delete', '/services/db', index=54, is_dir=True))
+    assert registry.resolve('db') == []
+    assert registry._index == 55
+    assert changes == [
+        ('db', ['10.0.0.1:5432', '10.0.0.2:5432']),
+        ('web', ['10.0.1.1:80']),
+        ('db', ['10.0.0.2:5432']),
+        ('db', []),
+    ]
+
+
+def test_registry_watch_thread(client):
+    applied = threading.Event()
+    block = threading.Event()
+
+    def watch(*args, **kwargs):
+        if client.watch.call_count == 1:
+            raise EtcdEventIndexCleared('cleared')
+        if client.watch.call_count == 2:
+            return _event('set', '/services/web/x', '10.0.1.1:80')
+        applied.set()
+        block.wait()
+        raise EtcdEventIndexCleared('cleared')
+
+    client.watch.side_effect = watch
+    with ServiceRegistry(client, watch_timeout=5) as registry:
+        assert applied.wait(5)
+        assert registry.resolve('web') == ['10.0.1.1:80']
+        assert client.read.call_count == 2
+        assert client.watch.call_args_list[0] == mock.call(
+            '/services', wait_index=41, recursive=True, timeout=5
+        )
+    block.set()
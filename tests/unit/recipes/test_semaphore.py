@@ -0,0 +1,62 @@
+import mock
+import pytest
+
+from pyetcd import EtcdTimeout
+from pyetcd.client import Client
+from pyetcd.recipes import Semaphore
+
+
+def _listing(*keys):
+    return mock.Mock(
+        node={'key': '/sem', 'dir': True,
+              'nodes': [{'key': key, 'value': 'x'} for key in keys]},
+        x_etcd_index=100
+    )
+
+
+def _event(action, key, index):
+    return mock.Mock(action=action, node={'key': key, 'modifiedIndex': index})
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.append.return_value = mock.Mock(
+        node={'key': '/sem/3', 'createdIndex': 3}
+    )
+    return client
+
+
+def test_semaphore_acquire_within_slots(client):
+    client.read.return_value = _listing('/sem/1', '/sem/3')
+    semaphore = Semaphore(client, '/sem', 2, ttl=10)
+    assert semaphore.acquire()
+    assert semaphore.is_acquired
+    client.append.assert_called_once_with('/sem', mock.ANY, ttl=10)
+    semaphore.release()
+    client.delete.assert_called_once_with('/sem/3')
+
+
+def test_semaphore_waits_for_predecessor_release(client):
+    client.read.side_effect = [
+        _listing('/sem/1', '/sem/2', '/sem/3'),
+        _listing('/sem/2', '/sem/3'),
+    ]
+    client.watch.side_effect = [
+        _event('create', '/sem/4', 101),
+        _event('expire', '/sem/1', 102),
+    ]
+    semaphore = Semaphore(client, '/sem', 2)
+    assert semaphore.acquire()
+    assert client.watch.call_args_list == [
+        mock.call('/sem', wait_index=101, recursive=True, timeout=None),
+        mock.call('/sem', wait_index=102, recursive=True, timeout=None),
+    ]
+    semaphore.release()
+
+
+def test_semaphore_timeout(client):
+    client.read.return_value = _listing('/sem/1', '/sem/3')
+    client.watch.side_effect = EtcdTimeout
+    assert not Semaphore(client, '/sem', 1).acquire(timeout=1)
+    client.delete.assert_called_once_with('/sem/3')
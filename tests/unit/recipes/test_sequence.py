@@ -0,0 +1,64 @@
+from concurrent.futures import Future
+
+import mock
+import pytest
+
+from pyetcd import EtcdTestFailed
+from pyetcd.client import Client
+from pyetcd.recipes import SequenceGenerator
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    state = {'value': None}
+
+    def atomic_update(key, func):
+        state['value'] = func(state['value'])
+        return mock.Mock(node={'value': state['value']})
+
+    def submit(func):
+        future = Future()
+        try:
+            future.set_result(func())
+        except Exception as err:
+            future.set_exception(err)
+        return future
+
+    client.atomic_update.side_effect = atomic_update
+    client.submit.side_effect = submit
+    return client
+
+
+def test_sequence_hands_out_blocks(client):
+    generator = SequenceGenerator(client, '/seq', block_size=10,
+                                  low_water=0.2)
+    assert [next(generator) for _ in range(25)] == list(range(1, 26))
+    assert client.atomic_update.call_count == 3
+    assert client.atomic_update.call_args[0][0] == '/seq'
+
+
+def test_sequence_prefetches_at_low_water(client):
+    generator = SequenceGenerator(client, '/seq', block_size=10,
+                                  low_water=0.2)
+    for _ in range(7):
+        generator.next()
+    assert not client.submit.called
+    generator.next()
+    assert client.submit.call_count == 1
+    assert client.atomic_update.call_count == 2
+
+
+def test_sequence_prefetch_failure_is_retried(client):
+    generator = SequenceGenerator(client, '/seq', block_size=2,
+                                  low_water=0.5)
+    failed = Future()
+    failed.set_exception(EtcdTestFailed('foo'))
+    client.submit.side_effect = [failed]
+    assert generator.next() == 1
+    assert generator.next() == 2
+    with pytest.raises(EtcdTestFailed):
+        generator.next()
+    client.submit.side_effect = None
+    client.submit.return_value = failed
+    assert generator.next() == 3
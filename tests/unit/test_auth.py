@@ -0,0 +1,152 @@
+import base64
+import json
+import time
+import warnings
+
+import mock
+import pytest
+import requests
+
+from pyetcd import EtcdException
+from pyetcd.auth import TokenAuth, jwt_expiration
+from pyetcd.client import Client, ClientException
+from pyetcd.v3 import V3Client
+from pyetcd.watch import WatchStream
+
+
+@pytest.fixture
+def secured(v3_server):
+    v3_server.store.users['root'] = 'secret'
+    return v3_server
+
+
+@pytest.fixture
+def client(secured):
+    client = V3Client(port=secured.port, username='root', password='secret')
+    yield client
+    client.close()
+
+
+def _authenticate_requests(v3_server):
+    return [request for path, request in v3_server.store.requests
+            if path == '/v3/auth/authenticate']
+
+
+def test_jwt_expiration():
+    claims = base64.urlsafe_b64encode(
+        json.dumps({'username': 'root', 'exp': 1700000000}).encode('utf-8')
+    ).decode('ascii').rstrip('=')
+    assert jwt_expiration('eyJhbGciOiJSUzI1NiJ9.%s.c2ln' % claims) \
+        == 1700000000
+    assert jwt_expiration('ZSJnKRMQSXbQzhnw.9') is None
+    assert jwt_expiration('a.!!!.c') is None
+
+
+def test_token_fetched_once(client, secured):
+    for i in range(5):
+        client.put('/k', str(i))
+    assert client.get('/k').value == '4'
+    assert _authenticate_requests(secured) == [
+        {'name': 'root', 'password': 'secret'}
+    ]
+    assert secured.store.authorizations == [None] + ['token.1'] * 6
+    assert client.metrics['auth_tokens'] == 1
+
+
+def test_token_refreshed_after_invalid_token(client, secured):
+    client.put('/k', '1')
+    secured.store.tokens.clear()
+    client.put('/k', '2')
+    assert secured.get('/k') == '2'
+    assert secured.store.authorizations[-3:] == ['token.1', None, 'token.2']
+    assert client.metrics['auth_tokens'] == 2
+
+
+def test_token_refreshed_before_expiry(secured):
+    client = V3Client(port=secured.port, username='root', password='secret',
+                      token_ttl=30)
+    now = time.time()
+    with mock.patch('pyetcd.auth.time') as mock_time:
+        mock_time.time.return_value = now
+        client.put('/k', '1')
+        mock_time.time.return_value = now + 15
+        client.put('/k', '2')
+        assert client.metrics['auth_tokens'] == 1
+        mock_time.time.return_value = now + 25
+        client.put('/k', '3')
+        assert client.metrics['auth_tokens'] == 2
+    assert secured.store.authorizations[-1] == 'token.2'
+
+
+def test_token_used_while_refreshed():
+    authenticate = mock.Mock(side_effect=['t1', 't2'])
+    auth = TokenAuth(authenticate, ttl=30)
+    now = time.time()
+    with mock.patch('pyetcd.auth.time') as mock_time:
+        mock_time.time.return_value = now
+        assert auth.token == 't1'
+        mock_time.time.return_value = now + 25
+        with auth._fetch_lock:
+            assert auth.token == 't1'
+        assert auth.token == 't2'
+        auth.invalidate('t1')
+        assert auth.token == 't2'
+
+
+def test_wrong_password(secured):
+    client = V3Client(port=secured.port, username='root', password='wrong')
+    with pytest.raises(EtcdException):
+        client.put('/k', '1')
+    assert secured.get('/k') is None
+
+
+def test_basic_auth_warns(v3_server):
+    with pytest.warns(UserWarning):
+        client = V3Client(port=v3_server.port, username='root',
+                          password='secret', auth='basic')
+    client.put('/k', '1')
+    assert v3_server.store.authorizations == [
+        'Basic ' + base64.b64encode(b'root:secret').decode('ascii')
+    ]
+    assert client.metrics['auth_tokens'] == 0
+
+
+def test_unknown_auth():
+    with pytest.raises(ClientException):
+        V3Client(username='root', auth='kerberos')
+
+
+def test_watch_stream_authenticated(client, secured):
+    events = []
+    with WatchStream(client) as stream:
+        watch = stream.watch('/k', events.append)
+        deadline = time.time() + 5
+        while watch.watch_id is None and time.time() < deadline:
+            time.sleep(0.01)
+        client.put('/k', '1')
+        while not events and time.time() < deadline:
+            time.sleep(0.01)
+    assert [event.kv.value for event in events] == ['1']
+    assert client.metrics['auth_tokens'] == 1
+
+
+def test_v2_client_uses_basic_auth():
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['X-Etcd-Index'] = '1'
+    response._content = json.dumps({  # pylint: disable=protected-access
+        'action': 'get',
+        'node': {'key': '/k', 'value': '1', 'modifiedIndex': 1,
+                 'createdIndex': 1}
+    }).encode('utf-8')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        client = Client(username='root', password='secret')
+    # pylint: disable=protected-access
+    with mock.patch.object(client._session, 'send',
+                           return_value=response) as send:
+        assert client.read('/k').node['value'] == '1'
+    assert send.call_count == 1
+    assert send.call_args[0][0].headers['Authorization'] == \
+        'Basic ' + base64.b64encode(b'root:secret').decode('ascii')
+    assert client.metrics['auth_tokens'] == 0
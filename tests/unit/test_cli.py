@@ -0,0 +1,93 @@
+import io
+
+import mock
+
+from pyetcd import EtcdException
+from pyetcd.cli import main
+from pyetcd.migrate import MigrationReport
+from pyetcd.restore import RestoreReport
+
+
+@mock.patch('pyetcd.cli.dump')
+@mock.patch('pyetcd.cli.Client')
+def test_cli_dump(mock_client, mock_dump, tmpdir):
+    mock_dump.return_value = 3
+    path = str(tmpdir.join('dump.ndjson'))
+    assert main(['--host', 'foo:2380', '--host', 'bar',
+                 'dump', path, '--prefix', '/a']) == 0
+    mock_client.assert_called_once_with(host=[('foo', 2380), 'bar'],
+                                        port=2379, max_workers=4)
+    assert mock_dump.call_args[1] == {'prefix': '/a', 'parallel': 4}
+    mock_client.return_value.close.assert_called_once_with()
+
+
+@mock.patch('pyetcd.cli.dump')
+@mock.patch('pyetcd.cli.Client')
+def test_cli_dump_stdout(mock_client, mock_dump):
+    def dump(client, fileobj, **kwargs):
+        fileobj.write(b'{}\n')
+        return 1
+
+    stdout = io.TextIOWrapper(io.BytesIO())
+    mock_dump.side_effect = dump
+    with mock.patch('sys.stdout', stdout):
+        assert main(['dump', '-']) == 0
+    assert not stdout.buffer.closed
+    assert stdout.buffer.getvalue() == b'{}\n'
+
+
+@mock.patch('pyetcd.cli.dump')
+@mock.patch('pyetcd.cli.Client')
+def test_cli_dump_error(mock_client, mock_dump, tmpdir):
+    mock_dump.side_effect = EtcdException('boom')
+    assert main(['dump', str(tmpdir.join('dump'))]) == 1
+    mock_client.assert_called_once_with(host='127.0.0.1', port=2379,
+                                        max_workers=4)
+
+
+@mock.patch('pyetcd.cli.restore')
+@mock.patch('pyetcd.cli.Client')
+def test_cli_restore(mock_client, mock_restore, tmpdir):
+    path = tmpdir.join('dump.ndjson')
+    path.write('')
+    mock_restore.return_value = RestoreReport(restored=2, skipped=0,
+                                              expired=0, failed=['/a'])
+    assert main(['restore', str(path), '--rate', '100', '--cas',
+                 '--checkpoint', '/tmp/checkpoint']) == 1
+    assert mock_restore.call_args[1] == {
+        'parallel': 16, 'rate': 100, 'cas': True,
+        'checkpoint': '/tmp/checkpoint'
+    }
+
+
+@mock.patch('pyetcd.cli.migrate')
+@mock.patch('pyetcd.cli.V3Client')
+@mock.patch('pyetcd.cli.Client')
+def test_cli_migrate(mock_client, mock_v3_client, mock_migrate):
+    mock_migrate.return_value = MigrationReport(
+        migrated=2, skipped=0, failed=[], source_count=2, source_hash='a',
+        target_count=3, target_hash='b', verified=False
+    )
+    assert main(['migrate', '--target', 'v3:2379', '--prefix', '/app']) == 1
+    mock_v3_client.assert_called_once_with(host=[('v3', 2379)], port=2379)
+    assert mock_migrate.call_args[1] == {
+        'prefix': '/app', 'target_prefix': None, 'batch_size': 100,
+        'parallel': 8, 'checkpoint': None, 'verify': True
+    }
+
+
+@mock.patch('pyetcd.cli.dump')
+@mock.patch('pyetcd.cli.Client')
+def test_cli_tls(mock_client, mock_dump, tmpdir):
+    mock_dump.return_value = 0
+    assert main(['--protocol', 'https', '--ca-cert', 'ca.pem',
+                 '--cert', 'client.pem', '--key', 'client.key',
+                 'dump', str(tmpdir.join('dump'))]) == 0
+    mock_client.assert_called_once_with(
+        host='127.0.0.1', port=2379, max_workers=4, protocol='https',
+        ca_cert='ca.pem', cert='client.pem', key='client.key'
+    )
+
+
+def test_cli_tls_error(tmpdir):
+    assert main(['--ca-cert', 'ca.pem', 'dump', str(tmpdir.join('d'))]) == 1
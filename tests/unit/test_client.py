@@ -325,6 +325,16 @@ def test_client_mkdir(mock_put, mock_client, default_etcd):
     })
 
 
+@mock.patch.object(Client, '_request_key')
+def test_client_mkdir_ttl(mock_client, default_etcd):
+    default_etcd.mkdir('/foo', ttl=30)
+    mock_client.assert_called_once_with('/foo', method='put', data={
+        'dir': True,
+        'prevExist': False,
+        'ttl': 30
+    })
+
+
 @mock.patch.object(Client, '_request_call')
 def test_client_rmdir(mock_client, default_etcd):
     default_etcd.rmdir('/foo')
@@ -478,3 +488,17 @@ def test_read_with_params(mock_etcd_result, params, url, default_etcd):
     default_etcd.read('/foo', **params)
     mock_requests.get.assert_called_once_with(
         'http://127.0.0.1:2379/v2/keys/foo' + url)
+
+
+@mock.patch.object(Client, '_request_key')
+def test_client_update_ttl_prev_value(mock_update_ttl, default_etcd):
+    default_etcd.update_ttl('/foo', 10, prev_value='bar', prev_index=5)
+    mock_update_ttl.assert_called_once_with('/foo',
+                                            method='put',
+                                            data={
+                                                'ttl': 10,
+                                                'refresh': 'true',
+                                                'prevExist': 'true',
+                                                'prevValue': 'bar',
+                                                'prevIndex': 5
+                                            })
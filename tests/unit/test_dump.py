@@ -0,0 +1,106 @@
+import gzip
+import json
+from concurrent.futures import Future
+
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound
+from pyetcd.client import Client, ClientException
+from pyetcd.dump import dump, iter_nodes, open_dump
+
+TREE = {
+    '/': {'dir': True, 'nodes': [
+        {'key': '/a', 'dir': True, 'modifiedIndex': 2, 'createdIndex': 2},
+        {'key': '/b', 'value': 'bar', 'modifiedIndex': 3, 'createdIndex': 3,
+         'ttl': 10, 'expiration': '2026-10-19T10:00:00Z'},
+        {'key': '/gone', 'dir': True, 'modifiedIndex': 4,
+         'createdIndex': 4},
+    ]},
+    '/a': {'key': '/a', 'dir': True, 'nodes': [
+        {'key': '/a/x', 'value': '1', 'modifiedIndex': 5,
+         'createdIndex': 5},
+        {'key': '/a/y', 'dir': True, 'modifiedIndex': 6,
+         'createdIndex': 6},
+    ]},
+    '/a/y': {'key': '/a/y', 'dir': True},
+}
+
+
+def _read(key, **kwargs):
+    assert kwargs == {'sorted': True}
+    if key not in TREE:
+        raise EtcdKeyNotFound('Key not found')
+    return mock.Mock(node=TREE[key], x_etcd_index=10, x_etcd_cluster_id='c1')
+
+
+def _submit_read(key, **kwargs):
+    future = Future()
+    try:
+        future.set_result(_read(key, **kwargs))
+    except EtcdKeyNotFound as err:
+        future.set_exception(err)
+    return future
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.read.side_effect = _read
+    client.submit_read.side_effect = _submit_read
+    return client
+
+
+def test_iter_nodes(client):
+    nodes = list(iter_nodes(client))
+    assert nodes[0].x_etcd_index == 10
+    assert [node['key'] for node in nodes[1:]] == [
+        '/a', '/b', '/gone', '/a/x', '/a/y'
+    ]
+    assert nodes[2]['ttl'] == 10
+    assert 'nodes' not in nodes[1]
+    client.read.assert_called_once_with('/', sorted=True)
+
+
+def test_iter_nodes_directory(client):
+    nodes = list(iter_nodes(client, prefix='/a', parallel=1))
+    assert [node['key'] for node in nodes[1:]] == ['/a', '/a/x', '/a/y']
+
+
+def test_iter_nodes_key(client):
+    client.read.side_effect = None
+    result = mock.Mock(node={'key': '/b', 'value': 'bar'}, x_etcd_index=7)
+    client.read.return_value = result
+    assert list(iter_nodes(client, prefix='/b')) == [
+        result, {'key': '/b', 'value': 'bar'}
+    ]
+
+
+def test_dump(client, tmpdir):
+    path = str(tmpdir.join('dump.ndjson.gz'))
+    fileobj = open_dump(path, 'wb')
+    assert dump(client, fileobj) == 5
+    fileobj.close()
+
+    with gzip.open(path, 'rb') as f:
+        lines = [json.loads(line.decode('utf-8')) for line in f]
+    assert lines[0] == {'format': 1, 'prefix': '/', 'cluster_id': 'c1',
+                        'x_etcd_index': 10}
+    assert lines[2] == {'key': '/b', 'value': 'bar', 'modifiedIndex': 3,
+                        'createdIndex': 3, 'ttl': 10,
+                        'expiration': '2026-10-19T10:00:00Z'}
+
+
+def test_open_dump_unknown_compression(tmpdir):
+    with pytest.raises(ClientException):
+        open_dump(str(tmpdir.join('dump')), 'wb', compression='lzma')
+
+
+def test_open_dump_zstd(tmpdir):
+    pytest.importorskip('zstandard')
+    path = str(tmpdir.join('dump.zst'))
+    fileobj = open_dump(path, 'wb')
+    fileobj.write(b'{}\n')
+    fileobj.close()
+    fileobj = open_dump(path, 'rb')
+    assert fileobj.read() == b'{}\n'
@@ -5,7 +5,7 @@ import pytest
 from requests import HTTPError
 
 from pyetcd import EtcdResult, EtcdInvalidResponse, \
-    EtcdEmptyResponse, EtcdKeyNotFound
+    EtcdEmptyResponse, EtcdKeyNotFound, EtcdStreamResult, EtcdUnauthorized
 
 
 def test_etcd_result_response(payload_self):
@@ -117,6 +117,16 @@ def test_etcd_index(headers):
     assert res.x_etcd_index == 2007
 
 
+def test_etcd_cluster_id():
+    response = mock.Mock()
+    response.content = '{"action":"get","node":{"key":"/foo","value":"bar","modifiedIndex":7,"createdIndex":7}}'
+    response.headers = {'X-Etcd-Index': '7',
+                        'X-Etcd-Cluster-Id': 'cdf818194e3a8c32'}
+    # noinspection PyTypeChecker
+    res = EtcdResult(response)
+    assert res.x_etcd_cluster_id == 'cdf818194e3a8c32'
+
+
 def test_etcd_noindex():
     response = mock.Mock()
     response.content = '{"action":"get","node":{"key":"/foo","value":"bar","modifiedIndex":7,"createdIndex":7}}'
@@ -292,3 +302,21 @@ def test_selfstats(payload_self):
     assert res.sendAppendRequestCnt == 0
     assert res.startTime == "2016-09-19T06:08:51.527241706Z"
     assert res.state == "StateLeader"
+
+
+def test_stream_result():
+    response = mock.Mock(status_code=200, headers={},
+                         content=b'{"result": {"ID": "1", "TTL": "10"}}\n'
+                                 b'{"result": {"ID": "2"}}\n')
+    assert EtcdStreamResult(response).payload == [
+        {'ID': '1', 'TTL': '10'}, {'ID': '2'}
+    ]
+
+
+def test_stream_result_error():
+    response = mock.Mock(status_code=200, headers={},
+                         content=b'{"result": {"ID": "1"}}\n'
+                                 b'{"error": {"grpc_code": 16, '
+                                 b'"message": "invalid auth token"}}\n')
+    with pytest.raises(EtcdUnauthorized):
+        EtcdStreamResult(response)
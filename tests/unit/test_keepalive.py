@@ -0,0 +1,84 @@
+import threading
+import time
+
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound, EtcdException
+from pyetcd.client import Client, ClientException
+from pyetcd.keepalive import KeepAliveManager
+from tests.unit.util import wait_for
+
+
+@pytest.fixture
+def client():
+    return mock.Mock(spec=Client)
+
+
+def test_keepalive_refreshes_many_keys(client):
+    with KeepAliveManager(client, margin=0.5) as manager:
+        for i in range(100):
+            manager.add('/key/%d' % i, 0.05)
+        assert len(manager) == 100
+        assert wait_for(lambda: manager.refreshed >= 200)
+    refreshed = set(call[0] for call in client.update_ttl.call_args_list)
+    assert refreshed == set(('/key/%d' % i, 0.05) for i in range(100))
+    assert manager.max_refresh_lag >= manager.refresh_lag >= 0
+
+
+def test_keepalive_remove(client):
+    with KeepAliveManager(client) as manager:
+        manager.add('/foo', 0.03)
+        manager.remove('/foo')
+        assert '/foo' not in manager
+        time.sleep(0.05)
+    assert not client.update_ttl.called
+
+
+def test_keepalive_rewrites_lost_key(client):
+    client.update_ttl.side_effect = EtcdKeyNotFound
+    with KeepAliveManager(client) as manager:
+        manager.add('/foo', 0.03, value='bar')
+        assert wait_for(lambda: client.write.called)
+        assert '/foo' in manager
+    client.write.assert_called_with('/foo', 'bar', ttl=0.03)
+
+
+def test_keepalive_drops_lost_key(client):
+    client.update_ttl.side_effect = EtcdKeyNotFound
+    lost = []
+    done = threading.Event()
+
+    def on_lost(key):
+        lost.append(key)
+        done.set()
+
+    with KeepAliveManager(client, on_lost=on_lost) as manager:
+        manager.add('/foo', 0.03)
+        assert done.wait(5)
+        assert '/foo' not in manager
+    assert lost == ['/foo']
+
+
+def test_keepalive_retries_failed_refresh(client):
+    client.update_ttl.side_effect = [EtcdException('foo'), None]
+    with KeepAliveManager(client, retry_interval=0.01) as manager:
+        manager.add('/foo', 0.03)
+        assert wait_for(lambda: manager.refreshed == 1)
+        assert manager.failed == 1
+
+
+def test_keepalive_retries_after_other_error(client):
+    client.update_ttl.side_effect = [ValueError('foo'), None]
+    with KeepAliveManager(client, retry_interval=0.01) as manager:
+        manager.add('/foo', 0.03)
+        assert wait_for(lambda: manager.refreshed == 1)
+        assert manager.failed == 1
+        assert '/foo' in manager
+
+
+def test_keepalive_closed(client):
+    manager = KeepAliveManager(client)
+    manager.close()
+    with pytest.raises(ClientException):
+        manager.add('/foo', 10)
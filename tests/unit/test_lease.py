@@ -0,0 +1,117 @@
+import threading
+import time
+
+import mock
+import pytest
+
+from pyetcd import EtcdException, EtcdKeyNotFound
+from pyetcd.lease import LeaseKeepAlive
+from pyetcd.v3 import V3Client
+from tests.unit.util import wait_for
+
+
+@pytest.fixture
+def client(v3_server):
+    client = V3Client(port=v3_server.port)
+    yield client
+    client.close()
+
+
+def test_lease_grant_and_revoke(client, v3_server):
+    lease = client.lease_grant(30)
+    assert lease.ttl == 30
+    client.put('/a', '1', lease=lease.id)
+    client.put('/b', '2', lease=lease.id)
+    client.put('/c', '3')
+    assert v3_server.store.requests[-2][1]['lease'] == lease.id
+
+    response = client.lease_timetolive(lease.id, keys=True)
+    assert response.granted_ttl == 30
+    assert 0 < response.ttl <= 30
+    assert response.keys == ['/a', '/b']
+
+    client.lease_revoke(lease.id)
+    assert v3_server.get('/a') is None
+    assert v3_server.get('/c') == '3'
+    assert client.lease_timetolive(lease.id).ttl == -1
+    with pytest.raises(EtcdKeyNotFound):
+        client.lease_revoke(lease.id)
+
+
+def test_lease_keepalive_one_request(client, v3_server):
+    leases = [client.lease_grant(10).id for _ in range(3)]
+    ttls = client.lease_keepalive(*(leases + [42]))
+    assert ttls == {leases[0]: 10, leases[1]: 10, leases[2]: 10, 42: 0}
+    requests = [request for path, request in v3_server.store.requests
+                if path == '/v3/lease/keepalive']
+    assert requests == [[{'ID': lease_id} for lease_id in leases + [42]]]
+
+
+def test_lease_grant_keepalive(client, v3_server):
+    lease = client.lease_grant(1, keepalive=True)
+    assert lease.id in client.lease_keeper
+    client.put('/a', '1', lease=lease.id)
+    time.sleep(1.5)
+    assert v3_server.get('/a') == '1'
+    client.lease_revoke(lease.id)
+    assert lease.id not in client.lease_keeper
+
+
+def test_lease_keepalive_shares_requests():
+    client = mock.Mock(spec=V3Client)
+    refreshed = threading.Event()
+
+    def keepalive(*lease_ids):
+        refreshed.set()
+        return dict((lease_id, 10) for lease_id in lease_ids)
+
+    client.lease_keepalive.side_effect = keepalive
+    with LeaseKeepAlive(client, margin=0.9) as keeper:
+        keeper.add(1, 0.5)
+        keeper.add(2, 0.6)
+        keeper.add(3, 100)
+        assert refreshed.wait(5)
+        assert wait_for(lambda: keeper.refreshed >= 2)
+    client.lease_keepalive.assert_any_call(1, 2)
+    assert all(3 not in call[0]
+               for call in client.lease_keepalive.call_args_list)
+
+
+def test_lease_keepalive_lost_and_failed():
+    client = mock.Mock(spec=V3Client)
+    client.lease_keepalive.side_effect = [
+        EtcdException('boom'),
+        {1: 0},
+    ]
+    lost = []
+    keeper = LeaseKeepAlive(client, margin=0.9, retry_interval=0.01,
+                            on_lost=lost.append)
+    keeper.add(1, 0.1)
+    assert wait_for(lambda: lost == [1])
+    assert keeper.failed == 1
+    assert keeper.requests == 2
+    assert 1 not in keeper
+    keeper.close()
+
+
+def test_lease_keepalive_survives_errors():
+    client = mock.Mock(spec=V3Client)
+    client.lease_keepalive.side_effect = [
+        ValueError('bad TTL'),
+        {1: 0, 2: 10},
+        {2: 10},
+    ]
+
+    def on_lost(lease_id):
+        raise RuntimeError('boom')
+
+    keeper = LeaseKeepAlive(client, margin=0.9, retry_interval=0.01,
+                            on_lost=on_lost)
+    keeper.add(1, 0.1)
+    keeper.add(2, 0.1)
+    # Lease 2 is still refreshed after the error and the failed callback
+    assert wait_for(lambda: keeper.requests == 3)
+    assert keeper.failed == 1
+    assert 1 not in keeper
+    assert 2 in keeper
+    keeper.close()
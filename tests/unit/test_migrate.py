@@ -0,0 +1,103 @@
+import json
+from concurrent.futures import Future
+
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound
+from pyetcd.client import Client, ClientException
+from pyetcd.migrate import migrate
+from pyetcd.v3 import V3Client
+
+TREE = {
+    '/app': {'key': '/app', 'dir': True, 'nodes': [
+        {'key': '/app/db', 'dir': True},
+        {'key': '/app/empty', 'dir': True},
+        {'key': '/app/name', 'value': 'app'},
+        {'key': '/app/lock', 'value': 'me', 'ttl': 10},
+    ]},
+    '/app/db': {'key': '/app/db', 'dir': True, 'nodes': [
+        {'key': '/app/db/k%02d' % i, 'value': 'v%d' % i} for i in range(25)
+    ]},
+    '/app/empty': {'key': '/app/empty', 'dir': True},
+}
+
+
+def _read(key, **kwargs):
+    if key not in TREE:
+        raise EtcdKeyNotFound('Key not found')
+    return mock.Mock(node=TREE[key], x_etcd_index=10)
+
+
+def _submit_read(key, **kwargs):
+    future = Future()
+    future.set_result(_read(key, **kwargs))
+    return future
+
+
+@pytest.fixture
+def source():
+    source = mock.Mock(spec=Client)
+    source.read.side_effect = _read
+    source.submit_read.side_effect = _submit_read
+    return source
+
+
+@pytest.fixture
+def target(v3_server):
+    return V3Client(port=v3_server.port)
+
+
+def test_migrate(source, target, v3_server):
+    report = migrate(source, target, prefix='/app', batch_size=10,
+                     parallel=3)
+    assert report.migrated == 26
+    assert report.skipped == 1
+    assert report.failed == []
+    assert report.source_count == report.target_count == 26
+    assert report.verified
+    assert v3_server.get('/app/name') == 'app'
+    assert v3_server.get('/app/db/k07') == 'v7'
+    assert v3_server.get('/app/lock') is None
+    txns = [request for path, request in v3_server.store.requests
+            if path == '/v3/kv/txn']
+    assert sorted(len(txn['success']) for txn in txns) == [6, 10, 10]
+
+
+def test_migrate_target_prefix(source, target, v3_server):
+    report = migrate(source, target, prefix='/app/', target_prefix='/new',
+                     verify=False)
+    assert report.verified is None
+    assert v3_server.get('/new/db/k01') == 'v1'
+    assert v3_server.get('/app/db/k01') is None
+
+
+def test_migrate_verify_detects_extra_keys(source, target, v3_server):
+    v3_server.store.put({'key': 'L2FwcC9leHRyYQ==', 'value': 'eA=='})
+    report = migrate(source, target, prefix='/app')
+    assert report.target_count == 27
+    assert not report.verified
+
+
+def test_migrate_checkpoint(source, target, v3_server, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint'))
+    with open(checkpoint, 'w') as f:
+        json.dump({'source': ['/app', '/app'], 'position': 2}, f)
+    report = migrate(source, target, prefix='/app', batch_size=10,
+                     checkpoint=checkpoint, verify=False)
+    assert report.migrated == 6
+    assert report.source_count == 26
+    with open(checkpoint) as f:
+        assert json.load(f)['position'] == 3
+
+    with pytest.raises(ClientException):
+        migrate(source, target, prefix='/app', target_prefix='/other',
+                checkpoint=checkpoint)
+
+
+def test_migrate_failed_batch(source, target, v3_server):
+    v3_server.stop()
+    report = migrate(source, target, prefix='/app', batch_size=20,
+                     verify=False)
+    assert report.migrated == 0
+    assert len(report.failed) == 26
@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+from pyetcd.ratelimit import RateLimiter
+
+
+def test_rate_limiter_burst():
+    limiter = RateLimiter(10, burst=5)
+    for _ in range(5):
+        assert limiter.acquire() == 0
+    assert limiter.acquire() > 0
+
+
+def test_rate_limiter_rate():
+    limiter = RateLimiter(50, burst=1)
+    started = time.time()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.time() - started >= 0.09
+
+
+def test_rate_limiter_invalid_rate():
+    with pytest.raises(ValueError):
+        RateLimiter(0)
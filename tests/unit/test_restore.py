@@ -0,0 +1,197 @@
+import io
+import json
+import time
+
+import mock
+import pytest
+
+from pyetcd import EtcdException, EtcdKeyNotFound, EtcdNodeExist, \
+    EtcdTestFailed
+from pyetcd.checkpoint import Checkpoint
+from pyetcd.client import Client, ClientException
+from pyetcd.restore import restore, parse_expiration
+
+
+def _dump(nodes, index=100, cluster_id='c1'):
+    lines = [{'format': 1, 'prefix': '/', 'cluster_id': cluster_id,
+              'x_etcd_index': index}] + nodes
+    return io.BytesIO(b''.join(
+        json.dumps(line).encode('utf-8') + b'\n' for line in lines
+    ))
+
+
+NODES = [
+    {'key': '/a', 'dir': True},
+    {'key': '/a/x', 'value': '1'},
+    {'key': '/a/y', 'value': '2', 'ttl': 60,
+     'expiration': '2000-01-01T00:00:00Z'},
+    {'key': '/b', 'value': '3'},
+]
+
+
+@pytest.fixture
+def client():
+    return mock.Mock(spec=Client)
+
+
+@pytest.mark.parametrize('expiration, timestamp', [
+    ('1970-01-01T00:01:00Z', 60),
+    ('1970-01-01T00:01:00.5Z', 60.5),
+    ('1970-01-01T02:01:00+02:00', 60),
+    ('1969-12-31T16:01:00.25-08:00', 60.25),
+])
+def test_parse_expiration(expiration, timestamp):
+    assert parse_expiration(expiration) == timestamp
+
+
+def test_restore(client):
+    report = restore(client, _dump(NODES), parallel=2)
+    assert report.restored == 3
+    assert report.expired == 1
+    assert report.failed == []
+    client.mkdir.assert_called_once_with('/a', ttl=None)
+    assert sorted(client.write.call_args_list) == [
+        mock.call('/a/x', '1', ttl=None),
+        mock.call('/b', '3', ttl=None),
+    ]
+
+
+@mock.patch('pyetcd.restore.time.time')
+def test_restore_remaining_ttl(mock_time, client):
+    mock_time.return_value = parse_expiration('2000-01-01T00:00:00Z') - 9.5
+    restore(client, _dump(NODES[2:3]))
+    client.write.assert_called_once_with('/a/y', '2', ttl=10)
+
+
+def test_restore_existing_directory(client):
+    client.mkdir.side_effect = EtcdNodeExist('Key already exists')
+    report = restore(client, _dump(NODES[:1]))
+    assert report.skipped == 1
+
+
+def test_restore_rate(client):
+    started = time.time()
+    restore(client, _dump([{'key': '/k%d' % i, 'value': 'v'}
+                           for i in range(120)]), rate=100)
+    assert time.time() - started >= 0.19
+
+
+def test_restore_checkpoint(client, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint'))
+
+    def write(key, value, ttl=None):
+        if key == '/b':
+            raise EtcdException('boom')
+    client.write.side_effect = write
+    report = restore(client, _dump(NODES), parallel=1,
+                     checkpoint=checkpoint)
+    assert report.failed == ['/b']
+    with open(checkpoint) as f:
+        assert json.load(f) == {'source': ['c1', '/', 100], 'position': 3}
+
+    client.reset_mock()
+    client.write.side_effect = None
+    report = restore(client, _dump(NODES), checkpoint=checkpoint)
+    assert report.restored == 1
+    client.write.assert_called_once_with('/b', '3', ttl=None)
+    assert not client.mkdir.called
+
+    with pytest.raises(ClientException):
+        restore(client, _dump(NODES, index=101), checkpoint=checkpoint)
+    with pytest.raises(ClientException):
+        restore(client, _dump(NODES, cluster_id='c2'),
+                checkpoint=checkpoint)
+
+
+def test_restore_unexpected_error(client, tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint'))
+
+    def write(key, value, ttl=None):
+        if key == '/a/x':
+            raise ValueError('boom')
+    client.write.side_effect = write
+    nodes = NODES + [{'key': '/c'}]
+    report = restore(client, _dump(nodes), parallel=1, checkpoint=checkpoint)
+    assert report.restored == 2
+    assert sorted(report.failed) == ['/a/x', '/c']
+    with open(checkpoint) as f:
+        assert json.load(f)['position'] == 1
+
+
+def test_checkpoint_forgets_items_after_failure():
+    checkpoint = Checkpoint(None, 'dump')
+    checkpoint.finish(1)
+    checkpoint.finish(3)
+    checkpoint.fail(2)
+    for position in range(4, 1000):
+        checkpoint.finish(position)
+    assert checkpoint.position == 1
+    assert not checkpoint._finished
+
+
+def test_restore_cas(client):
+    nodes = {
+        '/new': {'key': '/new', 'value': 'x', 'modifiedIndex': 101},
+        '/old': {'key': '/old', 'value': 'x', 'modifiedIndex': 50},
+        '/same': {'key': '/same', 'value': 'v', 'modifiedIndex': 50},
+        '/raced': {'key': '/raced', 'value': 'x', 'modifiedIndex': 50},
+    }
+
+    def read(key):
+        if key == '/':
+            return mock.Mock(x_etcd_cluster_id='c1')
+        if key not in nodes:
+            raise EtcdKeyNotFound('Key not found')
+        return mock.Mock(node=nodes[key])
+
+    def compare_and_swap(key, value, **kwargs):
+        if key == '/raced':
+            raise EtcdTestFailed('Compare failed')
+
+    client.read.side_effect = read
+    client.compare_and_swap.side_effect = compare_and_swap
+    report = restore(client, _dump([
+        {'key': '/missing', 'value': 'v'},
+        {'key': '/new', 'value': 'v'},
+        {'key': '/old', 'value': 'v'},
+        {'key': '/same', 'value': 'v'},
+        {'key': '/raced', 'value': 'v'},
+    ]), cas=True)
+    assert report.restored == 2
+    assert report.skipped == 3
+    assert sorted(client.compare_and_swap.call_args_list) == [
+        mock.call('/missing', 'v', prev_exist=False, ttl=None),
+        mock.call('/old', 'v', prev_index=50, ttl=None),
+        mock.call('/raced', 'v', prev_index=50, ttl=None),
+    ]
+    assert not client.write.called
+
+
+@pytest.mark.parametrize('cluster_id', ['c2', None])
+def test_restore_cas_other_cluster(client, cluster_id):
+    client.read.return_value = mock.Mock(x_etcd_cluster_id='c1')
+    with pytest.raises(ClientException):
+        restore(client, _dump(NODES, cluster_id=cluster_id), cas=True)
+    client.read.assert_called_once_with('/')
+    assert not client.compare_and_swap.called
+
+
+@mock.patch('pyetcd.restore.RateLimiter')
+def test_restore_cas_rate_per_request(mock_limiter, client):
+    client.read.side_effect = [
+        mock.Mock(x_etcd_cluster_id='c1'),
+        mock.Mock(node={'key': '/old', 'value': 'x', 'modifiedIndex': 50}),
+        EtcdKeyNotFound('Key not found'),
+    ]
+    restore(client, _dump([{'key': '/old', 'value': 'v'},
+                           {'key': '/missing', 'value': 'v'}]),
+            parallel=1, rate=100, cas=True)
+    # The cluster check, a read and a write per key
+    assert mock_limiter.return_value.acquire.call_count == 5
+
+
+def test_restore_not_a_dump(client):
+    with pytest.raises(ClientException):
+        restore(client, io.BytesIO(b'{"key": "/a"}\n'))
+    with pytest.raises(ClientException):
+        restore(client, io.BytesIO(b''))
@@ -0,0 +1,49 @@
+import mock
+import pytest
+from requests import RequestException
+
+from pyetcd.selector import EndpointSelector
+
+URLS = [
+    'http://10.0.1.1:2379',
+    'http://10.0.1.2:2379',
+    'http://10.0.1.3:2379'
+]
+
+
+def test_ordered_keeps_configured_order():
+    assert EndpointSelector(URLS).ordered() == URLS
+
+
+def test_ordered_moves_failed_node_last():
+    selector = EndpointSelector(URLS)
+    with pytest.raises(RequestException):
+        with selector.track(URLS[0]):
+            raise RequestException
+    assert selector.ordered() == URLS[1:] + URLS[:1]
+
+
+def test_track_counts_inflight_and_latency():
+    selector = EndpointSelector(URLS)
+    with mock.patch('pyetcd.selector.time.time', side_effect=[10, 12]):
+        with selector.track(URLS[0]):
+            assert selector.inflight(URLS[0]) == 1
+    assert selector.inflight(URLS[0]) == 0
+    assert selector.latency(URLS[0]) == 2
+
+
+def test_track_failed_leader_is_forgotten():
+    selector = EndpointSelector(URLS)
+    selector.leader = URLS[1]
+    with pytest.raises(RequestException):
+        with selector.track(URLS[1]):
+            raise RequestException
+    assert selector.leader is None
+
+
+def test_by_load_prefers_less_loaded():
+    selector = EndpointSelector(URLS[:2])
+    selector._latency[URLS[0]] = 0.5
+    selector._latency[URLS[1]] = 0.01
+    for _ in range(10):
+        assert selector.by_load()[0] == URLS[1]
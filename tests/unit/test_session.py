@@ -0,0 +1,87 @@
+import mock
+import pytest
+
+from pyetcd import EtcdKeyNotFound
+from pyetcd.client import Client
+from pyetcd.session import Session
+
+URLS = [
+    'http://10.0.1.1:2379',
+    'http://10.0.1.2:2379',
+]
+
+
+def _response(content, index):
+    return mock.Mock(content=content, headers={'X-Etcd-Index': str(index)})
+
+
+@pytest.fixture
+def client():
+    return Client(host=['10.0.1.1', '10.0.1.2'])
+
+
+def test_session_tracks_write_index(client, payload_write_success):
+    mock_requests = mock.Mock()
+    mock_requests.put.return_value = _response(payload_write_success, 30)
+    client._session = mock_requests
+    session = Session(client)
+    session.write('/messsage', 'Hello world')
+    assert session.index == 30
+
+
+def test_session_read_retries_lagging_node(client, payload_read_success):
+    indexes = {URLS[0]: 10, URLS[1]: 30}
+
+    def get(url):
+        return _response(payload_read_success, indexes[url[:len(URLS[0])]])
+
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(side_effect=get)
+    client._session = mock_requests
+
+    session = Session(client, index=20)
+    result = session.read('/foo')
+    assert result.x_etcd_index == 30
+    assert result.endpoint == URLS[1]
+
+
+def test_session_read_not_found_on_lagging_node(client, payload_read_success):
+    not_found = '{"errorCode":100,"message":"Key not found",' \
+                '"cause":"/foo","index":10}'
+    responses = {
+        URLS[0]: _response(not_found, 10),
+        URLS[1]: _response(payload_read_success, 30)
+    }
+    mock_requests = mock.Mock()
+    mock_requests.get = mock.Mock(
+        side_effect=lambda url: responses[url[:len(URLS[0])]]
+    )
+    client._session = mock_requests
+
+    session = Session(client, index=20)
+    assert session.read('/foo').node['value'] == 'Hello world'
+
+
+def test_session_read_not_found_on_fresh_node(client):
+    not_found = '{"errorCode":100,"message":"Key not found",' \
+                '"cause":"/foo","index":30}'
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = _response(not_found, 30)
+    client._session = mock_requests
+
+    session = Session(client, index=20)
+    with pytest.raises(EtcdKeyNotFound):
+        session.read('/foo')
+    assert mock_requests.get.call_count == 1
+
+
+@mock.patch('pyetcd.session.time.sleep')
+def test_session_read_falls_back_to_quorum(mock_sleep, client,
+                                           payload_read_success):
+    mock_requests = mock.Mock()
+    mock_requests.get.return_value = _response(payload_read_success, 10)
+    client._session = mock_requests
+
+    session = Session(client, index=20, max_wait=0)
+    session.read('/foo')
+    assert mock_requests.get.call_args[0][0].endswith('/foo?quorum=true')
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from pyetcd.singleflight import SingleFlight
+
+
+def test_do_returns_result():
+    flight = SingleFlight()
+    assert flight.do('foo', lambda x: x + 1, 1) == 2
+    assert flight.coalesced == 0
+
+
+def test_do_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return object()
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(flight.do('k', func)))
+    owner.start()
+    started.wait()
+    waiters = [
+        threading.Thread(target=lambda: results.append(flight.do('k', func)))
+        for _ in range(5)
+    ]
+    for waiter in waiters:
+        waiter.start()
+    while flight.coalesced < 5:
+        pass
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 6
+    assert all(result is results[0] for result in results)
+
+
+def test_do_shares_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def func():
+        started.set()
+        release.wait()
+        raise ValueError('foo')
+
+    def call():
+        try:
+            flight.do('k', func)
+        except ValueError as err:
+            errors.append(err)
+
+    owner = threading.Thread(target=call)
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while flight.coalesced < 1:
+        pass
+    release.set()
+    owner.join()
+    waiter.join()
+    assert len(errors) == 2
+
+
+def test_do_after_call_completes_calls_again():
+    flight = SingleFlight()
+    flight.do('k', lambda: 1)
+    with pytest.raises(KeyError):
+        flight.do('k', lambda: {}['x'])
+    assert flight.coalesced == 0
@@ -0,0 +1,107 @@
+import mock
+import pytest
+
+from pyetcd import EtcdException, EtcdKeyNotFound, EtcdTestFailed
+from pyetcd.client import Client
+from pyetcd.sync import sync_prefix, flatten, diff_prefix
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=Client)
+    client.read.return_value = mock.Mock(node={
+        'key': '/app',
+        'dir': True,
+        'nodes': [
+            {'key': '/app/name', 'value': 'app', 'modifiedIndex': 5},
+            {'key': '/app/old', 'value': 'x', 'modifiedIndex': 6},
+            {'key': '/app/db', 'dir': True, 'nodes': [
+                {'key': '/app/db/port', 'value': '5432',
+                 'modifiedIndex': 7},
+            ]},
+        ]
+    })
+    return client
+
+
+DESIRED = {'name': 'app', 'db': {'port': '6432', 'user': 'root'}}
+
+
+def test_flatten():
+    assert flatten(DESIRED) == {
+        'name': 'app', 'db/port': '6432', 'db/user': 'root'
+    }
+
+
+def test_flatten_converts_values():
+    assert flatten({'port': 5432, 'debug': True, 'ratio': 0.5,
+                    'name': b'app', 'db': {'pool': 10}}) == {
+        'port': '5432', 'debug': 'True', 'ratio': '0.5', 'name': 'app',
+        'db/pool': '10'
+    }
+
+
+def test_sync_prefix_unchanged_non_str(client):
+    report = sync_prefix(client, '/app', {'db': {'port': 5432}},
+                         delete=False)
+    assert report.unchanged == ['db/port']
+    assert report.updated == []
+    client.compare_and_swap.assert_not_called()
+
+
+def test_diff_prefix():
+    current = {'a': ('1', 1), 'b': ('2', 2), 'c': ('3', 3)}
+    operations, unchanged = diff_prefix(current, {'a': '1', 'b': '4',
+                                                  'd': '5'})
+    assert operations == [
+        ('update', 'b', '4', 2),
+        ('delete', 'c', None, 3),
+        ('create', 'd', '5', None),
+    ]
+    assert unchanged == ['a']
+    operations, _ = diff_prefix(current, {}, delete=False)
+    assert operations == []
+
+
+def test_sync_prefix(client):
+    report = sync_prefix(client, '/app/', DESIRED)
+    client.read.assert_called_once_with('/app', recursive=True)
+    assert report.created == ['db/user']
+    assert report.updated == ['db/port']
+    assert report.deleted == ['old']
+    assert report.unchanged == ['name']
+    assert report.conflicts == []
+    client.compare_and_swap.assert_has_calls([
+        mock.call('/app/db/port', '6432', prev_index=7),
+        mock.call('/app/db/user', 'root', prev_exist=False),
+    ], any_order=True)
+    client.compare_and_delete.assert_called_once_with('/app/old',
+                                                      prev_index=6)
+    assert not client.write.called
+
+
+def test_sync_prefix_dry_run(client):
+    report = sync_prefix(client, '/app', DESIRED, dry_run=True)
+    assert report.created == ['db/user']
+    assert report.updated == ['db/port']
+    assert report.deleted == ['old']
+    assert not client.compare_and_swap.called
+    assert not client.compare_and_delete.called
+
+
+def test_sync_prefix_conflicts(client):
+    client.compare_and_swap.side_effect = [
+        EtcdTestFailed('Compare failed'),
+        EtcdException('boom'),
+    ]
+    client.compare_and_delete.side_effect = EtcdKeyNotFound('Key not found')
+    report = sync_prefix(client, '/app', DESIRED, parallel=1)
+    assert report.conflicts == ['db/port']
+    assert report.failed == ['db/user']
+    assert report.deleted == ['old']
+
+
+def test_sync_prefix_missing_directory(client):
+    client.read.side_effect = EtcdKeyNotFound('Key not found')
+    report = sync_prefix(client, '/app', {'a': '1'})
+    assert report.created == ['a']
@@ -0,0 +1,160 @@
+import os
+import ssl
+import subprocess
+
+import pytest
+
+from pyetcd import EtcdException
+from pyetcd.client import Client, ClientException
+from pyetcd.v3 import V3Client
+from tests.unit.v3_server import V3Server
+
+
+def _openssl(*args):
+    subprocess.check_call(('openssl',) + args,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _issue(directory, name, subject, extensions):
+    key = os.path.join(directory, '%s.key' % name)
+    csr = os.path.join(directory, '%s.csr' % name)
+    pem = os.path.join(directory, '%s.pem' % name)
+    ext = os.path.join(directory, '%s.ext' % name)
+    with open(ext, 'w') as ext_file:
+        ext_file.write(extensions)
+    _openssl('req', '-newkey', 'ec', '-pkeyopt',
+             'ec_paramgen_curve:prime256v1', '-nodes', '-keyout', key,
+             '-out', csr, '-subj', subject)
+    _openssl('x509', '-req', '-in', csr,
+             '-CA', os.path.join(directory, 'ca.pem'),
+             '-CAkey', os.path.join(directory, 'ca.key'),
+             '-CAcreateserial', '-days', '1', '-out', pem, '-extfile', ext)
+    return pem, key
+
+
+@pytest.fixture(scope='module')
+def certs(tmpdir_factory):
+    directory = str(tmpdir_factory.mktemp('certs'))
+    try:
+        _openssl('req', '-x509', '-newkey', 'ec', '-pkeyopt',
+                 'ec_paramgen_curve:prime256v1', '-nodes',
+                 '-keyout', os.path.join(directory, 'ca.key'),
+                 '-out', os.path.join(directory, 'ca.pem'),
+                 '-days', '1', '-subj', '/CN=pyetcd test CA')
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip('openssl is not available')
+    server = _issue(directory, 'server', '/CN=localhost',
+                    'subjectAltName=IP:127.0.0.1,DNS:localhost\n')
+    client = _issue(directory, 'client', '/CN=client',
+                    'extendedKeyUsage=clientAuth\n')
+    return {'ca': os.path.join(directory, 'ca.pem'),
+            'server': server, 'client': client}
+
+
+def _server_context(certs, client_auth=False):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*certs['server'])
+    if client_auth:
+        context.verify_mode = ssl.CERT_REQUIRED
+        context.load_verify_locations(cafile=certs['ca'])
+    return context
+
+
+@pytest.fixture
+def tls_server(certs):
+    server = V3Server(ssl_context=_server_context(certs)).start()
+    yield server
+    server.stop()
+
+
+def test_https(certs, tls_server):
+    client = V3Client(protocol='https', port=tls_server.port,
+                      ca_cert=certs['ca'])
+    assert client.endpoints == ['https://127.0.0.1:%d' % tls_server.port]
+    client.put('/k', 'v')
+    assert client.get('/k').value == 'v'
+    assert client.metrics['tls_handshakes'] == 1
+    client.close()
+
+
+def test_https_session_reused(certs, tls_server):
+    client = V3Client(protocol='https', port=tls_server.port,
+                      ca_cert=certs['ca'])
+    client.put('/k', '1')
+    # Drop pooled connections, the next request connects again
+    client._session.close()
+    client.put('/k', '2')
+    client._session.close()
+    client.put('/k', '3')
+    assert client.metrics['tls_handshakes'] == 3
+    assert client.metrics['tls_sessions_reused'] == 2
+    client.close()
+
+
+def test_https_endpoints_share_context(certs, tls_server):
+    other = V3Server(ssl_context=_server_context(certs)).start()
+    try:
+        client = V3Client(protocol='https',
+                          host=[('127.0.0.1', tls_server.port),
+                                ('localhost', other.port)],
+                          ca_cert=certs['ca'])
+        client.put('/k', '1')
+        tls_server.stop()
+        # Fails over to the other node
+        client.put('/k', '2')
+        assert other.get('/k') == '2'
+        client.put('/k', '3')
+        assert client.metrics['tls_handshakes'] == 2
+        client.close()
+    finally:
+        other.stop()
+
+
+def test_https_unknown_ca(tls_server):
+    client = V3Client(protocol='https', port=tls_server.port)
+    with pytest.raises(EtcdException):
+        client.put('/k', 'v')
+    assert tls_server.get('/k') is None
+
+
+def test_https_client_certificate(certs):
+    server = V3Server(
+        ssl_context=_server_context(certs, client_auth=True)
+    ).start()
+    try:
+        client = V3Client(protocol='https', port=server.port,
+                          ca_cert=certs['ca'])
+        with pytest.raises(EtcdException):
+            client.put('/k', 'v')
+
+        cert, key = certs['client']
+        client = V3Client(protocol='https', port=server.port,
+                          ca_cert=certs['ca'], cert=cert, key=key)
+        client.put('/k', 'v')
+        assert server.get('/k') == 'v'
+    finally:
+        server.stop()
+
+
+def test_tls_options(tmpdir):
+    with pytest.raises(ClientException):
+        Client(ca_cert='ca.pem')
+    with pytest.raises(ClientException):
+        Client(protocol='https', ca_cert=str(tmpdir.join('missing.pem')))
+
+
+@pytest.mark.filterwarnings('ignore:ssl.PROTOCOL_TLS is deprecated')
+def test_https_without_session_reuse(certs, tls_server, monkeypatch):
+    # Python before 3.6 has neither PROTOCOL_TLS_CLIENT
+    # nor TLS session reuse
+    monkeypatch.setattr('pyetcd.tls.SESSION_REUSE', False)
+    monkeypatch.setattr('pyetcd.tls._PROTOCOL', None)
+    client = V3Client(protocol='https', port=tls_server.port,
+                      ca_cert=certs['ca'])
+    client.put('/k', '1')
+    client._session.close()
+    client.put('/k', '2')
+    assert tls_server.get('/k') == '2'
+    assert client.metrics['tls_handshakes'] == 2
+    assert client.metrics['tls_sessions_reused'] == 0
+    client.close()
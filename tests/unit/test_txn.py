@@ -0,0 +1,78 @@
+import pytest
+
+from pyetcd.client import ClientException
+from pyetcd.txn import value, version, mod_revision, create_revision, \
+    lease, put, get, delete
+from pyetcd.v3 import V3Client, PutResponse
+
+
+@pytest.fixture
+def client(v3_server):
+    client = V3Client(port=v3_server.port)
+    client.put('/config/version', '41')
+    client.put('/config/pending/a', '1')
+    client.put('/config/pending/b', '2')
+    yield client
+    client.close()
+
+
+def test_compare_request(client):
+    assert (mod_revision('/foo') < 10)._request(client) == {
+        'key': 'L2Zvbw==', 'target': 'MOD', 'result': 'LESS',
+        'mod_revision': 10
+    }
+    assert (value('/foo') != 'bar')._request(client) == {
+        'key': 'L2Zvbw==', 'target': 'VALUE', 'result': 'NOT_EQUAL',
+        'value': 'YmFy'
+    }
+    assert (value('/foo') == 41)._request(client)['value'] == 'NDE='
+    assert (create_revision('/foo') > 1).target == 'CREATE'
+    assert (lease('/foo') == 0).target == 'LEASE'
+
+
+def test_txn_then(client, v3_server):
+    response = client.txn().if_(
+        value('/config/version') == '41',
+        mod_revision('/config/version') < 100
+    ).then(
+        put('/config/version', '42', prev_kv=True),
+        delete('/config/pending/', prefix=True),
+        get('/config/', prefix=True)
+    ).else_(
+        get('/config/version')
+    ).commit()
+
+    assert response.succeeded
+    assert response.revision == 6
+    put_response, delete_response, range_response = response.responses
+    assert isinstance(put_response, PutResponse)
+    assert put_response.prev_kv.value == '41'
+    assert delete_response.deleted == 2
+    assert [item.value for item in range_response.kvs] == ['42']
+    assert len([path for path, _ in v3_server.store.requests
+                if path == '/v3/kv/txn']) == 1
+
+
+def test_txn_else(client, v3_server):
+    response = client.txn().if_(
+        version('/config/version') == 0
+    ).then(
+        put('/config/version', '1')
+    ).else_(
+        get('/config/version', keys_only=True)
+    ).commit()
+    assert not response.succeeded
+    assert response.responses[0].kvs[0].key == '/config/version'
+    assert response.responses[0].kvs[0].value is None
+    assert v3_server.get('/config/version') == '41'
+
+
+def test_txn_without_conditions(client, v3_server):
+    response = client.txn().then(put('/a', '1'), put('/b', '2')).commit()
+    assert response.succeeded
+    assert v3_server.get('/b') == '2'
+
+
+def test_txn_invalid_condition(client):
+    with pytest.raises(ClientException):
+        client.txn().if_(put('/a', '1'))
@@ -0,0 +1,112 @@
+import mock
+import pytest
+
+from pyetcd import EtcdCompacted, EtcdEventIndexCleared, EtcdUnauthorized, \
+    EtcdResult
+from pyetcd.client import ClientException
+from pyetcd.v3 import V3Client, KeyValue, prefix_range_end
+
+
+@pytest.fixture
+def client(v3_server):
+    client = V3Client(port=v3_server.port)
+    for i in range(5):
+        client.put('/app/k%d' % i, 'v%d' % i)
+    client.put('/other', 'x')
+    yield client
+    client.close()
+
+
+def test_prefix_range_end():
+    assert prefix_range_end(b'/app/') == b'/app0'
+    assert prefix_range_end(b'a\xff') == b'b'
+    assert prefix_range_end(b'\xff') == b'\0'
+
+
+def test_v3_put_and_get(client, v3_server):
+    response = client.put('/app/k1', 'new', prev_kv=True)
+    assert response.revision == 8
+    assert response.prev_kv.value == 'v1'
+    assert v3_server.get('/app/k1') == 'new'
+    assert client.get('/app/k1') == KeyValue(
+        key='/app/k1', value='new', create_revision=3, mod_revision=8,
+        version=2, lease=0
+    )
+    assert client.get('/missing') is None
+    path, request = v3_server.store.requests[-1]
+    assert path == '/v3/kv/range'
+    assert request == {'key': 'L21pc3Npbmc='}
+
+
+def test_v3_range(client, v3_server):
+    response = client.range('/app/', prefix=True, limit=2, keys_only=True,
+                            sort_order='DESCEND', sort_target='KEY')
+    assert [item.key for item in response.kvs] == ['/app/k4', '/app/k3']
+    assert response.kvs[0].value is None
+    assert response.count == 5
+    assert response.more
+    assert response.revision == 7
+    request = v3_server.store.requests[-1][1]
+    assert request['range_end'] == 'L2FwcDA='
+    assert request['limit'] == 2
+    assert request['keys_only'] is True
+
+    assert client.range('/app/', prefix=True, count_only=True).count == 5
+    with pytest.raises(ClientException):
+        client.range('/app/', sort_order='UP')
+
+
+def test_v3_iter_range(client, v3_server):
+    keys = [item.key for item in client.iter_range('/app/', prefix=True,
+                                                   page_size=2)]
+    assert keys == ['/app/k%d' % i for i in range(5)]
+    requests = [request for path, request in v3_server.store.requests
+                if path == '/v3/kv/range']
+    assert len(requests) == 3
+    assert 'revision' not in requests[0]
+    assert requests[1]['revision'] == requests[2]['revision'] == 7
+
+    assert len(list(client.iter_range('/'))) == 6
+
+
+def test_v3_iter_range_compacted(client, v3_server):
+    pages = client.iter_range('/app/', prefix=True, page_size=2)
+    next(pages)
+    v3_server.store.compact_revision = 100
+    with pytest.raises(EtcdCompacted):
+        list(pages)
+
+
+def test_v3_delete_range(client, v3_server):
+    response = client.delete_range('/app/', prefix=True, prev_kv=True)
+    assert response.deleted == 5
+    keys = [item.key for item in response.prev_kvs]
+    assert keys == ['/app/k%d' % i for i in range(5)]
+    assert client.delete_range('/app/k0').deleted == 0
+    assert v3_server.get('/other') == 'x'
+
+
+def test_v3_bytes(v3_server):
+    client = V3Client(port=v3_server.port, encoding=None)
+    client.put(b'\xff\x00', b'\x01')
+    assert client.get(b'\xff\x00').value == b'\x01'
+
+
+def test_v3_put_converts_value(client, v3_server):
+    client.put('/n', 5)
+    assert client.get('/n').value == '5'
+    with pytest.raises(TypeError) as excinfo:
+        client.put(5, 'v')
+    assert 'int' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('code, exception', [
+    (16, EtcdUnauthorized),
+    (11, EtcdEventIndexCleared),
+])
+def test_etcd_result_grpc_error(code, exception):
+    response = mock.Mock(status_code=401, headers={},
+                         content='{"error": "boom", "message": "boom",'
+                                 ' "code": %d}' % code)
+    with pytest.raises(exception):
+        EtcdResult(response)
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+
+import pytest
+
+from pyetcd import EtcdCompacted
+from pyetcd.client import ClientException
+from pyetcd.v3 import V3Client
+from pyetcd.watch import JSONStreamDecoder, WatchStream, EVENT_DELETE, \
+    EVENT_PUT
+from tests.unit.util import wait_for
+
+
+@pytest.fixture
+def client(v3_server):
+    client = V3Client(port=v3_server.port)
+    yield client
+    client.close()
+
+
+class _Events(object):
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def keys(self):
+        with self._lock:
+            return [(event.type, event.kv.key) for event in self.events]
+
+
+def _watch_requests(v3_server):
+    return [request for path, request in v3_server.store.requests
+            if path == '/v3/watch']
+
+
+def test_json_stream_decoder():
+    decoder = JSONStreamDecoder()
+    assert decoder.feed(b'{"result": {"a"') == []
+    assert decoder.feed(b': 1}}\n{"result"') == [{'result': {'a': 1}}]
+    assert decoder.feed(b': {"b": "\xd0') == []
+    assert decoder.feed(b'\xb1}"}}{"c": 2}\n') == [
+        {'result': {'b': u'б}'}}, {'c': 2}
+    ]
+    assert decoder.feed(b'\n') == []
+
+
+def test_json_stream_decoder_byte_by_byte():
+    message = {'a': 'x\\"}{', 'b': [{'c': 1}] * 100}
+    data = json.dumps(message).encode('utf-8') + b'\n'
+    decoder = JSONStreamDecoder()
+    objects = []
+    for position in range(len(data)):
+        objects.extend(decoder.feed(data[position:position + 1]))
+    assert objects == [message]
+
+
+def test_json_stream_decoder_invalid():
+    with pytest.raises(ValueError):
+        JSONStreamDecoder().feed(b'[1}')
+
+
+def test_watch_multiplexed(client, v3_server):
+    key_events = _Events()
+    range_events = _Events()
+    with WatchStream(client) as stream:
+        watches = [stream.watch('/a', key_events),
+                   stream.watch('/app/', range_events, prefix=True)]
+        assert wait_for(lambda: all(watch.watch_id is not None
+                                    for watch in watches))
+
+        client.put('/a', '1')
+        client.put('/app/x', '2')
+        client.put('/b', '3')
+        client.delete_range('/app/x')
+        assert wait_for(lambda: len(range_events.keys()) == 2)
+        assert key_events.keys() == [(EVENT_PUT, '/a')]
+        assert range_events.keys() == [(EVENT_PUT, '/app/x'),
+                                       (EVENT_DELETE, '/app/x')]
+        assert range_events.events[0].kv.value == '2'
+
+        # Both watches share the last connection
+        requests = _watch_requests(v3_server)
+        assert [message['create_request']['key']
+                for message in requests[-1]] == ['L2E=', 'L2FwcC8=']
+        assert 'range_end' in requests[-1][1]['create_request']
+        assert stream.failed == 0
+        assert stream.events == 3
+    assert len(stream) == 0
+    with pytest.raises(ClientException):
+        stream.watch('/a', key_events)
+
+
+def test_watch_resume_after_disconnect(client, v3_server):
+    events = _Events()
+    with WatchStream(client, retry_interval=0.1) as stream:
+        watch = stream.watch('/k', events, prev_kv=True)
+        assert wait_for(lambda: watch.watch_id is not None)
+        client.put('/k', '1')
+        assert wait_for(lambda: len(events.keys()) == 1)
+        revision = watch.revision
+
+        v3_server.store.drop_watches()
+        client.put('/k', '2')
+        client.put('/k', '3')
+        assert wait_for(lambda: len(events.keys()) == 3)
+        assert [event.kv.value for event in events.events] == ['1', '2', '3']
+        assert events.events[1].prev_kv.value == '1'
+        assert stream.failed == 1
+        create = _watch_requests(v3_server)[-1][0]['create_request']
+        assert create['start_revision'] == revision
+        assert create['prev_kv'] is True
+
+
+def test_watch_reconnects_silent_connection(client, v3_server):
+    events = _Events()
+    with WatchStream(client, retry_interval=0.01,
+                     read_timeout=0.2) as stream:
+        watch = stream.watch('/k', events)
+        assert wait_for(lambda: watch.watch_id is not None)
+        client.put('/k', '1')
+        assert wait_for(lambda: len(events.keys()) == 1)
+        revision = watch.revision
+
+        # Nothing arrives on the connection, as if it were half-open
+        assert wait_for(lambda: stream.failed >= 1)
+        assert wait_for(lambda: stream.connects >= 2)
+        create = _watch_requests(v3_server)[-1][0]['create_request']
+        assert create['start_revision'] == revision
+        client.put('/k', '2')
+        assert wait_for(lambda: len(events.keys()) == 2)
+        assert [event.kv.value for event in events.events] == ['1', '2']
+
+
+def test_watch_progress_advances_revision(client, v3_server):
+    with WatchStream(client) as stream:
+        watch = stream.watch('/quiet', _Events())
+        assert wait_for(lambda: watch.watch_id is not None)
+        start = watch.revision
+        client.put('/other', '1')
+        client.put('/other', '2')
+        v3_server.store.notify_progress()
+        assert wait_for(lambda: watch.revision == start + 2)
+    create = _watch_requests(v3_server)[-1][0]['create_request']
+    assert create['progress_notify'] is True
+
+
+def test_watch_start_revision(client, v3_server):
+    first = client.put('/h', '1').revision
+    client.put('/h', '2')
+    events = _Events()
+    with WatchStream(client) as stream:
+        stream.watch('/h', events, start_revision=first)
+        assert wait_for(lambda: len(events.keys()) == 2)
+
+
+def test_watch_compacted(client, v3_server):
+    v3_server.store.compact_revision = 10
+    cancelled = []
+    with WatchStream(client, on_cancel=cancelled.append) as stream:
+        watch = stream.watch('/c', _Events(), start_revision=2)
+        assert wait_for(lambda: cancelled == [watch])
+        assert isinstance(watch.error, EtcdCompacted)
+        assert len(stream) == 0
+
+
+def test_watch_cancel(client, v3_server):
+    events = _Events()
+    with WatchStream(client) as stream:
+        watch = stream.watch('/x', events)
+        assert wait_for(lambda: watch.watch_id is not None)
+        watch.cancel()
+        client.put('/x', '1')
+        time.sleep(0.2)
+        assert events.keys() == []
+
+
+def test_watch_callback_error(client, v3_server):
+    events = _Events()
+    other = _Events()
+
+    def callback(event):
+        if event.kv.value == 'bad':
+            raise ValueError('bad value')
+        events(event)
+
+    with WatchStream(client) as stream:
+        watches = [stream.watch('/k', callback), stream.watch('/o', other)]
+        assert wait_for(lambda: all(watch.watch_id is not None
+                                    for watch in watches))
+        client.put('/k', 'bad')
+        revision = client.put('/k', 'good').revision
+        client.put('/o', '1')
+        assert wait_for(lambda: len(other.keys()) == 1)
+        assert [event.kv.value for event in events.events] == ['good']
+        assert watches[0].revision == revision + 1
+        assert stream.failed == 0
@@ -0,0 +1,101 @@
+import mock
+import pytest
+
+from pyetcd import EtcdException
+from pyetcd.client import Client, ClientException
+from pyetcd.writer import CoalescingWriter
+from tests.unit.util import wait_for
+
+
+@pytest.fixture
+def client():
+    return mock.Mock(spec=Client)
+
+
+def test_writer_keeps_newest_value(client):
+    writer = CoalescingWriter(client, interval=3600)
+    for i in range(10):
+        writer.write('/heartbeat', str(i), ttl=10)
+    writer.write('/load', '0.5')
+    assert writer.collapsed == 9
+    assert writer.pending == 2
+
+    assert writer.flush() == 2
+    writer.close()
+    assert sorted(client.write.call_args_list) == [
+        mock.call('/heartbeat', '9', ttl=10),
+        mock.call('/load', '0.5', ttl=None),
+    ]
+    assert writer.written == 2
+
+
+def test_writer_flushes_when_full(client):
+    writer = CoalescingWriter(client, interval=3600, max_pending=3)
+    for i in range(3):
+        writer.write('/key%d' % i, 'foo')
+    assert wait_for(lambda: client.write.call_count == 3)
+    assert writer.pending == 0
+    writer.close()
+
+
+def test_writer_retries_failed_key(client):
+    client.write.side_effect = [EtcdException('foo'), None]
+    writer = CoalescingWriter(client, interval=3600)
+    writer.write('/foo', 'bar')
+    with pytest.raises(EtcdException):
+        writer.flush()
+    assert writer.pending == 1
+    writer.close()
+    assert client.write.call_count == 2
+    assert writer.written == 1
+
+
+def test_writer_failed_key_does_not_override_newer(client):
+    writer = CoalescingWriter(client, interval=3600)
+
+    def write(key, value, ttl=None):
+        writer.write(key, 'newer')
+        raise EtcdException('foo')
+
+    client.write.side_effect = write
+    writer.write('/foo', 'older')
+    with pytest.raises(EtcdException):
+        writer.flush()
+    assert writer._pending == {'/foo': ('newer', None)}
+    client.write.side_effect = None
+    writer.close()
+
+
+def test_writer_drops_key_on_other_error(client):
+    def write(key, value, ttl=None):
+        if key == '/bad':
+            raise TypeError('bad value')
+
+    client.write.side_effect = write
+    writer = CoalescingWriter(client, interval=0.01)
+    writer.write('/bad', object())
+    writer.write('/good', '1')
+    assert wait_for(lambda: writer.written == 1)
+    assert writer.pending == 0
+
+    # The background flushes go on
+    writer.write('/good', '2')
+    assert wait_for(lambda: writer.written == 2)
+    writer.close()
+    assert client.write.call_count == 3
+
+
+def test_writer_survives_flush_error(client):
+    writer = CoalescingWriter(client, interval=0.01)
+    with mock.patch.object(writer, 'flush',
+                           side_effect=[RuntimeError('boom'), 0]) as flush:
+        assert wait_for(lambda: flush.call_count == 2)
+    writer.close()
+
+
+def test_writer_closed(client):
+    with CoalescingWriter(client, interval=3600) as writer:
+        writer.write('/foo', 'bar')
+    client.write.assert_called_once_with('/foo', 'bar', ttl=None)
+    with pytest.raises(ClientException):
+        writer.write('/foo', 'bar')
@@ -0,0 +1,14 @@
+"""Helpers shared by unit tests."""
+import time
+
+
+def wait_for(condition, timeout=5, interval=0.005):
+    """
+    Poll a condition until it's true or the timeout passes.
+
+    :return: The last result of the condition.
+    """
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(interval)
+    return condition()
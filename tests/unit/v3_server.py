@@ -0,0 +1,490 @@
+"""In-memory stand-in for the etcd v3 JSON gateway used by unit tests."""
+import base64
+import itertools
+import json
+import socket
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+def b64(data):
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return base64.b64encode(data).decode('ascii')
+
+
+def unb64(data):
+    return base64.b64decode(data or '')
+
+
+class GatewayError(Exception):
+    def __init__(self, status, code, message):
+        super(GatewayError, self).__init__(message)
+        self.status = status
+        self.code = code
+
+
+class V3Store(object):
+    """Keys with revisions, enough of etcd v3 semantics for tests."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.revision = 1
+        self.compact_revision = 0
+        self.kvs = {}
+        self.leases = {}
+        self.lease_ids = itertools.count(1000)
+        self.requests = []
+        self.events = []
+        self.watch_ids = itertools.count(0)
+        self.progress = 0
+        self.generation = 0
+        self.closed = False
+        self.users = {}
+        self.tokens = {}
+        self.token_ttl = 300
+        self.token_ids = itertools.count(1)
+        self.authorizations = []
+
+    def authenticate(self, request):
+        if self.users.get(request.get('name')) != request.get('password'):
+            raise GatewayError(400, 3, 'etcdserver: authentication failed, '
+                                       'invalid user ID or password')
+        token = 'token.%d' % next(self.token_ids)
+        self.tokens[token] = time.time() + self.token_ttl
+        return {'header': self.header(), 'token': token}
+
+    def check_token(self, token):
+        if self.tokens.get(token, 0) <= time.time():
+            raise GatewayError(401, 16, 'etcdserver: invalid auth token')
+
+    def record(self, kind, kv, prev_kv):
+        event = {'kv': kv, 'prev_kv': prev_kv}
+        if kind == 'DELETE':
+            event['type'] = 'DELETE'
+        with self.changed:
+            self.events.append((self.revision, event))
+            self.changed.notify_all()
+
+    def notify_progress(self):
+        with self.lock:
+            self.progress += 1
+            self.changed.notify_all()
+
+    def drop_watches(self):
+        with self.lock:
+            self.generation += 1
+            self.changed.notify_all()
+
+    def header(self):
+        return {'cluster_id': '1', 'member_id': '1',
+                'revision': str(self.revision), 'raft_term': '2'}
+
+    def _keys(self, request):
+        key = unb64(request.get('key'))
+        range_end = unb64(request.get('range_end'))
+        if not range_end:
+            return [key] if key in self.kvs else []
+        return sorted(
+            k for k in self.kvs
+            if k >= key and (range_end == b'\0' or k < range_end)
+        )
+
+    def put(self, request):
+        key = unb64(request['key'])
+        old = self.kvs.get(key)
+        lease = int(request.get('lease', 0))
+        if lease and lease not in self.leases:
+            raise GatewayError(404, 5,
+                               'etcdserver: requested lease not found')
+        self.revision += 1
+        self.kvs[key] = {
+            'key': request['key'],
+            'value': request.get('value', ''),
+            'create_revision': str(
+                old['create_revision'] if old else self.revision
+            ),
+            'mod_revision': str(self.revision),
+            'version': str(int(old['version']) + 1 if old else 1),
+            'lease': str(lease),
+        }
+        self.record('PUT', self.kvs[key], old)
+        response = {'header': self.header()}
+        if request.get('prev_kv') and old:
+            response['prev_kv'] = old
+        return response
+
+    def range(self, request):
+        if 0 < int(request.get('revision', 0)) < self.compact_revision:
+            raise GatewayError(
+                400, 11, 'etcdserver: mvcc: required revision '
+                         'has been compacted'
+            )
+        keys = self._keys(request)
+        kvs = [dict(self.kvs[k]) for k in keys]
+        if request.get('sort_order') == 'DESCEND':
+            kvs.reverse()
+        response = {'header': self.header(), 'count': str(len(kvs))}
+        if request.get('count_only'):
+            return response
+        limit = int(request.get('limit', 0))
+        if limit and len(kvs) > limit:
+            kvs = kvs[:limit]
+            response['more'] = True
+        if request.get('keys_only'):
+            for item in kvs:
+                item.pop('value', None)
+        if kvs:
+            response['kvs'] = kvs
+        return response
+
+    def delete_range(self, request):
+        keys = self._keys(request)
+        response = {'header': self.header(), 'deleted': str(len(keys))}
+        if keys:
+            self.revision += 1
+            response['header'] = self.header()
+        deleted = [self.kvs.pop(k) for k in keys]
+        for item in deleted:
+            self.record('DELETE', {'key': item['key'],
+                                   'mod_revision': str(self.revision)}, item)
+        if request.get('prev_kv') and deleted:
+            response['prev_kvs'] = deleted
+        return response
+
+    def expire(self):
+        now = time.time()
+        for lease_id, lease in list(self.leases.items()):
+            if lease['expires'] <= now:
+                self.lease_revoke({'ID': lease_id})
+
+    def lease_grant(self, request):
+        lease_id = int(request.get('ID', 0)) or next(self.lease_ids)
+        ttl = int(request['TTL'])
+        self.leases[lease_id] = {'ttl': ttl, 'expires': time.time() + ttl}
+        return {'header': self.header(), 'ID': str(lease_id),
+                'TTL': str(ttl)}
+
+    def lease_revoke(self, request):
+        lease_id = int(request['ID'])
+        if self.leases.pop(lease_id, None) is None:
+            raise GatewayError(404, 5,
+                               'etcdserver: requested lease not found')
+        keys = [key for key, item in self.kvs.items()
+                if int(item['lease']) == lease_id]
+        if keys:
+            self.revision += 1
+        for key in keys:
+            item = self.kvs.pop(key)
+            self.record('DELETE', {'key': item['key'],
+                                   'mod_revision': str(self.revision)}, item)
+        return {'header': self.header()}
+
+    def lease_keepalive(self, request):
+        lease_id = int(request['ID'])
+        response = {'header': self.header(), 'ID': str(lease_id)}
+        lease = self.leases.get(lease_id)
+        if lease is not None:
+            lease['expires'] = time.time() + lease['ttl']
+            response['TTL'] = str(lease['ttl'])
+        return response
+
+    def lease_timetolive(self, request):
+        lease_id = int(request['ID'])
+        lease = self.leases.get(lease_id)
+        if lease is None:
+            return {'header': self.header(), 'ID': str(lease_id),
+                    'TTL': '-1'}
+        response = {
+            'header': self.header(), 'ID': str(lease_id),
+            'TTL': str(int(lease['expires'] - time.time())),
+            'grantedTTL': str(lease['ttl']),
+        }
+        if request.get('keys'):
+            response['keys'] = sorted(
+                item['key'] for item in self.kvs.values()
+                if int(item['lease']) == lease_id
+            )
+        return response
+
+    def _compare(self, compare):
+        item = self.kvs.get(unb64(compare['key']), {})
+        target = compare.get('target', 'VERSION')
+        if target == 'VALUE':
+            actual = unb64(item.get('value'))
+            expected = unb64(compare.get('value'))
+        else:
+            field = {'VERSION': 'version', 'CREATE': 'create_revision',
+                     'MOD': 'mod_revision', 'LEASE': 'lease'}[target]
+            actual = int(item.get(field, 0))
+            expected = int(compare.get(field, 0))
+        return {
+            'EQUAL': actual == expected,
+            'NOT_EQUAL': actual != expected,
+            'LESS': actual < expected,
+            'GREATER': actual > expected,
+        }[compare.get('result', 'EQUAL')]
+
+    def txn(self, request):
+        succeeded = all(self._compare(compare)
+                        for compare in request.get('compare', []))
+        ops = request.get('success' if succeeded else 'failure', [])
+        responses = []
+        for op in ops:
+            for kind in ('put', 'range', 'delete_range'):
+                if 'request_%s' % kind in op:
+                    responses.append({
+                        'response_%s' % kind:
+                            getattr(self, kind)(op['request_%s' % kind])
+                    })
+        return {'header': self.header(), 'succeeded': succeeded,
+                'responses': responses}
+
+    def watch_create(self, messages):
+        watchers = []
+        responses = []
+        for message in messages:
+            request = message['create_request']
+            watcher = {
+                'id': next(self.watch_ids),
+                'key': unb64(request.get('key')),
+                'range_end': unb64(request.get('range_end')),
+                'prev_kv': request.get('prev_kv', False),
+            }
+            responses.append({'header': self.header(),
+                              'watch_id': str(watcher['id']),
+                              'created': True})
+            start = int(request.get('start_revision', 0))
+            if start and start < self.compact_revision:
+                responses.append({
+                    'header': self.header(), 'watch_id': str(watcher['id']),
+                    'canceled': True,
+                    'compact_revision': str(self.compact_revision)
+                })
+                continue
+            watchers.append(watcher)
+            if start:
+                history = [item for item in self.events if item[0] >= start]
+                responses.extend(self.watch_events([watcher], history))
+        return watchers, responses
+
+    def watch_events(self, watchers, events):
+        responses = []
+        for watcher in watchers:
+            by_revision = []
+            for revision, event in events:
+                key = unb64(event['kv']['key'])
+                end = watcher['range_end']
+                if end:
+                    matches = key >= watcher['key'] \
+                        and (end == b'\0' or key < end)
+                else:
+                    matches = key == watcher['key']
+                if not matches:
+                    continue
+                event = dict(event)
+                if not watcher['prev_kv'] or event['prev_kv'] is None:
+                    del event['prev_kv']
+                if by_revision and by_revision[-1][0] == revision:
+                    by_revision[-1][1].append(event)
+                else:
+                    by_revision.append((revision, [event]))
+            for revision, items in by_revision:
+                header = self.header()
+                header['revision'] = str(revision)
+                responses.append({'header': header,
+                                  'watch_id': str(watcher['id']),
+                                  'events': items})
+        return responses
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    routes = {
+        '/v3/kv/put': 'put',
+        '/v3/kv/range': 'range',
+        '/v3/kv/deleterange': 'delete_range',
+        '/v3/kv/txn': 'txn',
+        '/v3/lease/grant': 'lease_grant',
+        '/v3/lease/revoke': 'lease_revoke',
+        '/v3/lease/timetolive': 'lease_timetolive',
+        '/v3/auth/authenticate': 'authenticate',
+    }
+    stream_routes = {
+        '/v3/lease/keepalive': 'lease_keepalive',
+    }
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length).decode('utf-8')
+        store = self.server.store
+        authorization = self.headers.get('Authorization')
+        with store.lock:
+            store.authorizations.append(authorization)
+        if store.users and self.path != '/v3/auth/authenticate':
+            try:
+                store.check_token(authorization)
+            except GatewayError as err:
+                self._respond(err.status, json.dumps({
+                    'error': str(err), 'message': str(err), 'code': err.code
+                }).encode('utf-8'))
+                return
+        if self.path == '/v3/watch':
+            self._watch([json.loads(line) for line in data.splitlines()
+                         if line.strip()])
+            return
+        if self.path in self.stream_routes:
+            messages = [json.loads(line) for line in data.splitlines()
+                        if line.strip()]
+            with store.lock:
+                store.expire()
+                store.requests.append((self.path, messages))
+                handler = getattr(store, self.stream_routes[self.path])
+                body = ''.join(
+                    json.dumps({'result': handler(message)}) + '\n'
+                    for message in messages
+                ).encode('utf-8')
+            self._respond(200, body)
+            return
+
+        request = json.loads(data or '{}')
+        try:
+            if self.path not in self.routes:
+                raise GatewayError(404, 5, 'Not Found')
+            with store.lock:
+                store.expire()
+                store.requests.append((self.path, request))
+                response = getattr(store, self.routes[self.path])(request)
+            status = 200
+        except GatewayError as err:
+            status = err.status
+            response = {'error': str(err), 'message': str(err),
+                        'code': err.code}
+        self._respond(status, json.dumps(response).encode('utf-8'))
+
+    def _watch(self, messages):
+        store = self.server.store
+        with store.lock:
+            store.requests.append((self.path, messages))
+            watchers, responses = store.watch_create(messages)
+            cursor = len(store.events)
+            progress = store.progress
+            generation = store.generation
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            while True:
+                for response in responses:
+                    data = (json.dumps({'result': response}) + '\n')
+                    # Split messages between chunks like a slow network
+                    middle = len(data) // 2
+                    self._chunk(data[:middle].encode('utf-8'))
+                    self._chunk(data[middle:].encode('utf-8'))
+                with store.changed:
+                    while cursor == len(store.events) \
+                            and progress == store.progress \
+                            and generation == store.generation \
+                            and not store.closed:
+                        store.changed.wait(0.05)
+                    if generation != store.generation or store.closed:
+                        # Drop the connection without ending the stream
+                        return
+                    responses = store.watch_events(watchers,
+                                                   store.events[cursor:])
+                    cursor = len(store.events)
+                    if progress != store.progress:
+                        progress = store.progress
+                        responses.extend(
+                            {'header': store.header(),
+                             'watch_id': str(watcher['id'])}
+                            for watcher in watchers
+                        )
+        except socket.error:
+            pass
+
+    def _chunk(self, data):
+        self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+        self.wfile.flush()
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        HTTPServer.__init__(self, *args, **kwargs)
+        self.connections = set()
+
+    def process_request(self, request, client_address):
+        self.connections.add(request)
+        ThreadingMixIn.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+        self.connections.discard(request)
+        HTTPServer.shutdown_request(self, request)
+
+    def close_connections(self):
+        # Keep-alive connections would outlive the server otherwise
+        for request in list(self.connections):
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class V3Server(object):
+    """
+    HTTP server on a random local port. ``store`` holds its keys.
+    With ``ssl_context`` it serves HTTPS.
+    """
+    def __init__(self, store=None, handler=_Handler, ssl_context=None):
+        self.store = store or V3Store()
+        self._server = _Server(('127.0.0.1', 0), handler)
+        if ssl_context is not None:
+            self._server.socket = ssl_context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+        self._server.store = self.store
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self.store.lock:
+            self.store.closed = True
+            self.store.changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        self._server.close_connections()
+
+    def get(self, key):
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        item = self.store.kvs.get(key)
+        return None if item is None else unb64(item['value']).decode('utf-8')